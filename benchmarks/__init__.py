@@ -0,0 +1,2 @@
+# benchmarks/
+# Stand-alone timing scripts; run with `python -m benchmarks.<name>`
@@ -0,0 +1,144 @@
+# benchmarks/exports.py
+# Synthetic Uber / Lyft / Common Courtesy exports for the benchmarks
+#
+#   synthetic_export("uber", "xlsx", rows=100_000, riders=5_000)
+import csv
+import io
+import random
+
+import xlsxwriter
+
+from sheet_cleaner.schemas import expected_headers_uber, expected_headers_lyft
+
+# "common_courtesy_5" puts the header one row lower, as some of their exports do
+LAYOUTS = ["uber", "lyft", "common_courtesy", "common_courtesy_5", "uber_headerless", "lyft_headerless"]
+FORMATS = ["csv", "xlsx"]
+
+FIRST_NAMES = ["Ann", "Bob", "Cara", "Dan", "Eve", "Finn", "Gus", "Hana", "Ivy", "Jo", "Kai", "Lena", "Mo", "Nia"]
+LAST_NAMES = ["Smith", "Jones", "Brown", "Lee", "Adams", "Garcia", "Nguyen", "Patel", "Kim", "Okafor", "Rossi"]
+# Weighted like a real month: mostly Fulton and Forsyth chapters, some blanks
+INTERNAL_NOTES = ["FCC"] * 4 + ["FCM"] * 3 + ["FCSH", "FCSC"] + ["DTF"] * 3 + ["DTFCE", "XYZ", "", ""]
+
+# Distinct filler rows cycled through for the columns the pipeline drops
+_FILLER_ROWS = 512
+
+
+def _headers(layout):
+    return expected_headers_lyft if layout.startswith("lyft") else expected_headers_uber
+
+
+def _banner(layout):
+    # Common Courtesy: title in the second cell, header on row 4 (or 5) below it
+    rows = [["", "Common Courtesy Trips Report"], ["Organization", "Sheet Cleaner Benchmarks"],
+            ["Period", "2024-01-01 - 2024-01-31"], ["Generated", "2024-02-01"]]
+    if layout == "common_courtesy_5":
+        rows.append(["Timezone", "America/New_York"])
+    return rows
+
+
+def _riders(riders, rnd):
+    result = []
+    for i in range(riders):
+        first, last = rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES)
+        # Tag the name so riders stay distinct past the name pool's combinations
+        result.append((f"{first}{i // 64 or ''}", last, f"404555{i:04d}"[-10:] if rnd.random() > 0.1 else ""))
+    return result
+
+
+def _filler(headers, rnd):
+    rows = []
+    for _ in range(_FILLER_ROWS):
+        rows.append([f"{header.split(' ')[0][:8]} {rnd.randint(0, 9999)}" for header in headers])
+    return rows
+
+
+def iter_rows(layout, rows, riders=None, seed=0):
+    """
+    Yields the export's cells row by row (header row first unless headerless):
+    realistic rider keys, Internal Notes, dates and amounts; filler elsewhere.
+    riders: distinct riders to spread the rows over (default rows // 10)
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout '{layout}'. Use one of: {', '.join(LAYOUTS)}.")
+    rnd = random.Random(seed)
+    headers = _headers(layout)
+    col = {header: i for i, header in enumerate(headers)}
+    is_uber = headers is expected_headers_uber
+    is_common_courtesy = layout.startswith("common_courtesy")
+    people = _riders(max(1, riders or rows // 10), rnd)
+    filler = _filler(headers, rnd)
+
+    if is_common_courtesy:
+        yield from _banner(layout)
+    if not layout.endswith("_headerless"):
+        yield list(headers)
+
+    for r in range(rows):
+        row = list(filler[r % _FILLER_ROWS])
+        first, last, phone = rnd.choice(people)
+        row[col["Internal Note"]] = rnd.choice(INTERNAL_NOTES)
+        row[col["Passenger Number"]] = phone
+        row[col["Pickup Date (Local)"]] = f"2024-01-{rnd.randint(1, 31):02d}"
+        row[col["Pickup Time (Local)"]] = f"{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}"
+        amount = round(rnd.uniform(4, 60), 2)
+        distance = round(rnd.uniform(0.5, 25), 2)
+        if is_uber:
+            row[col["Request Type"]] = rnd.choice(["ASAP", "Scheduled"])  # no digits: headerless sniffing
+            row[col["Ride Status"]] = rnd.choice(["COMPLETED"] * 9 + ["CANCELED"])
+            row[col["Transaction Amount in Local Currency (incl. Taxes)"]] = amount
+            row[col["Distance (mi)"]] = distance
+            if is_common_courtesy:
+                # Guest names are the riders; First/Last Name are the booking staff
+                row[col["Guest First Name"]], row[col["Guest Last Name"]] = first, last
+                row[col["First Name"]], row[col["Last Name"]] = "Staff", "Member"
+            else:
+                row[col["First Name"]], row[col["Last Name"]] = first, last
+        else:
+            row[col["Pickup Timezone offset from UTC"]] = "-5"
+            row[col["Transaction Amount"]] = amount
+            row[col["Distance (miles)"]] = distance
+            row[col["First Name"]], row[col["Last Name"]] = first, last
+        yield row
+
+
+class SyntheticExport(io.BytesIO):
+    """In-memory upload with the .name / .type / .size the loaders expect."""
+
+    def __init__(self, data, name, type=None):
+        super().__init__(data)
+        self.name = name
+        self.type = type
+        self.size = len(data)
+
+
+def _csv_bytes(rows):
+    output = io.BytesIO()
+    text = io.TextIOWrapper(output, encoding="utf-8", newline="")
+    csv.writer(text, lineterminator="\n").writerows(rows)
+    text.flush()
+    data = output.getvalue()
+    text.detach()
+    return data
+
+
+def _xlsx_bytes(rows):
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    sheet = workbook.add_worksheet()
+    for r, row in enumerate(rows):
+        sheet.write_row(r, 0, row)
+    workbook.close()
+    return output.getvalue()
+
+
+def synthetic_export(layout, fmt, rows, riders=None, seed=0):
+    """Returns: SyntheticExport named like an upload, e.g. "uber-10000.xlsx"."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    cells = iter_rows(layout, rows, riders, seed)
+    if fmt == "csv":
+        return SyntheticExport(_csv_bytes(cells), f"{layout}-{rows}.csv", "text/csv")
+    return SyntheticExport(
+        _xlsx_bytes(cells), f"{layout}-{rows}.xlsx",
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
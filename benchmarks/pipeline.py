@@ -0,0 +1,197 @@
+# benchmarks/pipeline.py
+# Stage-by-stage timings of clean_file / sort_and_merge / split_by_internal_note
+# on synthetic exports, saved as JSON so runs can be compared for regressions
+#
+#   python -m benchmarks.pipeline --rows 1000 10000 100000 --formats csv xlsx
+#   python -m benchmarks.pipeline --rows 1000000 --layouts uber --formats csv
+#   python -m benchmarks.pipeline --rows 10000 --compare benchmarks/results/<earlier run>.json
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from sheet_cleaner.cleaning import clean_and_sort, clean_columns, clean_report, merge_report
+from sheet_cleaner.ingest import read_export
+from sheet_cleaner.readers import XLSX_ENGINE, resolve_engine
+from sheet_cleaner.split import split_by_internal_note
+
+from .exports import FORMATS, LAYOUTS, synthetic_export
+
+OPERATIONS = ["clean", "merge", "split"]
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class StageTimer:
+    """
+    Passed as the pipeline's progress(stage) callback: each call closes the
+    previous stage, so stages[name] is the seconds spent in it.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._stage = None
+        self._start = None
+
+    def __call__(self, stage):
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + now - self._start
+        self._stage, self._start = stage, now
+
+    def stop(self):
+        self(None)
+        return {stage: round(seconds, 4) for stage, seconds in self.stages.items()}
+
+
+def run_clean(file_obj, progress):
+    # clean_file() with a stage boundary between parsing and the report
+    progress("parsing")
+    df, sniffed = read_export(file_obj, project=clean_columns)
+    _final_df, output = clean_report(df, sniffed, progress)
+    return output
+
+
+def run_merge(file_objs, progress):
+    # sort_and_merge(), same thread pool
+    progress("parsing")
+    with ThreadPoolExecutor(max_workers=min(len(file_objs), os.cpu_count() or 1)) as pool:
+        frames = list(pool.map(clean_and_sort, file_objs))
+    _final_df, output = merge_report(frames, progress)
+    return output
+
+
+def run_split(file_obj, progress):
+    # split_export()
+    progress("parsing")
+    df, _sniffed = read_export(file_obj)
+    return split_by_internal_note(df, progress)
+
+
+def time_case(layout, fmt, rows, riders, operations, repeat, seed=0):
+    """
+    Generates one export (plus a second one, with another seed, for merge) and
+    times each operation; the fastest of `repeat` runs is kept.
+    Returns: list of result dicts
+    """
+    start = time.perf_counter()
+    file_obj = synthetic_export(layout, fmt, rows, riders, seed)
+    other = synthetic_export(layout, fmt, rows, riders, seed + 1) if "merge" in operations else None
+    generate_seconds = time.perf_counter() - start
+
+    runs = {
+        "clean": lambda progress: run_clean(file_obj, progress),
+        "merge": lambda progress: run_merge([file_obj, other], progress),
+        "split": lambda progress: run_split(file_obj, progress),
+    }
+    results = []
+    for operation in operations:
+        best = None
+        for _ in range(repeat):
+            file_obj.seek(0)
+            if other is not None:
+                other.seek(0)
+            timer = StageTimer()
+            start = time.perf_counter()
+            runs[operation](timer)
+            total = time.perf_counter() - start
+            stages = timer.stop()
+            if best is None or total < best["seconds"]:
+                best = {"seconds": round(total, 4), "stages": stages}
+        results.append({
+            "case": f"{layout}-{fmt}-{rows}",
+            "layout": layout,
+            "format": fmt,
+            "rows": rows,
+            "riders": riders or rows // 10,
+            "bytes": file_obj.size,
+            "operation": operation,
+            "generate_seconds": round(generate_seconds, 4),
+            **best,
+        })
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(__file__), check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "xlsx_engine": resolve_engine(XLSX_ENGINE),
+    }
+
+
+def _key(result):
+    return result["case"], result["operation"]
+
+
+def compare(results, baseline_path):
+    """Prints each case's time against the same case in an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = {_key(r): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path}:")
+    for result in results:
+        before = baseline.get(_key(result))
+        if before is None:
+            continue
+        ratio = result["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+        flag = "  slower" if ratio > 1.1 else ("  faster" if ratio < 0.9 else "")
+        print(f"{result['case']:>32} {result['operation']:>6}: {before['seconds']:8.2f} s -> {result['seconds']:8.2f} s ({ratio:.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the cleaning pipeline stage by stage on synthetic exports.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--riders", type=int, default=None, help="distinct riders per export (default rows / 10)")
+    parser.add_argument("--layouts", nargs="+", choices=LAYOUTS, default=LAYOUTS)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS)
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--output", help="results file (default benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    run = {"environment": environment(), "results": []}
+    print(f"{run['environment']['timestamp']}  commit {run['environment']['commit']}  xlsx engine {run['environment']['xlsx_engine']}")
+    for rows in args.rows:
+        for fmt in args.formats:
+            for layout in args.layouts:
+                for result in time_case(layout, fmt, rows, args.riders, args.operations, args.repeat):
+                    run["results"].append(result)
+                    stages = "  ".join(f"{stage} {seconds:.2f}" for stage, seconds in result["stages"].items())
+                    print(f"{result['case']:>32} {result['operation']:>6}: {result['seconds']:8.2f} s  [{stages}]")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = run["environment"]["timestamp"].replace(":", "").replace("+0000", "Z")
+        output = os.path.join(RESULTS_DIR, f"pipeline-{stamp}.json")
+    with open(output, "w") as f:
+        json.dump(run, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(run["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/xlsx_readers.py
+# pd.read_excel vs the calamine / streaming-openpyxl readers on a synthetic Uber export
+#
+#   python -m benchmarks.xlsx_readers --rows 50000 --repeat 3
+import argparse
+import io
+import random
+import time
+
+import pandas as pd
+import xlsxwriter
+from pandas.io.parsers import TextParser
+
+from sheet_cleaner.readers import calamine_available, read_xlsx_rows
+from sheet_cleaner.schemas import expected_headers_uber
+
+HEADER_ROW = 4  # Common Courtesy layout: banner, blanks, then headers
+
+
+def synthetic_uber_xlsx(rows, seed=0):
+    rnd = random.Random(seed)
+    output = io.BytesIO()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    sheet = workbook.add_worksheet()
+    sheet.write_row(0, 0, ["Uber for Business - Trip Activity"])
+    sheet.write_row(HEADER_ROW, 0, expected_headers_uber)
+    for r in range(rows):
+        row = [f"{h[:4]}{rnd.randint(0, 999)}" for h in expected_headers_uber]
+        row[expected_headers_uber.index("First Name")] = rnd.choice(["Ann", "Bob", "Cara", "Dan"])
+        row[expected_headers_uber.index("Last Name")] = rnd.choice(["Smith", "Jones", "Lee", "Ng"])
+        row[expected_headers_uber.index("Internal Note")] = rnd.choice(["FCC", "FCM", "DTF", ""])
+        row[expected_headers_uber.index("Transaction Amount in Local Currency (incl. Taxes)")] = round(rnd.uniform(2, 60), 2)
+        row[expected_headers_uber.index("Distance (mi)")] = round(rnd.uniform(0, 25), 2)
+        sheet.write_row(HEADER_ROW + 1 + r, 0, row)
+    workbook.close()
+    return output.getvalue()
+
+
+def _time(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the XLSX reader backends against pd.read_excel.")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = synthetic_uber_xlsx(args.rows)
+    print(f"{args.rows} rows x {len(expected_headers_uber)} columns, {len(data) / 1e6:.1f} MB")
+
+    baseline, expected = _time(lambda: pd.read_excel(io.BytesIO(data), header=HEADER_ROW), args.repeat)
+    print(f"{'pd.read_excel':>14}: {baseline:7.2f} s")
+
+    engines = ["openpyxl"] + (["calamine"] if calamine_available() else [])
+    for engine in engines:
+        def read():
+            return TextParser(read_xlsx_rows(io.BytesIO(data), engine), header=HEADER_ROW).read()
+
+        seconds, df = _time(read, args.repeat)
+        pd.testing.assert_frame_equal(expected, df)
+        print(f"{engine:>14}: {seconds:7.2f} s  ({baseline / seconds:.1f}x, same DataFrame)")
+    if not calamine_available():
+        print("python-calamine not installed; pip install python-calamine to compare it")
+
+
+if __name__ == "__main__":
+    main()
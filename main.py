@@ -1,25 +1,49 @@
 from fastapi import FastAPI, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse
+from fastapi.responses import Response, JSONResponse, FileResponse, StreamingResponse, PlainTextResponse
 from fastapi.requests import Request
 
-from typing import List
+from typing import List, Optional
 from io import BytesIO
+from contextlib import asynccontextmanager
 
-from streamlit_excel_cleaner import clean_file
-from streamlit_excel_cleaner import sort_and_merge
-from streamlit_excel_cleaner import split_by_internal_note
+# Core engine only; pandas and the Excel libraries load on first use
+import sheet_cleaner
+from sheet_cleaner import metrics
+from sheet_cleaner.executor import BoundedExecutor, QueueFull
+from sheet_cleaner.uploads import CHUNK_BYTES, UploadSpool, UploadTooLarge
+from sheet_cleaner.cache import ResultCache, cache_key
+from sheet_cleaner.jobs import JOB_OPERATIONS, XLSX_MEDIA_TYPE, JobRunner, JobStore, report_download
+from sheet_cleaner.profiling import profile_call, save_profile
 
+import functools
+import logging
+import re
+import shutil
 import zipfile
 import uuid
-import zipfile
 import base64
 import os
 
-from pandas import read_excel
-import pandas as pd
+# SHEET_CLEANER_LOG_LEVEL=INFO logs each upload, DEBUG the column lists as well
+metrics.configure_logging()
+log = logging.getLogger("sheet_cleaner.api")
+
+# Cleaning jobs run in worker processes; past workers + max queue we answer 429
+executor = BoundedExecutor(
+    workers=int(os.environ.get("SHEET_CLEANER_WORKERS", "0")) or None,
+    max_queue=int(os.environ.get("SHEET_CLEANER_MAX_QUEUE", "8")),
+    retry_after=int(os.environ.get("SHEET_CLEANER_RETRY_AFTER", "5")),
+)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    job_runner.start()
+    yield
+    job_runner.stop()
+    executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,129 +56,546 @@ app.add_middleware(
 DOWNLOAD_DIR = "downloads"
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-@app.post("/clean")
-async def clean_uploaded_file(file: UploadFile = File(...)):
-    contents = await file.read()
-    uploaded_file = BytesIO(contents)
-    
-    # ✅ Add the expected attributes
-    uploaded_file.name = file.filename
-    uploaded_file.type = file.content_type
-    uploaded_file.size = len(contents)
-
-    result = clean_file(uploaded_file)
-    if result is None:
-        return {"error": "Cleaning failed or required columns missing."}
-
-    cleaned_df, output = result
-    return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={
-        "Content-Disposition": "attachment; filename=cleaned_report.xlsx"
-    })
+# Uploads are streamed to temp files (deleted after the request), never held whole in memory
+MAX_UPLOAD_BYTES = int(os.environ.get("SHEET_CLEANER_MAX_UPLOAD_MB", "50")) * 1024 * 1024
 
-@app.post("/merge")
-async def merge_two_files(file1: UploadFile = File(...), file2: UploadFile = File(...)):
-    contents1 = await file1.read()
-    contents2 = await file2.read()
+# Finished results keyed by SHA-256 of the uploads + operation; re-uploads skip the work
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get("SHEET_CLEANER_CACHE_MB", "256")) * 1024 * 1024,
+    ttl=int(os.environ.get("SHEET_CLEANER_CACHE_TTL", "3600")),
+    disk_dir=os.path.join(DOWNLOAD_DIR, "cache") if os.environ.get("SHEET_CLEANER_CACHE_DISK", "").lower() in ("1", "true", "yes") else None,
+    disk_max_bytes=int(os.environ.get("SHEET_CLEANER_CACHE_DISK_MB", "1024")) * 1024 * 1024,
+)
+
+def upload_cache_key(operation, *file_objs, **params):
+    # The extension decides CSV vs XLSX parsing, so it is part of the key
+    extensions = [os.path.splitext(f.name or "")[1] for f in file_objs]
+    return cache_key(operation, [f.sha256 for f in file_objs], {"extensions": extensions, **params})
+
+# CSV uploads at or above this size are cleaned out-of-core (chunked reads, sorted
+# runs spilled to disk) within the memory budget; 0 turns the mode off
+OUT_OF_CORE_BYTES = int(os.environ.get("SHEET_CLEANER_OUT_OF_CORE_MB", "0")) * 1024 * 1024
+MEMORY_BUDGET_MB = int(os.environ.get("SHEET_CLEANER_MEMORY_BUDGET_MB", "256"))
+
+def use_out_of_core(*file_objs):
+    return bool(OUT_OF_CORE_BYTES) and sum(f.size for f in file_objs) >= OUT_OF_CORE_BYTES \
+        and any(f.name.endswith(".csv") for f in file_objs)
+
+SPLIT_MODES = ["json", "zip", "ids"]
+SPLIT_DEBUG_ZIP = os.environ.get("SHEET_CLEANER_DEBUG_SPLIT_ZIP", "").lower() in ("1", "true", "yes")
+
+BATCH_OUTPUTS = ["cleaned", "merged", "split"]
+
+# ?output_format= on /clean, /merge, /split and /jobs: the styled workbook (xlsx),
+# or typed rows + a per-rider totals table as Parquet, Arrow IPC or CSV files in
+# a ZIP. Columnar outputs are always built in memory (no out-of-core path).
+OUTPUT_FORMATS = ["xlsx", "parquet", "arrow", "csv"]
+
+def unknown_output_format(output_format):
+    return JSONResponse(status_code=400, content={"error": f"Unknown output format '{output_format}'. Use one of: {', '.join(OUTPUT_FORMATS)}."})
+
+# POST /jobs: queued in SQLite under downloads/jobs, run in the background, polled
+# by id; results (and the uploads) are deleted SHEET_CLEANER_JOB_TTL seconds after
+# the job finishes. Each uvicorn worker runs its own runner on the shared store;
+# jobs of a worker that died (no heartbeat for 30s) are picked up again by the others.
+job_store = JobStore(os.path.join(DOWNLOAD_DIR, "jobs"))
+job_runner = JobRunner(job_store, executor, ttl=int(os.environ.get("SHEET_CLEANER_JOB_TTL", "86400")))
+
+# ?profile=1 or an "X-Profile: 1" header runs /clean, /merge or /split under the
+# sampling profiler; only when SHEET_CLEANER_PROFILING=1, since it slows the request
+# and the result is never served from cache. Profiles are kept under
+# downloads/profiles (newest SHEET_CLEANER_PROFILE_KEEP) and served by /profiles/{id}.
+PROFILING = os.environ.get("SHEET_CLEANER_PROFILING", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.path.join(DOWNLOAD_DIR, "profiles")
+PROFILE_KEEP = int(os.environ.get("SHEET_CLEANER_PROFILE_KEEP", "50"))
+
+class ProfilingDisabled(Exception):
+    pass
+
+def requested_profile(request: Request, profile: bool):
+    """Returns: {"id": ...} to profile this request, or None"""
+    if not (profile or request.headers.get("X-Profile", "").lower() in ("1", "true", "yes")):
+        return None
+    if not PROFILING:
+        raise ProfilingDisabled()
+    return {"id": uuid.uuid4().hex}
 
-    file1_obj = BytesIO(contents1)
-    file1_obj.name = file1.filename
-    file1_obj.type = file1.content_type
-    file1_obj.size = len(contents1)
+async def run_in_worker(profile, fn, *args):
+    if profile is None:
+        return await executor.run(fn, *args)
+    result, profile["report"] = await executor.run(functools.partial(profile_call, fn), *args)
+    return result
 
-    file2_obj = BytesIO(contents2)
-    file2_obj.name = file2.filename
-    file2_obj.type = file2.content_type
-    file2_obj.size = len(contents2)
+def profile_headers(profile, operation):
+    if profile is None or "report" not in profile:
+        return {}
+    save_profile(PROFILE_DIR, profile["id"], operation, profile["report"], keep=PROFILE_KEEP)
+    return {"X-Profile-Id": profile["id"], "X-Profile-Url": f"/profiles/{profile['id']}"}
 
+async def spool_upload(file: UploadFile, dir=None):
+    spool = UploadSpool(file.filename, file.content_type, max_bytes=MAX_UPLOAD_BYTES, dir=dir)
     try:
-        df, output = sort_and_merge(file1_obj, file2_obj)
-    except Exception as e:
-        return {"error": str(e)}
+        while chunk := await file.read(CHUNK_BYTES):
+            spool.write(chunk)
+    except BaseException:
+        spool.abort()
+        raise
+    return spool.finish()
+
+@asynccontextmanager
+async def spooled(*uploads: UploadFile):
+    file_objs = []
+    try:
+        for upload in uploads:
+            file_objs.append(await spool_upload(upload))
+        yield file_objs
+    finally:
+        for file_obj in file_objs:
+            file_obj.discard()
+
+@app.exception_handler(UploadTooLarge)
+async def upload_too_large(request: Request, e: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"error": str(e)})
+
+@app.exception_handler(ProfilingDisabled)
+async def profiling_disabled(request: Request, e: ProfilingDisabled):
+    return JSONResponse(status_code=403, content={"error": "Profiling is not enabled on this server (SHEET_CLEANER_PROFILING)."})
+
+def busy_response(e: QueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(e), "queue": executor.stats()},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "queue": executor.stats(), "cache": result_cache.stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-stage timing histograms and row / byte counters, plus queue and cache gauges."""
+    queue = executor.stats()
+    gauges = {
+        "sheet_cleaner_queue_workers": ("Worker processes.", queue["workers"]),
+        "sheet_cleaner_queue_running": ("Jobs running in the workers.", queue["running"]),
+        "sheet_cleaner_queue_depth": ("Jobs waiting for a worker.", queue["queue_depth"]),
+        "sheet_cleaner_queue_rejected": ("Requests answered 429 since startup.", queue["rejected"]),
+    }
+    gauges.update({
+        f"sheet_cleaner_cache_{name}": (f"Result cache {name.replace('_', ' ')}.", value)
+        for name, value in result_cache.stats().items() if isinstance(value, (int, float)) and not isinstance(value, bool)
+    })
+    gauges.update({
+        f"sheet_cleaner_jobs_{status}": (f"Background jobs {status}.", count)
+        for status, count in job_store.counts().items()
+    })
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.post("/clean")
+async def clean_uploaded_file(request: Request, file: UploadFile = File(...), output_format: str = "xlsx", profile: bool = False):
+    if output_format not in OUTPUT_FORMATS:
+        return unknown_output_format(output_format)
+
+    profile = requested_profile(request, profile)
+    async with spooled(file) as (uploaded_file,):
+        key = upload_cache_key("clean", uploaded_file, output_format=output_format)
+        workbook = None if profile else result_cache.get(key)
+        if workbook is None:
+            try:
+                if output_format == "xlsx" and use_out_of_core(uploaded_file):
+                    output = await run_in_worker(profile, sheet_cleaner.clean_file_out_of_core, uploaded_file, MEMORY_BUDGET_MB)
+                else:
+                    cleaned_df, output = await run_in_worker(profile, sheet_cleaner.clean_file, uploaded_file, output_format)
+            except QueueFull as e:
+                return busy_response(e)
+            except ValueError as e:
+                return {"error": str(e)}
+
+            if output is None:
+                return JSONResponse({"error": "Cleaning failed or required columns missing."}, headers=profile_headers(profile, "clean"))
+            workbook = output.getvalue()
+            result_cache.put(key, workbook)
+
+    output = BytesIO(workbook)
+    filename, media_type = report_download("cleaned_report", output_format)
+    return StreamingResponse(output, media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename={filename}",
+        **profile_headers(profile, "clean"),
+    })
+
+@app.post("/merge")
+async def merge_files(
+    request: Request,
+    file1: Optional[UploadFile] = File(None),
+    file2: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    output_format: str = "xlsx",
+    profile: bool = False,
+):
+    # Accepts the original file1/file2 pair and/or any number of `files`
+    uploads = [f for f in (file1, file2) if f is not None] + list(files or [])
+    if len(uploads) < 2:
+        return {"error": "Upload at least two files to merge."}
+    if output_format not in OUTPUT_FORMATS:
+        return unknown_output_format(output_format)
+
+    profile = requested_profile(request, profile)
+    async with spooled(*uploads) as file_objs:
+        key = upload_cache_key("merge", *file_objs, output_format=output_format)
+        workbook = None if profile else result_cache.get(key)
+        if workbook is None:
+            try:
+                if output_format == "xlsx" and use_out_of_core(*file_objs):
+                    output = await run_in_worker(
+                        profile,
+                        functools.partial(sheet_cleaner.sort_and_merge_out_of_core, memory_budget_mb=MEMORY_BUDGET_MB),
+                        *file_objs,
+                    )
+                else:
+                    df, output = await run_in_worker(
+                        profile, functools.partial(sheet_cleaner.sort_and_merge, output_format=output_format), *file_objs,
+                    )
+            except QueueFull as e:
+                return busy_response(e)
+            except Exception as e:
+                return {"error": str(e)}
+            workbook = output.getvalue()
+            result_cache.put(key, workbook)
 
-    return StreamingResponse(output, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={
-        "Content-Disposition": "attachment; filename=merged_report.xlsx"
+    output = BytesIO(workbook)
+    filename, media_type = report_download("merged_report", output_format)
+    return StreamingResponse(output, media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename={filename}",
+        **profile_headers(profile, "merge"),
     })
 
 @app.post("/split")
-async def split_file_by_internal_note(file: UploadFile = File(...)):
-    contents = await file.read()
-    uploaded_file = BytesIO(contents)
-    uploaded_file.name = file.filename
+async def split_file_by_internal_note(
+    request: Request, file: UploadFile = File(...), mode: str = "json", output_format: str = "xlsx", profile: bool = False,
+):
+    """
+    mode=json (default): previews, base64 data URLs and a base64 ZIP, as before
+    mode=zip: the chapter workbooks streamed back as one application/zip
+    mode=ids: workbooks kept in the job store (SHEET_CLEANER_JOB_TTL), returns ids for GET /download/{id}
+    With a columnar output_format each chapter is a ZIP of its tables instead of
+    a workbook, and mode=zip flattens them into one ZIP of tables.
+    """
+    import pandas as pd
 
-    print(f"📥 Received file: {file.filename}, size: {len(contents)} bytes")
+    if mode not in SPLIT_MODES:
+        return {"error": f"Unknown mode '{mode}'. Use one of: {', '.join(SPLIT_MODES)}."}
+    if output_format not in OUTPUT_FORMATS:
+        return unknown_output_format(output_format)
 
-    try:
-        print("📖 Reading Excel file with openpyxl...")
-        df = pd.read_excel(uploaded_file, engine='openpyxl')
-    except Exception as e:
-        return {"error": f"❌ Failed to read Excel file. Reason: {str(e)}"}
+    profile = requested_profile(request, profile)
+    async with spooled(file) as (uploaded_file,):
+        log.info("Received file: %s, size: %s bytes", file.filename, uploaded_file.size)
 
-    split_files = split_by_internal_note(df)
+        # mode only changes the response shape, so it isn't part of the key
+        key = upload_cache_key("split", uploaded_file, output_format=output_format)
+        split_files = None if profile else result_cache.get(key)
+        if split_files is None:
+            try:
+                log.info("Reading and splitting %s", file.filename)
+                split_files = await run_in_worker(profile, sheet_cleaner.split_export, uploaded_file, output_format)
+            except QueueFull as e:
+                return busy_response(e)
+            except Exception as e:
+                return {"error": f"❌ Failed to read Excel file. Reason: {str(e)}"}
+            if isinstance(split_files, dict):
+                result_cache.put(key, split_files)
 
-    print("🔍 Verifying structure of split_files...")
     if not isinstance(split_files, dict):
-        print("❌ split_by_internal_note did not return a dictionary.")
+        log.error("split_by_internal_note did not return a dictionary.")
         return {"error": "split_by_internal_note did not return a dictionary."}
 
     for note, value in split_files.items():
         if not isinstance(value, tuple) or len(value) != 2:
-            print(f"❌ Value for '{note}' is not a tuple of length 2: {value}")
+            log.error("Value for %r is not a tuple of length 2: %r", note, value)
             return {"error": f"Value for '{note}' is not a (df, file_io) tuple."}
         
         df_note, file_io = value
         
         if not isinstance(df_note, pd.DataFrame):
-            print(f"❌ First item in tuple for '{note}' is not a DataFrame.")
+            log.error("First item in tuple for %r is not a DataFrame.", note)
             return {"error": f"First item in tuple for '{note}' is not a DataFrame."}
         
         if not isinstance(file_io, BytesIO):
-            print(f"❌ Second item in tuple for '{note}' is not a BytesIO.")
+            log.error("Second item in tuple for %r is not a BytesIO.", note)
             return {"error": f"Second item in tuple for '{note}' is not a BytesIO."}
 
-    print("✅ split_by_internal_note returned valid (DataFrame, BytesIO) tuples.")
-
+    headers = profile_headers(profile, "split")
     if not split_files:
-        return {"error": "Could not split. 'Internal Note' missing or empty."}
+        return JSONResponse({"error": "Could not split. 'Internal Note' missing or empty."}, headers=headers)
 
-    preview_data = {}
-    download_links = {}  # <-- New
+    if mode == "zip":
+        # Workbooks are already deflated, so store them as-is
+        zip_data = build_split_zip(split_files, output_format, zipfile.ZIP_STORED)
+        write_debug_zip(zip_data)
+        return StreamingResponse(BytesIO(zip_data), media_type="application/zip", headers={
+            "Content-Disposition": "attachment; filename=split_reports.zip",
+            **headers,
+        })
 
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+    if mode == "ids":
+        # Kept in the job store, so they expire (and then answer 410) like job results
+        downloads = {}
         for note, (df_note, file_io) in split_files.items():
-            preview_data[note] = df_note.fillna("").replace({pd.NA: None}).to_dict(orient="records")
+            artifact_id = job_store.save_artifact(
+                "split", file_io.getvalue(), *report_download(note, output_format), ttl=job_runner.ttl, params={"note": note},
+            )
+            downloads[note] = {"id": artifact_id, "url": f"/download/{artifact_id}"}
+        if SPLIT_DEBUG_ZIP:
+            write_debug_zip(build_split_zip(split_files, output_format))
+        return JSONResponse({"downloads": downloads}, headers=headers)
 
-            file_io.seek(0)
-            b64_excel = base64.b64encode(file_io.read()).decode("utf-8")
-            download_links[note] = f"data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64_excel}"
+    preview_data = {}
+    download_links = {}  # <-- New
 
-            file_io.seek(0)
-            zf.writestr(f"{note}.xlsx", file_io.read())
+    _filename, media_type = report_download("split", output_format)
+    for note, (df_note, file_io) in split_files.items():
+        if output_format != "xlsx":
+            # Pickup dates are datetime64 in the typed tables; preview them as the CSV has them
+            dates = df_note.select_dtypes("datetime").columns
+            df_note = df_note.assign(**{col: df_note[col].dt.strftime("%Y-%m-%d") for col in dates})
+        # object first: typed columns (Arrow-backed, categorical keys) can't hold ""
+        preview_data[note] = df_note.astype(object).fillna("").replace({pd.NA: None}).to_dict(orient="records")
 
-    zip_buffer.seek(0)
-    zip_data = zip_buffer.read()
-    zip_b64 = base64.b64encode(zip_data).decode("utf-8")
+        b64_excel = base64.b64encode(file_io.getvalue()).decode("utf-8")
+        download_links[note] = f"data:{media_type};base64,{b64_excel}"
 
-    # Optional: Save debug zip
-    debug_zip_path = os.path.join("downloads", "debug_split.zip")
-    try:
-        os.makedirs("downloads", exist_ok=True)
-        with open(debug_zip_path, "wb") as f:
-            f.write(zip_data)
-        print("✅ Wrote debug_split.zip to:", debug_zip_path)
-        print("📏 Zip size (bytes):", os.path.getsize(debug_zip_path))
-    except Exception as e:
-        print("❌ Failed to write debug zip:", str(e))
+    zip_data = build_split_zip(split_files, output_format)
+    zip_b64 = base64.b64encode(zip_data).decode("utf-8")
+    write_debug_zip(zip_data)
 
     return JSONResponse(content={
         "preview": preview_data,
         "download_links": download_links,
         "zip_base64": zip_b64  # Optional
+    }, headers=headers)
+
+def build_split_zip(split_files, output_format="xlsx", compression=zipfile.ZIP_DEFLATED) -> bytes:
+    if output_format != "xlsx":
+        # One ZIP of every chapter's tables (Forsyth.parquet, Forsyth_rider_totals.parquet, ...)
+        from sheet_cleaner.columnar import flatten_bundles
+        return flatten_bundles([file_io for df_note, file_io in split_files.values()])
+    with metrics.stage("encode", vendor="split", format="zip") as stage:
+        zip_buffer = BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w", compression) as zf:
+            for note, (df_note, file_io) in split_files.items():
+                zf.writestr(f"{note}.xlsx", file_io.getvalue())
+        stage.bytes = zip_buffer.tell()
+    return zip_buffer.getvalue()
+
+def write_debug_zip(zip_data: bytes):
+    # Opt-in only (SHEET_CLEANER_DEBUG_SPLIT_ZIP=1)
+    if not SPLIT_DEBUG_ZIP:
+        return
+    debug_zip_path = os.path.join(DOWNLOAD_DIR, "debug_split.zip")
+    try:
+        with open(debug_zip_path, "wb") as f:
+            f.write(zip_data)
+        log.info("Wrote %s (%s bytes)", debug_zip_path, len(zip_data))
+    except Exception:
+        log.exception("Failed to write debug zip")
+
+@app.post("/merge-and-split")
+async def merge_and_split_files(
+    request: Request,
+    file1: Optional[UploadFile] = File(None),
+    file2: Optional[UploadFile] = File(None),
+    files: Optional[List[UploadFile]] = File(None),
+    output_format: str = "xlsx",
+    profile: bool = False,
+):
+    """
+    /merge and /split in one call, without downloading and re-uploading the
+    merged workbook: the chapters are split from the merged frame in memory.
+    Returns one ZIP: merged_report.xlsx + split/<chapter>.xlsx (or, for a
+    columnar output_format, their tables). Always built in memory.
+    """
+    uploads = [f for f in (file1, file2) if f is not None] + list(files or [])
+    if len(uploads) < 2:
+        return {"error": "Upload at least two files to merge."}
+    if output_format not in OUTPUT_FORMATS:
+        return unknown_output_format(output_format)
+
+    profile = requested_profile(request, profile)
+    async with spooled(*uploads) as file_objs:
+        key = upload_cache_key("merge_and_split", *file_objs, output_format=output_format)
+        zip_data = None if profile else result_cache.get(key)
+        if zip_data is None:
+            try:
+                output = await run_in_worker(
+                    profile, functools.partial(sheet_cleaner.merge_and_split, output_format=output_format), *file_objs,
+                )
+            except QueueFull as e:
+                return busy_response(e)
+            except Exception as e:
+                return {"error": str(e)}
+            zip_data = output.getvalue()
+            result_cache.put(key, zip_data)
+
+    return StreamingResponse(BytesIO(zip_data), media_type="application/zip", headers={
+        "Content-Disposition": "attachment; filename=merge_and_split_reports.zip",
+        **profile_headers(profile, "merge_and_split"),
     })
-    
+
+@app.post("/batch")
+async def batch_files(files: List[UploadFile] = File(...), outputs: str = "cleaned,merged,split"):
+    """
+    Any number of Uber / Lyft / Common Courtesy exports in, one ZIP out.
+    outputs: comma-separated subset of cleaned, merged, split
+    Each file is parsed once; the outputs share the parsed frames.
+    """
+    wanted = [o.strip() for o in outputs.split(",") if o.strip()]
+    if not wanted or any(o not in BATCH_OUTPUTS for o in wanted):
+        return {"error": f"Unknown outputs '{outputs}'. Use any of: {', '.join(BATCH_OUTPUTS)}."}
+
+    async with spooled(*files) as file_objs:
+        # Names end up in the ZIP (cleaned/<name>_cleaned.xlsx), so they are part of the key
+        key = upload_cache_key("batch", *file_objs, outputs=wanted, names=[f.name for f in file_objs])
+        zip_data = result_cache.get(key)
+        if zip_data is None:
+            try:
+                output = await executor.run(sheet_cleaner.run_batch, file_objs, wanted)
+            except QueueFull as e:
+                return busy_response(e)
+            except ValueError as e:
+                return {"error": str(e)}
+            zip_data = output.getvalue()
+            result_cache.put(key, zip_data)
+
+    return StreamingResponse(BytesIO(zip_data), media_type="application/zip", headers={
+        "Content-Disposition": "attachment; filename=batch_reports.zip"
+    })
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    operation: str,
+    files: List[UploadFile] = File(...),
+    outputs: str = "cleaned,merged,split",
+    output_format: str = "xlsx",
+):
+    """
+    Queues clean / merge / split / batch and returns at once with the job id.
+    Poll GET /jobs/{id} for status and stage; fetch GET /jobs/{id}/result when done.
+    """
+    if operation not in JOB_OPERATIONS:
+        return JSONResponse(status_code=400, content={"error": f"Unknown operation '{operation}'. Use one of: {', '.join(JOB_OPERATIONS)}."})
+    if operation in ("clean", "split") and len(files) != 1:
+        return JSONResponse(status_code=400, content={"error": f"'{operation}' takes exactly one file."})
+    if operation == "merge" and len(files) < 2:
+        return JSONResponse(status_code=400, content={"error": "Upload at least two files to merge."})
+
+    params = {}
+    if operation in ("clean", "merge", "split"):
+        if output_format not in OUTPUT_FORMATS:
+            return unknown_output_format(output_format)
+        params["output_format"] = output_format
+    if operation == "batch":
+        params["outputs"] = [o.strip() for o in outputs.split(",") if o.strip()]
+        if not params["outputs"] or any(o not in BATCH_OUTPUTS for o in params["outputs"]):
+            return JSONResponse(status_code=400, content={"error": f"Unknown outputs '{outputs}'. Use any of: {', '.join(BATCH_OUTPUTS)}."})
+
+    job_id = job_store.new_id()
+    file_objs = []
+    try:
+        for upload in files:
+            file_objs.append(await spool_upload(upload, dir=job_store.job_dir(job_id)))
+    except BaseException:
+        for file_obj in file_objs:
+            file_obj.discard()
+        shutil.rmtree(job_store.job_dir(job_id), ignore_errors=True)
+        raise
+    for file_obj in file_objs:
+        file_obj.close()
+
+    if operation in ("clean", "merge") and output_format == "xlsx" and use_out_of_core(*file_objs):
+        params.update(out_of_core=True, memory_budget_mb=MEMORY_BUDGET_MB)
+    job_store.create(job_id, operation, file_objs, params)
+    job_runner.notify()
+    return {"id": job_id, "status": "queued", "url": f"/jobs/{job_id}"}
+
+def job_status(job):
+    status = {
+        "id": job["id"],
+        "operation": job["operation"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "stages": job["stages"],
+        "attempts": job["attempts"],
+        "files": [i["name"] for i in job["inputs"]],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "expires_at": job["expires_at"],
+    }
+    if job["status"] == "done":
+        status["result_url"] = f"/jobs/{job['id']}/result"
+    if job["status"] == "failed":
+        status["error"] = job["error"]
+    return status
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job_artifact(job)
+
+def job_artifact(job):
+    if job["status"] == "expired":
+        return JSONResponse(status_code=410, content={"error": "The result of this job has expired."})
+    if job["status"] != "done" or not os.path.isfile(job["artifact"]):
+        return JSONResponse(status_code=409, content={"error": f"Job is {job['status']}.", **job_status(job)})
+    return FileResponse(path=job["artifact"], filename=job["artifact_name"], media_type=job["media_type"])
+
+def profile_path(profile_id, filename):
+    # ids are uuid4 hex; anything else never reaches the filesystem
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id, filename)
+    return path if os.path.isfile(path) else None
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Summary and top-N table (by own time) of a profiled request."""
+    path = profile_path(profile_id, "profile.json")
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return FileResponse(path, media_type="application/json")
+
+@app.get("/profiles/{profile_id}/collapsed")
+async def get_profile_collapsed(profile_id: str):
+    """Collapsed stacks (milliseconds), for flamegraph.pl or speedscope."""
+    path = profile_path(profile_id, "collapsed.txt")
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed.txt")
+
+@app.get("/profiles/{profile_id}/top")
+async def get_profile_top(profile_id: str):
+    path = profile_path(profile_id, "top.txt")
+    if path is None:
+        return JSONResponse(status_code=404, content={"error": "Profile not found"})
+    return FileResponse(path, media_type="text/plain")
+
 @app.get("/download/{filename}")
 async def download_file(filename: str):
+    # /split?mode=ids artifacts; other names are files saved under downloads/
+    job = job_store.get(filename) if re.fullmatch(r"[0-9a-f]{32}", filename) else None
+    if job is not None:
+        return job_artifact(job)
     file_path = os.path.join(DOWNLOAD_DIR, filename)
-    if os.path.exists(file_path):
-        return FileResponse(path=file_path, filename=filename, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    if os.path.isfile(file_path):
+        media_type = XLSX_MEDIA_TYPE if filename.endswith(".xlsx") else "application/zip"
+        return FileResponse(path=file_path, filename=filename, media_type=media_type)
     return {"error": "File not found"}
@@ -0,0 +1,42 @@
+"""
+Cleaning engine for the monthly Uber / Lyft / Common Courtesy ride reports.
+
+Used by the FastAPI service (main.py) and the Streamlit app
+(streamlit_excel_cleaner.py). Submodules, and with them pandas and the Excel
+libraries, are only imported the first time one of the names below is used.
+"""
+import importlib
+
+_exports = {
+    "clean_file": "cleaning",
+    "clean_file_without_headers": "cleaning",
+    "clean_and_sort": "cleaning",
+    "sort_and_merge": "cleaning",
+    "clean_file_out_of_core": "external",
+    "sort_and_merge_out_of_core": "external",
+    "run_batch": "batch",
+    "merge_and_split": "batch",
+    "split_by_internal_note": "split",
+    "split_export": "split",
+    "sniff": "ingest",
+    "read_export": "ingest",
+    "VendorSchema": "vendors",
+    "register_vendor": "vendors",
+    "build_rider_subtotals": "grouping",
+    "merge_sorted_frames": "grouping",
+    "write_styled_sheet": "writer",
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_exports[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
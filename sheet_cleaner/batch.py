@@ -0,0 +1,164 @@
+# sheet_cleaner/batch.py
+# Month-end run in one call: clean / merge / split many exports, each parsed once
+import json
+import os
+import zipfile
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .ingest import read_export
+from .cleaning import (
+    clean_and_sort_many, clean_columns, clean_report, merge_report, merged_report, merged_rows,
+    sort_by_rider, standardize_columns, standardize_frame,
+)
+from .columnar import check_output_format, copy_tables
+from .split import split_by_internal_note
+
+BATCH_OUTPUTS = ["cleaned", "merged", "split"]
+
+
+def _batch_columns(sniffed):
+    # One parse has to serve both clean_report() and standardize_frame()
+    keep_clean, keep_standard = clean_columns(sniffed), standardize_columns(sniffed)
+    if keep_standard is None:
+        return None
+    return lambda name: keep_clean(name) or keep_standard(name)
+
+
+def _parse(file_obj):
+    if not file_obj.name.endswith((".csv", ".xlsx")):
+        raise ValueError("Unsupported file format")
+    df, sniffed = read_export(file_obj, project=_batch_columns)
+    if df is None:
+        raise ValueError("Unable to load or clean the file.")
+    return df, sniffed
+
+
+def _report_name(file_name, used):
+    stem = os.path.splitext(os.path.basename(file_name or "export"))[0]
+    name, n = f"cleaned/{stem}_cleaned.xlsx", 1
+    while name in used:
+        n += 1
+        name = f"cleaned/{stem}_cleaned_{n}.xlsx"
+    used.add(name)
+    return name
+
+
+def _input_labels(file_objs):
+    # errors.json keys: the upload names, numbered when a name repeats
+    used, labels = {"merged"}, []
+    for file_obj in file_objs:
+        label, n = file_obj.name or "export", 1
+        while label in used:
+            n += 1
+            label = f"{file_obj.name or 'export'} ({n})"
+        used.add(label)
+        labels.append(label)
+    return labels
+
+
+def run_batch(file_objs, outputs=BATCH_OUTPUTS, progress=None):
+    """
+    Parses every export once and builds the requested outputs from the shared
+    frames, reusing the clean_file() / sort_and_merge() / split_by_internal_note()
+    logic:
+      - "cleaned": cleaned/<file>_cleaned.xlsx per input (clean_file() report)
+      - "merged":  merged_report.xlsx over all inputs (sort_and_merge() report)
+      - "split":   split/<chapter>.xlsx from the merged report, as the Streamlit app does
+    Inputs that can't be used are listed in errors.json instead of failing the batch
+    (keyed by upload name, numbered when a name repeats: "a.csv", "a.csv (2)").
+    progress(stage), when given, is told each stage as it starts.
+    Returns: BytesIO (ZIP)
+    """
+    progress = progress or (lambda stage: None)
+    outputs = list(dict.fromkeys(outputs))
+    unknown = [o for o in outputs if o not in BATCH_OUTPUTS]
+    if unknown or not outputs:
+        raise ValueError(f"Unknown outputs {unknown}. Use any of: {', '.join(BATCH_OUTPUTS)}.")
+    if not file_objs:
+        raise ValueError("No files in the batch.")
+
+    errors = {}
+    parsed = []
+    progress("parsing")
+    with ThreadPoolExecutor(max_workers=min(len(file_objs), os.cpu_count() or 1)) as pool:
+        futures = [pool.submit(_parse, file_obj) for file_obj in file_objs]
+        for file_obj, label, future in zip(file_objs, _input_labels(file_objs), futures):
+            try:
+                parsed.append((file_obj.name, label, *future.result()))
+            except Exception as e:
+                errors[label] = str(e)
+
+    zip_buffer = BytesIO()
+    # Workbooks are already deflated, so store them as-is
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zf:
+        if "cleaned" in outputs:
+            used = set()
+            for name, label, df, sniffed in parsed:
+                # shallow copies: the clean and merge paths each modify their own frame
+                progress(f"cleaning: {label}")
+                _final_df, output = clean_report(df.copy(deep=False), sniffed)
+                if output is None:
+                    errors[label] = "Cleaning failed or required columns missing."
+                    continue
+                zf.writestr(_report_name(name, used), output.getvalue())
+
+        if ("merged" in outputs or "split" in outputs) and parsed:
+            try:
+                frames = [sort_by_rider(standardize_frame(df.copy(deep=False), sniffed)) for _name, _label, df, sniffed in parsed]
+                merged_df, merged_output = merge_report(frames, progress)
+            except Exception as e:
+                errors["merged"] = str(e)
+            else:
+                if "merged" in outputs:
+                    zf.writestr("merged_report.xlsx", merged_output.getvalue())
+                if "split" in outputs:
+                    with metrics.labels(vendor="merged", format="merged"):
+                        split_files = split_by_internal_note(merged_df, progress)
+                    for note, (_df_note, file_io) in split_files.items():
+                        zf.writestr(f"split/{note}.xlsx", file_io.getvalue())
+
+        if errors:
+            zf.writestr("errors.json", json.dumps(errors, indent=2))
+
+    zip_buffer.seek(0)
+    return zip_buffer
+
+
+def merge_and_split(*file_objs, output_format="xlsx"):
+    """
+    sort_and_merge() and split_by_internal_note() in one call: the chapters are
+    split from the merged frame in memory, as the Streamlit app does, instead
+    of from a re-uploaded merged_report.xlsx.
+      - xlsx: merged_report.xlsx + split/<chapter>.xlsx
+      - parquet / arrow / csv: the merged and merged_rider_totals tables +
+        split/<chapter> and split/<chapter>_rider_totals
+    Returns: BytesIO (ZIP)
+    """
+    if not file_objs:
+        raise ValueError("No files to merge.")
+    check_output_format(output_format)
+    frames = clean_and_sort_many(file_objs)
+    with metrics.labels(vendor="merged", format="merged"):
+        rows = merged_rows(frames)
+        merged_df, merged_output = merged_report(rows, output_format=output_format)
+        # The typed merged table has no "Fares Only" column for the Forsyth
+        # billing, so columnar chapters are split from the rows it was built from
+        split_source = merged_df if output_format == "xlsx" else rows
+        split_files = split_by_internal_note(split_source, output_format=output_format)
+
+    zip_buffer = BytesIO()
+    # Workbooks and Parquet files are already compressed; write_tables() deflated the rest
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zf:
+        if output_format == "xlsx":
+            zf.writestr("merged_report.xlsx", merged_output.getvalue())
+            for note, (_df_note, file_io) in split_files.items():
+                zf.writestr(f"split/{note}.xlsx", file_io.getvalue())
+        else:
+            copy_tables(zf, merged_output)
+            for _df_note, file_io in split_files.values():
+                copy_tables(zf, file_io, prefix="split/")
+
+    zip_buffer.seek(0)
+    return zip_buffer
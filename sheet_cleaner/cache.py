@@ -0,0 +1,175 @@
+# sheet_cleaner/cache.py
+# Content-addressed cache for finished results (memory LRU + optional disk tier)
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(operation, digests, params=None):
+    """
+    SHA-256 over the operation name, its parameters and the SHA-256 of every
+    input, in order (merging A then B is not the same job as B then A).
+    """
+    h = hashlib.sha256()
+    h.update(operation.encode())
+    h.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    for digest in digests:
+        h.update(digest.encode())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    Values are stored pickled, so every get() hands back a fresh copy (callers
+    can seek/consume BytesIO results freely) and sizes are exact.
+
+    - memory tier: LRU bounded by max_bytes
+    - disk tier (optional, disk_dir): one file per key, oldest evicted first
+      once the directory passes disk_max_bytes
+    - entries older than ttl seconds are treated as misses in both tiers
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, ttl=3600, disk_dir=None, disk_max_bytes=1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (stored_at, blob)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.disk_dir)
+
+    # --- memory tier ---
+
+    def _evict_memory(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _key, (_stored_at, blob) = self._entries.popitem(last=False)
+            self._bytes -= len(blob)
+            self.counters["evictions"] += 1
+
+    def _remember(self, key, stored_at, blob):
+        if len(blob) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[1])
+        self._entries[key] = (stored_at, blob)
+        self._bytes += len(blob)
+        self._evict_memory()
+
+    # --- disk tier ---
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pickle")
+
+    def _read_disk(self, key):
+        # -> (seconds since the file was written, blob) | None
+        path = self._disk_path(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.ttl:
+                os.unlink(path)
+                return None
+            with open(path, "rb") as f:
+                return age, f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, blob):
+        # write-then-rename so other server processes never see half a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, self._disk_path(key))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        now = time.time()
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".pickle"):
+                continue
+            # Other server processes sharing the directory may delete files under us
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > self.ttl:
+                    os.unlink(entry.path)
+                    self.counters["evictions"] += 1
+                    continue
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _mtime, size, _path in files)
+        for _mtime, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.counters["evictions"] += 1
+
+    # --- public API ---
+
+    def get(self, key):
+        """Cached value for key, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._bytes -= len(entry[1])
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return pickle.loads(entry[1])
+
+            found = self._read_disk(key) if self.disk_dir else None
+            if found is None:
+                self.counters["misses"] += 1
+                return None
+            age, blob = found
+            self.counters["disk_hits"] += 1
+            # Keeps the disk file's age, so re-reading never extends the TTL
+            self._remember(key, time.monotonic() - age, blob)
+        return pickle.loads(blob)
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self.counters["stores"] += 1
+            if self.max_bytes > 0:
+                self._remember(key, time.monotonic(), blob)
+            if self.disk_dir:
+                self._write_disk(key, blob)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            hits = lookups - self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "disk": bool(self.disk_dir),
+            }
@@ -0,0 +1,331 @@
+# sheet_cleaner/cleaning.py
+# Loading, cleaning and merging of Uber / Lyft / Common Courtesy exports
+import logging
+import os
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .schemas import transaction_columns, desired_columns, standard_rename_map
+from . import metrics
+from .ingest import sniff, read_export
+from .keys import normalize_keys, has_note, sort_by_rider
+from .grouping import append_total_row, build_rider_subtotals, merge_sorted_frames
+from .writer import write_styled_sheet
+from .columnar import check_output_format, report_tables
+
+log = logging.getLogger(__name__)
+
+def detect_header(uploaded_file):
+    """Header row of a Common Courtesy CSV (None when it isn't one)."""
+    sniffed = sniff(uploaded_file)
+    return sniffed.header_row if sniffed.vendor == "common_courtesy" else None
+
+def load_headerless_uber_lyft(file_obj):
+    """
+    Reads a CSV/XLSX *without headers* and assigns Uber vs Lyft headers,
+    then returns the standardized cleaned df (via clean_file_without_headers()).
+    Returns: pd.DataFrame | None
+    """
+    df, sniffed = read_export(file_obj, project=standardize_columns)
+    if df is None or not sniffed.headerless:
+        return None
+    return clean_file_without_headers(df)
+
+def clean_file_without_headers(df, rename_map=standard_rename_map):
+    
+    # Eliminate unwanted name columns
+    name_headers = ["First Name", "Last Name", "Guest First Name", "Guest Last Name"]
+
+    if all(header in df.columns for header in name_headers):
+        log.debug("Guest name columns present: dropping First/Last Name in their favour")
+        df = df.drop(columns=["First Name", "Last Name"])
+        df = df.rename(columns={
+            "Guest First Name": "First Name",
+            "Guest Last Name": "Last Name"
+        })
+
+    # Rename columns if applicable
+    df = df.rename(columns=rename_map)
+
+    if 'Ride Status' in df.columns and 'Transaction Type' in df.columns:
+        df['Transaction Type'] = df['Ride Status'].combine_first(df['Transaction Type'])
+        df.drop(['Ride Status'], axis=1, inplace=True)
+    elif 'Ride Status' in df.columns:
+        df.rename(columns={"Ride Status": "Transaction Type"}, inplace=True)
+
+    if 'Email' in df.columns and 'Requester Email' in df.columns:
+        df['Email Info'] = df['Email'].combine_first(df['Requester Email'])
+        df.drop(['Email', 'Requester Email'], axis=1, inplace=True)
+    elif 'Email' in df.columns:
+        df.rename(columns={"Email": "Email Info"}, inplace=True)
+    elif 'Requester Email' in df.columns:
+        df.rename(columns={"Requester Email": "Email Info"}, inplace=True)
+
+    # Keep only the desired columns that exist in the DataFrame
+    final_df = df[[col for col in desired_columns if col in df.columns]].copy()
+        
+    return final_df
+
+def clean_frame(df, sniffed, verbose=True):
+    """
+    The row filter / column projection half of clean_file(): standardizes the
+    names, drops rows without an Internal Note and hides unwanted columns.
+    Works on a whole export or on any chunk of one.
+    Returns: pd.DataFrame | None  (None when required columns are missing)
+    """
+    with metrics.stage("filter", rows=len(df), vendor=sniffed.vendor, format=sniffed.kind):
+        return _clean_frame(df, sniffed, verbose)
+
+def _clean_frame(df, sniffed, verbose):
+    # The column lists are only built when DEBUG logging is on
+    debug = verbose and log.isEnabledFor(logging.DEBUG)
+
+    header_row = sniffed.header_row
+    schema = sniffed.schema
+    is_common_courtesy = sniffed.vendor == "common_courtesy"
+
+    # --- Common Courtesy ---
+    if is_common_courtesy:
+        if 'Guest First Name' in df.columns:
+            df['First Name'] = df['Guest First Name']
+        if 'Guest Last Name' in df.columns:
+            df['Last Name'] = df['Guest Last Name']
+        df.drop(columns=['Guest First Name', 'Guest Last Name'], inplace=True, errors='ignore')
+
+    # --- Headerless Uber/Lyft (vendor headers already assigned) ---
+    elif sniffed.headerless:
+        df = clean_file_without_headers(df, schema.standard_rename_map)
+
+    if debug:
+        log.debug("Header row detected at: %s", header_row if header_row is not None else "none (headerless)")
+        log.debug("Columns after cleanup: %s", df.columns.tolist())
+        log.debug("Are columns unique?: %s", df.columns.is_unique)
+        log.debug("DataFrame shape: %s", df.shape)
+
+    # Eliminate unwanted name columns
+    name_headers = ["First Name", "Last Name", "Guest First Name", "Guest Last Name"]
+    if all(header in df.columns for header in name_headers):
+        log.debug("Guest name columns present: dropping First/Last Name in their favour")
+        df = df.drop(columns=["First Name", "Last Name"])
+        df = df.rename(columns={
+            "Guest First Name": "First Name",
+            "Guest Last Name": "Last Name"
+        })
+
+    note_column = next((col for col in ['Internal Note', 'Expense Memo'] if col in df.columns), None)
+    required_cols = ['First Name', 'Last Name']
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if note_column is None:
+        missing_cols.append('Internal Note or Expense Memo')
+
+    if missing_cols:
+        if verbose:
+            log.warning("Missing required columns: %s", missing_cols)
+        return None
+
+    df_filtered = df[df[note_column].notna() & (df[note_column].astype(str).str.strip() != "")]
+
+    # The vendor's hidden columns (Common Courtesy keeps Email, drops Transaction Type)
+    df_filtered = df_filtered.drop(columns=[col for col in df_filtered.columns if col in schema.hidden])
+
+    if debug:
+        log.debug("Columns before rename/drop: %s", df_filtered.columns.tolist())
+    df_filtered.rename(columns=schema.rename_map, inplace=True)
+    df_filtered = df_filtered.loc[:, ~df_filtered.columns.duplicated()]
+    if debug:
+        log.debug("Columns after renaming: %s", df_filtered.columns.tolist())
+
+    # If Passenger Number is missing, make it blank to keep grouping stable
+    if "Passenger Number" not in df_filtered.columns:
+        df_filtered["Passenger Number"] = ""
+
+    # Strip the rider keys once; sorting and grouping reuse the result
+    return normalize_keys(df_filtered)
+
+def _quiet(*args):
+    pass
+
+def clean_columns(sniffed):
+    """
+    Parse-time projection for clean_frame(): every column it doesn't hide
+    (the headerless path only ever reads the standard source columns).
+    Returns: column-name predicate for read_export(project=...)
+    """
+    if sniffed.headerless:
+        return standardize_columns(sniffed)
+    hidden = sniffed.schema.hidden
+    return lambda name: name not in hidden
+
+def standardize_columns(sniffed):
+    """
+    Parse-time projection for standardize_frame(): Uber/Lyft exports only need
+    the columns clean_file_without_headers() reads; Common Courtesy keeps all.
+    Returns: column-name predicate | None
+    """
+    standard_columns = sniffed.schema.standard_columns
+    return None if standard_columns is None else standard_columns.__contains__
+
+def clean_file(uploaded_file, output_format="xlsx"):
+    check_output_format(output_format)
+    try:
+        log.info("File received: %s (%s, %s bytes)", uploaded_file.name, uploaded_file.type, uploaded_file.size)
+
+        # One sniff + one parse, whatever the vendor / layout
+        df, sniffed = read_export(uploaded_file, project=clean_columns)
+        if df is None:
+            return (None, None)
+
+        return clean_report(df, sniffed, output_format=output_format)
+
+    except Exception:
+        log.exception("Cleaning %s failed", uploaded_file.name)
+        return (None, None)
+
+def clean_report(df, sniffed, progress=_quiet, output_format="xlsx"):
+    """
+    The clean_file() report from an already parsed export: cleaned, sorted by
+    rider, with per-rider subtotals and the Fares Only grand total.
+    progress(stage) is called as it moves on to "grouping" and "writing".
+    output_format "parquet" / "arrow" / "csv" gives a ZIP of typed tables
+    instead of the workbook: cleaned + cleaned_rider_totals (see columnar.py).
+    Returns: (pd.DataFrame, BytesIO) | (None, None) when required columns are missing
+    """
+    with metrics.labels(vendor=sniffed.vendor, format=sniffed.kind):
+        return _clean_report(df, sniffed, progress, output_format)
+
+def _clean_report(df, sniffed, progress, output_format):
+    progress("grouping")
+    df_filtered = clean_frame(df, sniffed)
+    if df_filtered is None:
+        return (None, None)
+
+    df_filtered_sorted = sort_by_rider(df_filtered)
+
+    if output_format != "xlsx":
+        progress("writing")
+        return report_tables("cleaned", df_filtered_sorted, transaction_columns, output_format)
+
+    df_values = df_filtered_sorted.reset_index(drop=True)
+    transaction_col = next((col for col in transaction_columns if col in df_values.columns), None)
+    df_values["Fares Only"] = df_values[transaction_col] if transaction_col else ""
+
+    final_df = build_rider_subtotals(df_values)
+
+    # ✅ Add final grand total row for Fares Only (guard if missing)
+    if "Fares Only" in final_df.columns:
+        fares_total = pd.to_numeric(final_df["Fares Only"], errors="coerce").sum()
+        final_df = append_total_row(final_df, "Fares Only", round(fares_total, 2))
+
+    if "Fares Only" in final_df.columns:
+        final_df = final_df[[col for col in final_df.columns if col != "Fares Only"] + ["Fares Only"]]
+
+    progress("writing")
+    output = BytesIO()
+    write_styled_sheet(final_df, output, "CleanedData", note_fills=True, borders=True)
+
+    output.seek(0)
+    return (final_df, output)
+
+def clean_and_sort(file_obj):
+    """
+    Loads one export, standardizes its columns and drops rows without an
+    Internal Note. Returns: pd.DataFrame sorted by rider.
+    """
+    if not file_obj.name.endswith((".csv", ".xlsx")):
+        raise ValueError("Unsupported file format")
+
+    df, sniffed = read_export(file_obj, project=standardize_columns)
+    if df is None:
+        raise ValueError("Unable to load or clean the file.")
+
+    with metrics.labels(vendor=sniffed.vendor, format=sniffed.kind):
+        return sort_by_rider(standardize_frame(df, sniffed))
+
+def standardize_frame(df, sniffed):
+    """
+    The per-row half of clean_and_sort(): standard columns, stripped rider keys,
+    rows without an Internal Note dropped. Works on a whole export or a chunk.
+    Returns: pd.DataFrame (unsorted)
+    """
+    with metrics.stage("filter", rows=len(df), vendor=sniffed.vendor, format=sniffed.kind):
+        if sniffed.vendor != "common_courtesy":
+            df = clean_file_without_headers(df, sniffed.schema.standard_rename_map)
+
+        df = normalize_keys(df)
+
+        if 'Internal Note' in df.columns:
+            df = df[has_note(df)]
+
+    return df
+
+def sort_and_merge(*file_objs, output_format="xlsx"):
+    """
+    Cleans any number of exports (parsed concurrently), merges them by rider and
+    builds the styled workbook with per-rider subtotals (or, for a columnar
+    output_format, the merged + merged_rider_totals tables).
+    Returns: (pd.DataFrame, BytesIO)
+    """
+    if not file_objs:
+        raise ValueError("No files to merge.")
+    check_output_format(output_format)
+    return merge_report(clean_and_sort_many(file_objs), output_format=output_format)
+
+def clean_and_sort_many(file_objs):
+    """clean_and_sort() for each export, parsed concurrently. Returns: list[pd.DataFrame]"""
+    with ThreadPoolExecutor(max_workers=min(len(file_objs), os.cpu_count() or 1)) as pool:
+        return list(pool.map(clean_and_sort, file_objs))
+
+def merge_report(frames, progress=_quiet, output_format="xlsx"):
+    """
+    The sort_and_merge() report from frames that are each standardized and
+    sorted by rider (clean_and_sort() output).
+    progress(stage) is called as it moves on to "grouping" and "writing".
+    Returns: (pd.DataFrame, BytesIO)
+    """
+    # Frames may come from several vendors: the merged stages are labelled "merged"
+    with metrics.labels(vendor="merged", format="merged"):
+        return _merge_report(frames, progress, output_format)
+
+def _merge_report(frames, progress, output_format):
+    progress("grouping")
+    return merged_report(merged_rows(frames), progress, output_format)
+
+def merged_rows(frames):
+    """
+    The rider-sorted rows of all frames plus the "Fares Only" column the merged
+    report totals and split_by_internal_note() bills from.
+    Returns: pd.DataFrame
+    """
+    df_values = merge_sorted_frames(frames).reset_index(drop=True)
+    transaction_col = next((col for col in transaction_columns if col in df_values.columns), None)
+    df_values["Fares Only"] = df_values[transaction_col] if transaction_col else ""
+    return df_values
+
+def merged_report(df_values, progress=_quiet, output_format="xlsx"):
+    """
+    The merged report (workbook, or the merged + merged_rider_totals tables)
+    from merged_rows() output.
+    Returns: (pd.DataFrame, BytesIO)
+    """
+    if output_format != "xlsx":
+        progress("writing")
+        return report_tables("merged", df_values, transaction_columns, output_format, drop=["Fares Only"])
+
+    final_df = build_rider_subtotals(df_values)
+
+    # ✅ Add final grand total row for Fares Only
+    fares_total = pd.to_numeric(final_df["Fares Only"], errors="coerce").sum()
+    final_df = append_total_row(final_df, "Fares Only", round(fares_total, 2))
+
+    # Move 'Fares Only' to the last column
+    if "Fares Only" in final_df.columns:
+        final_df = final_df[[col for col in final_df.columns if col != "Fares Only"] + ["Fares Only"]]
+
+    progress("writing")
+    output = BytesIO()
+    write_styled_sheet(final_df, output, "CleanedData", note_fills=True, borders=True)
+
+    output.seek(0)
+    return final_df, output
@@ -0,0 +1,157 @@
+# sheet_cleaner/columnar.py
+# Machine-readable report outputs: typed rows + per-rider totals as Parquet / Arrow IPC / CSV
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .grouping import rider_group_ids
+from .ingest import pyarrow_available
+from .keys import drop_key_columns
+from .schemas import date_columns, numeric_columns, rider_key_columns
+
+OUTPUT_FORMATS = ["xlsx", "parquet", "arrow", "csv"]
+COLUMNAR_FORMATS = OUTPUT_FORMATS[1:]
+
+_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def check_output_format(output_format):
+    """Raises ValueError for an unknown format, or Parquet / Arrow without pyarrow."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Use one of: {', '.join(OUTPUT_FORMATS)}.")
+    if output_format in ("parquet", "arrow") and not pyarrow_available():
+        raise ValueError(f"The {output_format} output format needs pyarrow (pip install pyarrow).")
+    return output_format
+
+
+def is_columnar(output_format):
+    return check_output_format(output_format) != "xlsx"
+
+
+def _dates(column):
+    # Only when every value parses; otherwise the export's own strings are kept
+    # (the format is inferred from the first value; a mix of formats stays text)
+    parsed = pd.to_datetime(column, errors="coerce")
+    if (parsed.isna() & column.notna() & (column.astype("string").str.strip() != "")).any():
+        return column.astype("string")
+    return parsed
+
+
+def typed_rows(df):
+    """
+    The report's data rows with real column types instead of the workbook's
+    cell values: amounts / distances float64, pickup dates datetime64 (when
+    they all parse), everything else nullable strings. Arrow-backed columns
+    (SHEET_CLEANER_DTYPE_BACKEND=pyarrow) are passed through as they are.
+    No subtotal or spacer rows.
+    Returns: pd.DataFrame
+    """
+    df = drop_key_columns(df).reset_index(drop=True)
+    typed = {}
+    for col in df.columns:
+        column = df[col]
+        arrow = isinstance(column.dtype, pd.ArrowDtype)
+        if col in numeric_columns:
+            if arrow and pd.api.types.is_numeric_dtype(column.dtype):
+                typed[col] = column
+            else:
+                typed[col] = pd.to_numeric(column, errors="coerce").astype("float64")
+        elif col in date_columns:
+            typed[col] = _dates(column)
+        elif arrow or (pd.api.types.is_numeric_dtype(column.dtype) and not pd.api.types.is_bool_dtype(column.dtype)):
+            typed[col] = column
+        else:
+            typed[col] = column.astype("string")
+    return pd.DataFrame(typed, index=df.index)
+
+
+def rider_totals(df, total_columns):
+    """
+    One row per rider group (the groups build_rider_subtotals() puts a totals
+    row under): the rider key, Trips Count and the rounded sum of each
+    total column that is present.
+    Returns: pd.DataFrame
+    """
+    df = df.reset_index(drop=True)
+    keys = [col for col in rider_key_columns if col in df.columns]
+    totals = [col for col in dict.fromkeys(total_columns) if col and col in df.columns]
+    if df.empty:
+        return pd.DataFrame({col: pd.Series(dtype="string") for col in keys}
+                            | {"Trips Count": pd.Series(dtype="int64")}
+                            | {col: pd.Series(dtype="float64") for col in totals})
+
+    group_ids = rider_group_ids(df)
+    first_rows = np.flatnonzero(np.r_[True, group_ids[1:] != group_ids[:-1]])
+    table = {col: df[col].take(first_rows).astype("string").reset_index(drop=True) for col in keys}
+    table["Trips Count"] = np.bincount(group_ids)
+    for col in totals:
+        amounts = pd.to_numeric(df[col], errors="coerce")
+        table[col] = np.round(amounts.groupby(group_ids).sum().to_numpy(dtype="float64"), 2)
+    return pd.DataFrame(table)
+
+
+def _table_bytes(df, output_format):
+    buffer = io.BytesIO()
+    if output_format == "parquet":
+        df.to_parquet(buffer, index=False)
+    elif output_format == "arrow":
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        df.to_csv(buffer, index=False, date_format="%Y-%m-%d")
+    return buffer.getvalue()
+
+
+def write_tables(tables, output_format):
+    """
+    {name: DataFrame} -> ZIP with one <name>.<ext> per table. Parquet is
+    stored as-is (already compressed), Arrow IPC and CSV are deflated.
+    Returns: BytesIO
+    """
+    check_output_format(output_format)
+    compression = zipfile.ZIP_STORED if output_format == "parquet" else zipfile.ZIP_DEFLATED
+    output = io.BytesIO()
+    with metrics.stage("write", rows=sum(len(df) for df in tables.values())) as stage:
+        with zipfile.ZipFile(output, "w", compression) as zf:
+            for name, df in tables.items():
+                zf.writestr(name + _EXTENSIONS[output_format], _table_bytes(df, output_format))
+        stage.bytes = output.tell()
+    output.seek(0)
+    return output
+
+
+def report_tables(name, df_sorted, total_columns, output_format, drop=()):
+    """
+    The columnar counterpart of a styled report: <name> (typed rows) and
+    <name>_rider_totals, written with write_tables().
+    Returns: (pd.DataFrame typed rows, BytesIO)
+    """
+    totals = rider_totals(df_sorted, total_columns)
+    rows = typed_rows(df_sorted.drop(columns=[col for col in drop if col in df_sorted.columns]))
+    return rows, write_tables({name: rows, f"{name}_rider_totals": totals}, output_format)
+
+
+def copy_tables(out, bundle, prefix=""):
+    """Adds a write_tables() ZIP's tables to the open ZipFile `out`, each compressed as before."""
+    with zipfile.ZipFile(io.BytesIO(bundle.getvalue())) as zf:
+        for info in zf.infolist():
+            out.writestr(prefix + info.filename, zf.read(info), compress_type=info.compress_type)
+
+
+def flatten_bundles(bundles):
+    """
+    Several write_tables() ZIPs -> one ZIP holding all their tables (the table
+    names are already distinct, e.g. Forsyth.parquet, Fulton_rider_totals.parquet).
+    Returns: bytes
+    """
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w") as out:
+        for bundle in bundles:
+            copy_tables(out, bundle)
+    return output.getvalue()
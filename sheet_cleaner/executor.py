@@ -0,0 +1,132 @@
+# sheet_cleaner/executor.py
+# Process pool with a bounded backlog for the CPU-heavy cleaning jobs
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import metrics
+
+
+class QueueFull(Exception):
+    """Raised when every worker is busy and the backlog is at its limit."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many files are being processed right now. Please retry shortly.")
+        self.retry_after = retry_after
+
+
+def _warm_up():
+    # Pay the pandas / engine import once per worker, not on its first job
+    metrics.configure_logging()
+    for module in ("sheet_cleaner.cleaning", "sheet_cleaner.split"):
+        importlib.import_module(module)
+
+
+def _call(fn, *args):
+    # Runs in the worker: the stage metrics recorded there travel back with the
+    # result (a failed job's samples go out with the worker's next result)
+    result = fn(*args)
+    return result, metrics.drain()
+
+
+def _unwrap(outer, inner):
+    if inner.cancelled():
+        if not outer.done():
+            outer.cancel()
+            outer.set_running_or_notify_cancel()
+        return
+    error = inner.exception()
+    if error is None:
+        result, samples = inner.result()
+        metrics.merge(samples)
+    if outer.cancelled():
+        return
+    if error is not None:
+        outer.set_exception(error)
+    else:
+        outer.set_result(result)
+
+
+class BoundedExecutor:
+    """
+    Runs jobs in worker processes so the event loop stays free. At most
+    `workers` jobs run at once and at most `max_queue` more wait; anything past
+    that is rejected with QueueFull instead of piling up.
+    """
+
+    def __init__(self, workers=None, max_queue=8, retry_after=5):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+
+    def _get_pool(self):
+        # Called with self._lock held, so two threads can't both start a pool
+        if self._pool is None:
+            # spawn: the server process has threads, so don't fork it
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up,
+            )
+        return self._pool
+
+    def _release(self, future, pool=None):
+        with self._lock:
+            self._in_flight -= 1
+            # A worker died (e.g. OOM-killed): shut the broken pool down and start
+            # a fresh one for the next job (unless another job already replaced it)
+            if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+                if pool is not None and pool is self._pool:
+                    self._pool = None
+                    pool.shutdown(wait=False)
+
+    def submit(self, fn, *args):
+        """Schedules fn(*args) or raises QueueFull. Returns: concurrent.futures.Future"""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise QueueFull(self.retry_after)
+            self._in_flight += 1
+            try:
+                pool = self._get_pool()
+                inner = pool.submit(_call, fn, *args)
+            except BaseException as e:
+                self._in_flight -= 1
+                if isinstance(e, BrokenProcessPool) and self._pool is not None:
+                    self._pool, broken = None, self._pool
+                    broken.shutdown(wait=False)
+                raise
+        inner.add_done_callback(lambda inner: self._release(inner, pool))
+        future = Future()
+        inner.add_done_callback(lambda inner: _unwrap(future, inner))
+        future.add_done_callback(lambda future: future.cancelled() and inner.cancel())
+        return future
+
+    async def run(self, fn, *args):
+        """Awaitable submit(): runs fn(*args) in a worker and returns its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self._lock:
+            in_flight = self._in_flight
+        return {
+            "workers": self.workers,
+            "running": min(in_flight, self.workers),
+            "queue_depth": max(in_flight - self.workers, 0),
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,302 @@
+# sheet_cleaner/external.py
+# Out-of-core clean / merge for CSV exports too large to hold in memory
+import csv
+import heapq
+import math
+import os
+import pickle
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from .schemas import rider_key_columns, transaction_columns
+from .ingest import SNIFF_BYTES, file_kind, iter_csv_chunks, read_export
+from .keys import drop_key_columns, rider_sort_keys, sort_by_rider
+from .cleaning import clean_columns, clean_frame, standardize_columns, standardize_frame
+from .writer import write_styled_rows
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+# Parsed CSV takes roughly this many times its text size in memory
+PARSED_BYTES_PER_TEXT_BYTE = 5
+
+# Rows per pickled block in a spilled run; the merge holds one block per run
+RUN_BLOCK_ROWS = 256
+
+# Malformed exports and a failing spill dir, raised mid-stream by the chunked
+# reader or the runs; reported as ValueError like clean_file()'s other failures
+LOAD_ERRORS = (OSError, csv.Error, pd.errors.ParserError, UnicodeDecodeError, zipfile.BadZipFile)
+
+
+class SortedRun:
+    """One sorted batch of rows spilled to disk, read back a block at a time."""
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+
+    def records(self):
+        with open(self.path, "rb") as f:
+            while True:
+                try:
+                    block = pickle.load(f)
+                except EOFError:
+                    return
+                yield from block
+
+
+def _row_sort_keys(sort_keys, start, stop):
+    # Same order as sort_by_rider(): missing last. Only one block's tuples exist at a time.
+    parts = []
+    for sort_key in sort_keys:
+        values = sort_key.iloc[start:stop].to_numpy(dtype=object)
+        missing = pd.isna(values)
+        parts.append([(True, "") if is_missing else (False, value) for value, is_missing in zip(values, missing)])
+    return list(zip(*parts))
+
+
+def _spill(buffered, workdir):
+    # Takes the buffer itself, so each copy of the batch (concat, sort, key
+    # columns dropped) replaces the previous one: at most two exist at a time
+    df = pd.concat(buffered, ignore_index=True)
+    buffered.clear()
+    df = sort_by_rider(df)  # stable (multi-key)
+    sort_keys = rider_sort_keys(df)
+    df = drop_key_columns(df)
+    fd, path = tempfile.mkstemp(dir=workdir, suffix=".run")
+    with os.fdopen(fd, "wb") as f:
+        for start in range(0, len(df), RUN_BLOCK_ROWS):
+            stop = start + RUN_BLOCK_ROWS
+            block = list(zip(
+                _row_sort_keys(sort_keys, start, stop),
+                df.iloc[start:stop].itertuples(index=False, name=None),
+            ))
+            pickle.dump(block, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return SortedRun(path, list(df.columns))
+
+
+def spill_sorted_runs(frames, workdir, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Buffers cleaned frames until they use about half the memory budget (the
+    sort needs a copy), then sorts the batch by rider and spills it to workdir.
+    Returns: list[SortedRun] in input order
+    """
+    flush_bytes = memory_budget_mb * 1024 * 1024 // 2
+    runs, buffered, buffered_bytes = [], [], 0
+    for df in frames:
+        if df.empty:
+            continue
+        buffered.append(df)
+        buffered_bytes += int(df.memory_usage(deep=True).sum())
+        if buffered_bytes >= flush_bytes:
+            runs.append(_spill(buffered, workdir))
+            buffered_bytes = 0
+    if buffered:
+        runs.append(_spill(buffered, workdir))
+    return runs
+
+
+def merge_runs(runs, columns):
+    """
+    k-way merge of sorted runs into one rider-sorted stream. Ties keep run
+    order (heapq.merge is stable), matching a concat + stable sort. Rows are
+    laid out on `columns`, with NaN where a run lacks a column (like pd.concat).
+    Returns: iterator of row tuples
+    """
+    def aligned(run):
+        if run.columns == columns:
+            yield from run.records()
+            return
+        positions = [run.columns.index(col) if col in run.columns else None for col in columns]
+        for key, row in run.records():
+            yield key, tuple(np.nan if pos is None else row[pos] for pos in positions)
+
+    for _key, row in heapq.merge(*(aligned(run) for run in runs), key=lambda record: record[0]):
+        yield row
+
+
+def _amount(value):
+    # pd.to_numeric(errors="coerce") for one value; NaN for anything non-numeric
+    if isinstance(value, (bool, np.bool_)):
+        return float(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return math.nan
+    return math.nan
+
+
+class _RunningSum:
+    """
+    math.fsum() of the values added so far without keeping them: Shewchuk's
+    exact partials (a handful of floats), NaN skipped.
+    """
+
+    def __init__(self):
+        self.partials = []
+
+    def add(self, x):
+        if math.isnan(x):
+            return
+        i = 0
+        for y in self.partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            hi = x + y
+            lo = y - (hi - x)
+            if lo:
+                self.partials[i] = lo
+                i += 1
+            x = hi
+        self.partials[i:] = [x]
+
+    def rounded(self):
+        return np.round(np.float64(math.fsum(self.partials)), 2)
+
+
+def _rider_key(row, key_positions):
+    # Missing values compare equal, as in rider_group_ids()
+    return tuple(None if pd.isna(row[pos]) else row[pos] for pos in key_positions)
+
+
+def report_rows(rows, columns, fill=""):
+    """
+    Row-at-a-time version of the clean_file()/sort_and_merge() report: the
+    data rows plus 'Fares Only', a totals + spacer row after every rider
+    (build_rider_subtotals() layout) and the grand total row at the end.
+    Returns: (output columns, iterator of row tuples)
+    """
+    transaction_col = next((col for col in transaction_columns if col in columns), None)
+    transaction_pos = columns.index(transaction_col) if transaction_col else None
+    key_positions = [columns.index(col) for col in rider_key_columns if col in columns]
+    n_cols = len(columns)
+
+    out_columns = list(columns) + ["Trips Count"]
+    if transaction_col is None:
+        out_columns.append("Transaction Amount")
+    out_columns.append("Fares Only")
+
+    def totals_rows(size, amounts):
+        total = amounts.rounded() if transaction_col else 0
+        totals = [fill] * n_cols
+        if transaction_col:
+            totals[transaction_pos] = total
+            yield tuple(totals) + (size, fill)
+            yield (fill,) * (n_cols + 2)
+        else:
+            yield tuple(totals) + (size, total, fill)
+            yield (fill,) * n_cols + (fill, np.nan, fill)
+
+    def generate():
+        # Running sums, so memory doesn't grow with the number of rows
+        current_key, size, amounts, fares = None, 0, _RunningSum(), _RunningSum()
+        for row in rows:
+            key = _rider_key(row, key_positions)
+            if size and key != current_key:
+                yield from totals_rows(size, amounts)
+                size, amounts = 0, _RunningSum()
+            current_key = key
+            size += 1
+            if transaction_col:
+                amount = _amount(row[transaction_pos])
+                amounts.add(amount)
+                fares.add(amount)
+                yield row + (1, row[transaction_pos])
+            else:
+                yield row + (1, np.nan, "")
+        if size:
+            yield from totals_rows(size, amounts)
+            yield ("",) * (len(out_columns) - 1) + (fares.rounded(),)
+
+    return out_columns, generate()
+
+
+def _write_report(runs):
+    output = BytesIO()
+    if not runs:
+        # Nothing left after filtering: same empty sheet as the in-memory path
+        write_styled_rows(output, [], [], "CleanedData")
+    else:
+        columns = []
+        for run in runs:
+            columns += [col for col in run.columns if col not in columns]
+        out_columns, rows = report_rows(merge_runs(runs, columns), columns)
+        write_styled_rows(output, out_columns, rows, "CleanedData", note_fills=True, borders=True)
+    output.seek(0)
+    return output
+
+
+@contextmanager
+def _load_errors(name):
+    try:
+        yield
+    except LOAD_ERRORS as e:
+        raise ValueError(f"Unable to load or clean {name}: {e}") from e
+
+
+def chunk_rows_for_budget(file_obj, memory_budget_mb):
+    """Rows per CSV chunk so that one parsed chunk uses about a quarter of the budget."""
+    file_obj.seek(0)
+    sample = file_obj.read(SNIFF_BYTES)
+    file_obj.seek(0)
+    row_bytes = max(len(sample) / max(sample.count(b"\n"), 1), 1)
+    return max(1_000, int(memory_budget_mb * 1024 * 1024 / 4 / (PARSED_BYTES_PER_TEXT_BYTE * row_bytes)))
+
+
+def _frames(file_obj, memory_budget_mb, chunk_rows, project):
+    # CSV is streamed in chunks; XLSX can't be, so it arrives as one frame
+    if file_kind(file_obj) == "csv":
+        return iter_csv_chunks(file_obj, chunk_rows or chunk_rows_for_budget(file_obj, memory_budget_mb), project)
+    df, sniffed = read_export(file_obj, project)
+    if df is None:
+        raise ValueError("Unable to load or clean the file.")
+    return iter([df]), sniffed
+
+
+def clean_file_out_of_core(file_obj, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, chunk_rows=None):
+    """
+    clean_file() for exports too large for memory: filters and projects each
+    chunk, spills sorted runs to a temp dir and merges them straight into the
+    workbook. chunk_rows defaults to a size derived from memory_budget_mb.
+    Raises ValueError when required columns are missing or the file can't be
+    read or spilled (LOAD_ERRORS).
+    Returns: BytesIO (the cleaned workbook)
+    """
+    with _load_errors(file_obj.name):
+        frames, sniffed = _frames(file_obj, memory_budget_mb, chunk_rows, clean_columns)
+
+        def cleaned():
+            for df in frames:
+                df_filtered = clean_frame(df, sniffed, verbose=False)
+                if df_filtered is None:
+                    raise ValueError("Cleaning failed or required columns missing.")
+                yield df_filtered
+
+        with tempfile.TemporaryDirectory(prefix="sheet-cleaner-") as workdir:
+            runs = spill_sorted_runs(cleaned(), workdir, memory_budget_mb)
+            return _write_report(runs)
+
+
+def sort_and_merge_out_of_core(*file_objs, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, chunk_rows=None):
+    """
+    sort_and_merge() for exports too large for memory: every file is cleaned
+    chunk by chunk into sorted runs, and all runs are merged into one workbook.
+    Raises ValueError naming the file that can't be read (LOAD_ERRORS).
+    Returns: BytesIO (the merged workbook)
+    """
+    if not file_objs:
+        raise ValueError("No files to merge.")
+
+    with _load_errors("the merge"), tempfile.TemporaryDirectory(prefix="sheet-cleaner-") as workdir:
+        runs = []
+        for file_obj in file_objs:
+            with _load_errors(file_obj.name):
+                frames, sniffed = _frames(file_obj, memory_budget_mb, chunk_rows, standardize_columns)
+                runs += spill_sorted_runs((standardize_frame(df, sniffed) for df in frames), workdir, memory_budget_mb)
+        return _write_report(runs)
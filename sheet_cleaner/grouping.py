@@ -0,0 +1,157 @@
+# sheet_cleaner/grouping.py
+# Rider sorting, grouping and subtotal layout shared by clean/merge/split
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .schemas import rider_key_columns, transaction_columns
+from .keys import align_categories, key_columns, rider_order
+
+def arrow_backed(df):
+    """True when any column is Arrow-backed (read with SHEET_CLEANER_DTYPE_BACKEND=pyarrow)."""
+    return any(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+
+def rider_group_ids(df):
+    """
+    Numbers runs of consecutive rows that share the same
+    (Passenger Number, Last Name, First Name). Missing values compare equal.
+    Returns: np.ndarray of group ids, one per row
+    """
+    starts = np.zeros(len(df), dtype=bool)
+    starts[:1] = True
+    for key_col in rider_key_columns:
+        if key_col not in df.columns:
+            continue
+        column = df[key_col]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # normalize_keys() output: compare integer codes (missing is -1)
+            codes = column.cat.codes.to_numpy()
+            starts[1:] |= codes[1:] != codes[:-1]
+        else:
+            values = column.to_numpy(dtype=object)
+            missing = pd.isna(values)
+            starts[1:] |= (values[1:] != values[:-1]) & ~(missing[1:] & missing[:-1])
+    return np.cumsum(starts) - 1
+
+def build_rider_subtotals(df_sorted, fill=""):
+    """
+    Adds a 'Trips Count' column plus a totals row and a spacer row after every
+    rider group. Groups are runs of consecutive rows sharing the same
+    (Passenger Number, Last Name, First Name), so df_sorted must already be sorted.
+    Totals/spacer cells are set to `fill`, except the transaction total and trip count.
+    Arrow-backed frames keep their column dtypes instead: those cells are missing
+    values and Trips Count is int64[pyarrow].
+    The normalize_keys() helper columns are left out.
+    Returns: pd.DataFrame
+    """
+    with metrics.stage("group", rows=len(df_sorted)):
+        return _build_rider_subtotals(df_sorted, fill)
+
+def _build_rider_subtotals(df_sorted, fill):
+    df_sorted = df_sorted.reset_index(drop=True)
+    n_rows = len(df_sorted)
+    if n_rows == 0:
+        return pd.DataFrame()
+
+    transaction_col = next((col for col in transaction_columns if col in df_sorted.columns), None)
+    total_col = transaction_col or "Transaction Amount"
+
+    group_ids = rider_group_ids(df_sorted)
+    n_groups = int(group_ids[-1]) + 1
+    group_sizes = np.bincount(group_ids)
+
+    # Every group is followed by a totals row and a spacer row, so each data row
+    # shifts down by 2 per previous group. Spacer rows are left at `fill`.
+    data_pos = np.arange(n_rows) + 2 * group_ids
+    totals_pos = np.cumsum(group_sizes) + 2 * np.arange(n_groups)
+    n_out = n_rows + 2 * n_groups
+
+    if transaction_col:
+        amounts = pd.to_numeric(df_sorted[transaction_col], errors="coerce")
+        # numpy rounding: Arrow's round(2) can leave 82.46000000000001
+        group_totals = np.round(amounts.groupby(group_ids).sum().to_numpy(), 2)
+    else:
+        group_totals = np.zeros(n_groups, dtype=int)
+
+    if arrow_backed(df_sorted):
+        return _typed_rider_subtotals(df_sorted, total_col, data_pos, totals_pos, group_sizes, group_totals, n_out)
+
+    data = {}
+    for col in df_sorted.columns:
+        if col in key_columns:
+            continue
+        values = np.full(n_out, fill, dtype=object)
+        values[data_pos] = df_sorted[col].to_numpy(dtype=object)
+        data[col] = values
+
+    trips = np.full(n_out, fill, dtype=object)
+    trips[data_pos] = 1
+    trips[totals_pos] = group_sizes
+    data["Trips Count"] = trips
+
+    if transaction_col is None:
+        # No transaction column: the totals land in a new column that is empty elsewhere
+        data[total_col] = np.full(n_out, np.nan, dtype=object)
+    data[total_col][totals_pos] = group_totals
+
+    # Same dtype inference as building the frame from row dicts
+    return pd.DataFrame(data).infer_objects()
+
+def _typed_rider_subtotals(df_sorted, total_col, data_pos, totals_pos, group_sizes, group_totals, n_out):
+    # Every column is taken with -1 (missing) at the totals / spacer positions,
+    # so each keeps its own dtype instead of going through object
+    source = np.full(n_out, -1)
+    source[data_pos] = np.arange(len(df_sorted))
+    data = {
+        col: df_sorted[col].array.take(source, allow_fill=True)
+        for col in df_sorted.columns if col not in key_columns
+    }
+
+    import pyarrow as pa
+
+    trips = np.zeros(n_out, dtype=np.int64)
+    trips[data_pos] = 1
+    trips[totals_pos] = group_sizes
+    has_trips = np.zeros(n_out, dtype=bool)
+    has_trips[data_pos] = has_trips[totals_pos] = True
+    data["Trips Count"] = pd.arrays.ArrowExtensionArray(pa.array(trips, mask=~has_trips))
+
+    totals = data.get(total_col)
+    if totals is None:
+        totals = pd.array([None] * n_out, dtype="double[pyarrow]")
+    elif not pd.api.types.is_numeric_dtype(totals.dtype):
+        # Amounts that didn't parse as numbers (e.g. "$12.50"): mixed values, as in the object layout
+        totals = totals.astype(object)
+    totals[totals_pos] = group_totals
+    data[total_col] = totals
+    return pd.DataFrame(data)
+
+def append_total_row(df, column, total, fill=""):
+    """
+    Appends the grand total row: `total` under `column`, `fill` in every other
+    cell (missing values for Arrow-backed frames, so the columns keep their dtypes).
+    Returns: pd.DataFrame
+    """
+    if arrow_backed(df):
+        row = df.iloc[:0].reindex([0])
+        if pd.api.types.is_numeric_dtype(row[column].dtype):
+            row.loc[0, column] = total
+        else:
+            row[column] = pd.array([total], dtype="double[pyarrow]")
+    else:
+        row = pd.DataFrame([{col: fill for col in df.columns} | {column: total}])
+    return pd.concat([df, row], ignore_index=True)
+
+def merge_sorted_frames(frames):
+    """
+    Merges frames that are each already sorted by rider into one sorted frame.
+    The key categories are aligned so the concatenated keys stay integer codes,
+    then one stable sort on the composite rider key merges the pre-sorted runs
+    (ties keep the input order, like a concat + sort).
+    Returns: pd.DataFrame
+    """
+    combined_df = pd.concat(align_categories(frames), ignore_index=True)
+    if combined_df.empty:
+        return combined_df
+    with metrics.stage("sort", rows=len(combined_df)):
+        return combined_df.take(rider_order(combined_df)).reset_index(drop=True)
@@ -0,0 +1,287 @@
+# sheet_cleaner/ingest.py
+# Single-pass loading of uploaded exports: sniff the layout, then parse once
+import csv
+import io
+import os
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from . import metrics
+from .readers import read_xlsx_rows
+from .vendors import UBER, UNKNOWN, get_schema, identify, identify_headerless
+
+# Rows a Common Courtesy export may put its header on (below the banner). When
+# none of them has the header, row 4 is assumed; reading the banner itself as
+# the header (the pre-package clean_file() fallback) never gave a usable report.
+# A row is the header when identify() calls it Uber: its exact signature or a
+# column named "Trip/Eats ID" (not, as before, any name containing it).
+common_courtesy_header_rows = [0, 4, 5]
+common_courtesy_default_header = 4
+
+candidate_delimiters = [",", "\t", ";", "|"]
+
+SNIFF_BYTES = 64 * 1024
+SNIFF_ROWS = 8
+
+# "pyarrow" parses exports into Arrow-backed columns (string[pyarrow],
+# double[pyarrow], int64[pyarrow]) that stay typed through cleaning, grouping
+# and export; "numpy" is pandas' default
+DTYPE_BACKEND = os.environ.get("SHEET_CLEANER_DTYPE_BACKEND", "numpy")
+
+
+def pyarrow_available():
+    try:
+        # Imported only to see whether it is installed
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_dtype_backend(dtype_backend=None):
+    dtype_backend = dtype_backend or DTYPE_BACKEND
+    if dtype_backend not in ("numpy", "pyarrow"):
+        raise ValueError(f"Unknown dtype backend '{dtype_backend}'. Use numpy or pyarrow.")
+    if dtype_backend == "pyarrow" and not pyarrow_available():
+        raise ValueError("The pyarrow dtype backend needs pyarrow (pip install pyarrow).")
+    return dtype_backend
+
+
+def _parse_options(dtype_backend):
+    # read_csv / TextParser keyword for the backend (pandas' own default for numpy)
+    return {"dtype_backend": "pyarrow"} if resolve_dtype_backend(dtype_backend) == "pyarrow" else {}
+
+
+@dataclass(frozen=True)
+class Sniffed:
+    """What the sniffer learned about an upload before it is parsed."""
+    kind: str                  # "csv" or "xlsx"
+    vendor: str                # "uber", "lyft", "common_courtesy" or "unknown"
+    header_row: Optional[int]  # None for headerless Uber/Lyft exports
+    delimiter: str = ","
+    width: int = 0             # cells in the first non-blank row
+
+    @property
+    def headerless(self):
+        return self.header_row is None
+
+    @property
+    def schema(self):
+        """The vendor's compiled VendorSchema (shared by every load path)."""
+        return get_schema(self.vendor)
+
+
+def file_kind(file_obj):
+    return "csv" if file_obj.name.endswith(".csv") else "xlsx"
+
+
+def _clean_name(value):
+    return str(value).replace("\ufeff", "").strip()
+
+
+def _sample_records(sample, delimiter, truncated):
+    # CSV records, not lines: a quoted field may span several lines
+    rows = list(csv.reader(io.StringIO(sample), delimiter=delimiter))
+    if truncated and rows:
+        rows = rows[:-1]  # last record may be cut short
+    return [row for row in rows if row and not (len(row) == 1 and row[0].strip(" \t") == "")]
+
+
+def _pick_delimiter(records):
+    # records: {delimiter: first rows parsed with it}; most separators outside quotes wins
+    counts = {d: sum(len(row) - 1 for row in records[d]) for d in candidate_delimiters}
+    best = max(candidate_delimiters, key=lambda d: counts[d])
+    return best if counts[best] > counts[","] else ","
+
+
+def _sniff_rows(rows, kind, delimiter=","):
+    """
+    Works out vendor and header row from the first few non-blank rows, each a
+    list of cell strings ("" for empty cells).
+    """
+    if not rows:
+        return Sniffed(kind, UNKNOWN.name, 0, delimiter)
+
+    first = rows[0]
+    width = len(first)
+
+    # --- Common Courtesy: banner in the second cell, header a few rows down ---
+    if len(first) > 1 and "Common Courtesy" in first[1]:
+        header_row = next(
+            (idx for idx in common_courtesy_header_rows
+             if idx < len(rows) and identify(rows[idx]) is UBER),
+            common_courtesy_default_header,
+        )
+        return Sniffed(kind, "common_courtesy", header_row, delimiter, width)
+
+    # --- Header row: one registry lookup ---
+    schema = identify(first)
+    if schema is not None:
+        return Sniffed(kind, schema.name, 0, delimiter, width)
+
+    # --- Headerless Uber/Lyft: nothing to hash, so the first data row decides ---
+    return Sniffed(kind, identify_headerless(first).name, None, delimiter, width)
+
+
+def _csv_sample_rows(file_obj):
+    file_obj.seek(0)
+    sample = file_obj.read(SNIFF_BYTES + 1)
+    file_obj.seek(0)
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8", errors="replace")
+    truncated = len(sample) > SNIFF_BYTES
+    sample = sample[:SNIFF_BYTES].lstrip("\ufeff")
+
+    records = {d: _sample_records(sample, d, truncated)[:SNIFF_ROWS] for d in candidate_delimiters}
+    delimiter = _pick_delimiter(records)
+    return records[delimiter], delimiter
+
+
+def sniff(file_obj):
+    """
+    Looks at the start of a CSV upload (no full parse) and returns its layout.
+    XLSX layouts are sniffed from the parsed sheet inside read_export().
+    """
+    rows, delimiter = _csv_sample_rows(file_obj)
+    return _sniff_rows(rows, "csv", delimiter)
+
+
+def _projection(sniffed, project):
+    """
+    Turns a read_export(project=...) rule into parser options.
+    Returns: (usecols, names)  names are the vendor headers of the kept
+    positions for headerless files, else None (the parser keeps its own).
+    """
+    keep = project(sniffed) if project else None
+    if sniffed.headerless:
+        # Vendor headers go on by position; columns past them are dropped
+        headers = sniffed.schema.headers
+        positions = [i for i in range(min(sniffed.width, len(headers))) if keep is None or keep(headers[i])]
+        return positions, [headers[i] for i in positions]
+    if keep is None:
+        return None, None
+    return (lambda name: keep(_clean_name(name))), None
+
+
+def _read_xlsx(file_obj, project=None, dtype_backend=None):
+    # Cells come back untyped ("" for empty, as read_excel's own reader hands
+    # them over) from calamine or streaming openpyxl; the TextParser pass below
+    # types the columns exactly the way pd.read_excel(header=n) would.
+    rows = read_xlsx_rows(file_obj)
+
+    with metrics.stage("detect_header", format="xlsx") as s:
+        preview = [[str(v) for v in row] for row in rows[:SNIFF_ROWS]]
+        sniffed = _sniff_rows(preview, "xlsx")
+        if rows and sniffed.width != len(rows[0]):
+            # rows are padded to the widest one; that's the width the parser sees
+            sniffed = replace(sniffed, width=len(rows[0]))
+        s.labels["vendor"] = sniffed.vendor
+    if sniffed.headerless and sniffed.width < 7:
+        return None, sniffed
+
+    usecols, names = _projection(sniffed, project)
+    options = _parse_options(dtype_backend)
+    df = TextParser(rows, header=sniffed.header_row, usecols=usecols, **options).read() if rows else pd.DataFrame()
+    if names is not None:
+        df.columns = names
+    return df, sniffed
+
+
+def read_export(file_obj, project=None, dtype_backend=None):
+    """
+    Parses an uploaded CSV/XLSX export exactly once, using the sniffed header
+    row and delimiter. Headerless Uber/Lyft exports get the vendor headers.
+    project: optional callable(Sniffed) -> column-name predicate (or None for
+    every column); columns it rejects are never parsed or type-inferred.
+    dtype_backend: "numpy" or "pyarrow" (default DTYPE_BACKEND)
+    Returns: (pd.DataFrame | None, Sniffed)  (None when a headerless file is too
+    narrow to be an Uber/Lyft export)
+    """
+    kind = file_kind(file_obj)
+    if kind == "csv":
+        with metrics.stage("detect_header", format="csv") as s:
+            sniffed = sniff(file_obj)
+            s.labels["vendor"] = sniffed.vendor
+        # Need enough columns to have looked at col 6
+        if sniffed.headerless and sniffed.width < 7:
+            return None, sniffed
+        usecols, names = _projection(sniffed, project)
+        with metrics.stage("read", vendor=sniffed.vendor, format="csv", nbytes=getattr(file_obj, "size", 0) or 0) as s:
+            file_obj.seek(0)
+            df = pd.read_csv(
+                file_obj, header=sniffed.header_row, sep=sniffed.delimiter, usecols=usecols,
+                **_parse_options(dtype_backend),
+            )
+            file_obj.seek(0)
+            s.rows = len(df)
+        if names is not None:
+            df.columns = names
+    else:
+        # The sheet is read before its layout can be sniffed, so "read" includes detect_header here
+        with metrics.stage("read", format="xlsx", nbytes=getattr(file_obj, "size", 0) or 0) as s:
+            df, sniffed = _read_xlsx(file_obj, project, dtype_backend)
+            s.labels["vendor"] = sniffed.vendor
+            s.rows = 0 if df is None else len(df)
+        if df is None:
+            return None, sniffed
+
+    if sniffed.headerless and df.shape[0] < 1:
+        return None, sniffed
+
+    df.columns = pd.Index([_clean_name(c) for c in df.columns])
+    return df, sniffed
+
+
+
+def _consistent_chunk_dtypes(file_obj, sniffed, chunk_rows, usecols=None):
+    # Each chunk infers its own dtypes (a phone column can be int64 in one
+    # chunk and float64 in the next). Find columns whose dtype varies and pin
+    # them to what a whole-file read would infer: float64 for mixed numbers,
+    # strings otherwise. This is a second parse of the projected columns: it
+    # about doubles the read time, but holds only one chunk at a time. The
+    # dtypes can't come from the chunks being cleaned instead: earlier chunks
+    # are already filtered, sorted and spilled when a later one disagrees.
+    seen = {}
+    file_obj.seek(0)
+    with pd.read_csv(file_obj, header=sniffed.header_row, sep=sniffed.delimiter, chunksize=chunk_rows, usecols=usecols) as reader:
+        for df in reader:
+            for col, dtype in df.dtypes.items():
+                seen.setdefault(col, set()).add(dtype)
+    file_obj.seek(0)
+    return {
+        col: "float64" if all(dtype.kind in "iuf" for dtype in dtypes) else "str"
+        for col, dtypes in seen.items() if len(dtypes) > 1
+    }
+
+
+def iter_csv_chunks(file_obj, chunk_rows=50_000, project=None):
+    """
+    Chunked read_export() for large CSV exports: same sniffing, header handling,
+    projection and column names, but yields DataFrames of at most chunk_rows
+    rows. A first pass over the file pins column dtypes so every chunk is typed
+    like a whole-file read (the file is parsed twice; memory stays at one chunk).
+    Returns: (iterator of pd.DataFrame, Sniffed)
+    """
+    sniffed = sniff(file_obj)
+    usecols, names = _projection(sniffed, project)
+
+    def chunks():
+        if sniffed.headerless and sniffed.width < 7:
+            raise ValueError("Headerless file is too narrow to be an Uber/Lyft export.")
+        dtypes = _consistent_chunk_dtypes(file_obj, sniffed, chunk_rows, usecols)
+        file_obj.seek(0)
+        reader = pd.read_csv(
+            file_obj, header=sniffed.header_row, sep=sniffed.delimiter,
+            chunksize=chunk_rows, dtype=dtypes or None, usecols=usecols,
+        )
+        with reader:
+            for df in reader:
+                if names is not None:
+                    df.columns = names
+                df.columns = pd.Index([_clean_name(c) for c in df.columns])
+                yield df
+
+    return chunks(), sniffed
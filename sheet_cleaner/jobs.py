@@ -0,0 +1,423 @@
+# sheet_cleaner/jobs.py
+# Background jobs: SQLite-backed queue, stage progress and expiring artifacts
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+from . import metrics
+from .executor import QueueFull
+from .uploads import SpooledUpload
+
+JOB_OPERATIONS = ["clean", "merge", "split", "batch"]
+
+# A job whose worker dies is re-queued this many times before it is failed
+MAX_ATTEMPTS = 3
+
+# A running job whose runner hasn't sent a heartbeat for this long is taken to
+# be orphaned (its server process died) and re-queued by any live runner
+STALE_AFTER = 30.0
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def report_download(stem, output_format="xlsx"):
+    """
+    Download name and media type of a clean / merge report: the workbook, or
+    for a columnar output_format the ZIP of its tables.
+    Returns: (filename, media type)
+    """
+    if output_format == "xlsx":
+        return f"{stem}.xlsx", XLSX_MEDIA_TYPE
+    return f"{stem}.{output_format}.zip", "application/zip"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            TEXT PRIMARY KEY,
+    operation     TEXT NOT NULL,
+    params        TEXT NOT NULL,
+    inputs        TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    stage         TEXT,
+    stages        TEXT NOT NULL DEFAULT '[]',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    artifact      TEXT,
+    artifact_name TEXT,
+    media_type    TEXT,
+    error         TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    expires_at    REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+# Added after the first release; ALTERed into existing stores
+_ADDED_COLUMNS = {
+    "owner": "TEXT",          # runner that claimed the running job
+    "heartbeat_at": "REAL",   # last heartbeat of that runner
+}
+
+
+class JobStore:
+    """
+    Jobs persisted in <root>/jobs.sqlite3, with each job's uploads and result
+    under <root>/<job id>/. Safe to use from several threads and processes
+    (one short-lived connection per call, WAL journal).
+
+    status: queued -> running -> done | failed -> expired
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, "jobs.sqlite3")
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            existing = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for column, kind in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Closing(db)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def new_id(self):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        return job_id
+
+    def create(self, job_id, operation, inputs, params=None):
+        """
+        Queues a job. inputs: SpooledUploads already saved under job_dir(job_id).
+        """
+        now = time.time()
+        inputs = [{"path": f.path, "name": f.name, "type": f.type, "size": f.size, "sha256": f.sha256} for f in inputs]
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, operation, params, inputs, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, operation, json.dumps(params or {}), json.dumps(inputs), now, now),
+            )
+        return job_id
+
+    def save_artifact(self, operation, data, filename, media_type, ttl, params=None):
+        """
+        Stores a result made outside the queue (e.g. /split?mode=ids) as a
+        finished job, so it is served, expired and cleaned up like any job result.
+        Returns: job id
+        """
+        job_id = self.new_id()
+        path = os.path.join(self.job_dir(job_id), filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, operation, params, inputs, status, stage, artifact, artifact_name, media_type, "
+                "created_at, updated_at, expires_at) VALUES (?, ?, ?, '[]', 'done', 'done', ?, ?, ?, ?, ?, ?)",
+                (job_id, operation, json.dumps(params or {}), path, filename, media_type, now, now, now + ttl),
+            )
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("params", "inputs", "stages"):
+            job[field] = json.loads(job[field])
+        return job
+
+    def claim(self, owner=None):
+        """Moves the oldest queued job to running, owned by `owner`. Returns: job dict | None"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            now = time.time()
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, heartbeat_at = ?, "
+                "updated_at = ? WHERE id = ?",
+                (owner, now, now, row["id"]),
+            )
+            db.execute("COMMIT")
+        return self.get(row["id"])
+
+    def set_stage(self, job_id, stage):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            stages = json.loads(row["stages"]) if row else []
+            stages.append({"stage": stage, "at": now})
+            db.execute(
+                "UPDATE jobs SET stage = ?, stages = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(stages), now, job_id),
+            )
+            db.execute("COMMIT")
+
+    def finish(self, job_id, artifact, artifact_name, media_type, ttl):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'done', stage = 'done', artifact = ?, artifact_name = ?, media_type = ?, "
+                "updated_at = ?, expires_at = ? WHERE id = ?",
+                (artifact, artifact_name, media_type, now, now + ttl, job_id),
+            )
+
+    def fail(self, job_id, error, ttl):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ?, expires_at = ? WHERE id = ?",
+                (error, now, now + ttl, job_id),
+            )
+
+    def requeue(self, job_id, count_attempt=True):
+        """count_attempt=False: the job never started, so its claim doesn't count."""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = attempts - ?, updated_at = ? WHERE id = ?",
+                (0 if count_attempt else 1, time.time(), job_id),
+            )
+
+    def heartbeat(self, owner):
+        """Marks the running jobs claimed by `owner` as still alive."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' AND owner = ?", (time.time(), owner))
+
+    def requeue_orphaned(self, stale_after=STALE_AFTER, ttl=24 * 3600, now=None):
+        """
+        Running jobs whose runner stopped sending heartbeats (its server died)
+        go back on the queue, or are failed once they have had MAX_ATTEMPTS.
+        Jobs of live runners, in this process or any other, are left alone.
+        Returns: (requeued ids, failed ids)
+        """
+        now = now or time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            rows = db.execute(
+                "SELECT id, attempts FROM jobs WHERE status = 'running' AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (now - stale_after,),
+            ).fetchall()
+            requeued = [row["id"] for row in rows if row["attempts"] < MAX_ATTEMPTS]
+            failed = [row["id"] for row in rows if row["attempts"] >= MAX_ATTEMPTS]
+            db.executemany(
+                "UPDATE jobs SET status = 'queued', owner = NULL, updated_at = ? WHERE id = ?",
+                [(now, job_id) for job_id in requeued],
+            )
+            db.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, owner = NULL, updated_at = ?, expires_at = ? WHERE id = ?",
+                [("The worker running this job stopped unexpectedly.", now, now + ttl, job_id) for job_id in failed],
+            )
+            db.execute("COMMIT")
+        return requeued, failed
+
+    def expire(self, now=None):
+        """Deletes the files of finished jobs past expires_at. Returns: expired job ids"""
+        now = now or time.time()
+        with self._connect() as db:
+            ids = [row["id"] for row in db.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND expires_at < ?", (now,)
+            )]
+            for job_id in ids:
+                shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+                db.execute(
+                    "UPDATE jobs SET status = 'expired', artifact = NULL, updated_at = ? WHERE id = ?",
+                    (now, job_id),
+                )
+        return ids
+
+    def counts(self):
+        with self._connect() as db:
+            return {row["status"]: row["n"] for row in db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+
+class _Closing:
+    # sqlite3's own context manager commits but never closes
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        return self.db
+
+    def __exit__(self, *exc):
+        self.db.close()
+
+
+def _run(operation, file_objs, params, job_dir, progress):
+    # -> (artifact path, download name, media type)
+    from .ingest import read_export
+    from .cleaning import clean_and_sort_many, clean_columns, clean_report, merge_report
+    from .external import clean_file_out_of_core, sort_and_merge_out_of_core
+    from .split import split_by_internal_note
+    from .batch import run_batch
+    from .columnar import flatten_bundles
+
+    def save(data, filename, media_type):
+        path = os.path.join(job_dir, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path, filename, media_type
+
+    output_format = params.get("output_format", "xlsx")
+    if operation != "batch":
+        # run_batch() reports its own stages
+        progress("parsing")
+    if operation == "clean":
+        if params.get("out_of_core"):
+            output = clean_file_out_of_core(file_objs[0], params["memory_budget_mb"])
+        else:
+            df, sniffed = read_export(file_objs[0], project=clean_columns)
+            if df is None:
+                raise ValueError("Unable to load or clean the file.")
+            _final_df, output = clean_report(df, sniffed, progress, output_format)
+            if output is None:
+                raise ValueError("Cleaning failed or required columns missing.")
+        return save(output.getvalue(), *report_download("cleaned_report", output_format))
+
+    if operation == "merge":
+        if params.get("out_of_core"):
+            output = sort_and_merge_out_of_core(*file_objs, memory_budget_mb=params["memory_budget_mb"])
+        else:
+            frames = clean_and_sort_many(file_objs)
+            _final_df, output = merge_report(frames, progress, output_format)
+        return save(output.getvalue(), *report_download("merged_report", output_format))
+
+    if operation == "split":
+        df, sniffed = read_export(file_objs[0])
+        if df is None:
+            raise ValueError("not a recognised export layout")
+        with metrics.labels(vendor=sniffed.vendor, format=sniffed.kind):
+            split_files = split_by_internal_note(df, progress, output_format)
+        if not split_files:
+            raise ValueError("Could not split. 'Internal Note' missing or empty.")
+        if output_format != "xlsx":
+            bundles = [file_io for _df_note, file_io in split_files.values()]
+            return save(flatten_bundles(bundles), "split_reports.zip", "application/zip")
+        path = os.path.join(job_dir, "split_reports.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+            for note, (_df_note, file_io) in split_files.items():
+                zf.writestr(f"{note}.xlsx", file_io.getvalue())
+        return path, "split_reports.zip", "application/zip"
+
+    if operation == "batch":
+        output = run_batch(file_objs, params.get("outputs") or None, progress)
+        return save(output.getvalue(), "batch_reports.zip", "application/zip")
+
+    raise ValueError(f"Unknown operation '{operation}'.")
+
+
+def run_job(root, job_id, ttl):
+    """
+    Worker-process entry point: runs one claimed job, recording each stage in
+    the store, and saves its result under the job's directory.
+    """
+    store = JobStore(root)
+    job = store.get(job_id)
+    file_objs = [SpooledUpload(i["path"], i["name"], i["type"], i["size"], i["sha256"]) for i in job["inputs"]]
+    try:
+        artifact, name, media_type = _run(
+            job["operation"], file_objs, job["params"], store.job_dir(job_id),
+            lambda stage: store.set_stage(job_id, stage),
+        )
+    except Exception as e:
+        store.fail(job_id, str(e), ttl)
+        return
+    finally:
+        for file_obj in file_objs:
+            file_obj.close()
+    store.finish(job_id, artifact, name, media_type, ttl)
+
+
+class JobRunner:
+    """
+    Background thread that feeds queued jobs to a BoundedExecutor (at most one
+    per worker at a time, so /clean etc. still get a slot) and expires old
+    artifacts. Several runners (one per server process) may share a store:
+    each heartbeats the jobs it claimed, and re-queues only jobs whose runner
+    has been silent for stale_after seconds.
+    """
+
+    def __init__(self, store, executor, ttl=24 * 3600, poll_interval=1.0, stale_after=STALE_AFTER):
+        self.store = store
+        self.executor = executor
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        # Unique per runner, so a restarted process doesn't inherit its predecessor's jobs
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        self._slots = threading.Semaphore(executor.workers)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="job-runner", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self):
+        """Call after queueing a job so it starts without waiting for the next poll."""
+        self._wake.set()
+
+    def _done(self, job_id, future):
+        self._slots.release()
+        self._wake.set()
+        error = None if future.cancelled() else future.exception()
+        if future.cancelled() or isinstance(error, BrokenProcessPool):
+            # The worker died or the pool was shut down: try again later
+            job = self.store.get(job_id)
+            if job and job["attempts"] < MAX_ATTEMPTS:
+                self.store.requeue(job_id)
+            else:
+                self.store.fail(job_id, "The worker running this job stopped unexpectedly.", self.ttl)
+        elif error is not None:
+            self.store.fail(job_id, str(error), self.ttl)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.store.heartbeat(self.owner)
+            self.store.requeue_orphaned(self.stale_after, self.ttl)
+            self.store.expire()
+            while not self._stop.is_set() and self._slots.acquire(blocking=False):
+                job = self.store.claim(self.owner)
+                if job is None:
+                    self._slots.release()
+                    break
+                try:
+                    future = self.executor.submit(run_job, self.store.root, job["id"], self.ttl)
+                except QueueFull:
+                    # The HTTP endpoints have the pool busy; retry on the next pass
+                    self._slots.release()
+                    self.store.requeue(job["id"], count_attempt=False)
+                    break
+                except Exception as e:
+                    self._slots.release()
+                    self.store.fail(job["id"], str(e), self.ttl)
+                    continue
+                future.add_done_callback(lambda f, job_id=job["id"]: self._done(job_id, f))
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
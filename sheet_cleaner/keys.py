@@ -0,0 +1,116 @@
+# sheet_cleaner/keys.py
+# Normalize-once rider / Internal Note keys shared by clean, merge and split
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .schemas import rider_key_columns, rider_sort_columns
+
+# Derived columns added by normalize_keys(). They ride along through filtering,
+# sorting and concatenation, and are left out of every report (see
+# build_rider_subtotals()).
+note_key_column = "__note_key"
+sort_key_columns = {col: f"__sort_key {col}" for col in rider_sort_columns}
+key_columns = [note_key_column, *sort_key_columns.values()]
+
+def rider_sort_key(col):
+    return col.str.lower() if col.dtype == 'object' else col
+
+def normalize_keys(df):
+    """
+    The one normalization pass over the key columns, so later stages never
+    re-strip or re-case them:
+      - rider key columns: astype(str).str.strip(), stored as categoricals
+      - sort key per rider column (rider_sort_key() of the stripped value)
+      - note key: Internal Note stripped and upper-cased, as a categorical
+    Frames that already carry the keys are returned as they are.
+    Returns: pd.DataFrame
+    """
+    if note_key_column in df.columns:
+        return df
+
+    df = df.copy(deep=False)
+    for col in rider_key_columns:
+        if col not in df.columns:
+            continue
+        stripped = df[col].astype(str).str.strip()
+        df[col] = pd.Categorical(stripped)
+        if col in sort_key_columns:
+            df[sort_key_columns[col]] = pd.Categorical(rider_sort_key(stripped))
+
+    if 'Internal Note' in df.columns:
+        df[note_key_column] = pd.Categorical(df['Internal Note'].astype(str).str.strip().str.upper())
+    else:
+        df[note_key_column] = pd.Categorical([None] * len(df))
+    return df
+
+def has_note(df):
+    """Rows with a non-blank Internal Note (normalize_keys() must have run)."""
+    return df['Internal Note'].notna() & (df[note_key_column] != "")
+
+def rider_sort_keys(df):
+    """The sort key Series for rider_sort_columns, precomputed when available."""
+    return [
+        df[sort_key_columns[col]] if sort_key_columns[col] in df.columns else rider_sort_key(df[col])
+        for col in rider_sort_columns
+    ]
+
+def _rank_codes(sort_key):
+    # Dense rank of each value (missing ranks last, like sort_values). The
+    # precomputed keys are categoricals with sorted categories, so their codes
+    # already are the ranks; anything else is factorized once.
+    if isinstance(sort_key.dtype, pd.CategoricalDtype) and sort_key.cat.categories.is_monotonic_increasing:
+        codes, n_uniques = sort_key.cat.codes.to_numpy(), len(sort_key.cat.categories)
+    else:
+        codes, uniques = pd.factorize(sort_key, sort=True)
+        n_uniques = len(uniques)
+    return np.where(codes < 0, n_uniques, codes), n_uniques + 1
+
+def rider_order(df):
+    """
+    Row order that sorts df by rider: the per-column ranks are packed into one
+    int64 composite key and argsorted stably (np.lexsort when there are too
+    many distinct keys to pack). Same order as
+    sort_values(by=rider_sort_columns, key=rider_sort_key).
+    Returns: np.ndarray of row positions
+    """
+    key_codes = [_rank_codes(sort_key) for sort_key in rider_sort_keys(df)]
+    n_keys = 1
+    for _codes, n_codes in key_codes:
+        n_keys *= n_codes
+
+    if n_keys < 2 ** 62:
+        composite = np.zeros(len(df), dtype=np.int64)
+        for codes, n_codes in key_codes:
+            composite = composite * n_codes + codes
+        return np.argsort(composite, kind="stable")
+    return np.lexsort([codes for codes, _ in reversed(key_codes)])
+
+def sort_by_rider(df):
+    """Stable sort by (Last Name, First Name, Passenger Number)."""
+    with metrics.stage("sort", rows=len(df)):
+        return df.take(rider_order(df))
+
+def align_categories(frames):
+    """
+    Gives the categorical key columns of every frame the same (sorted)
+    categories, so pd.concat keeps them categorical instead of falling back
+    to strings and the merged keys can still be ranked from their codes.
+    Returns: list[pd.DataFrame]
+    """
+    frames = list(frames)
+    shared = [
+        col for col in [*rider_key_columns, *key_columns]
+        if frames and all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames)
+    ]
+    aligned = [f.copy(deep=False) for f in frames]
+    for col in shared:
+        categories = frames[0][col].cat.categories
+        for f in frames[1:]:
+            categories = categories.union(f[col].cat.categories)
+        for f in aligned:
+            f[col] = f[col].cat.set_categories(categories)
+    return aligned
+
+def drop_key_columns(df):
+    return df.drop(columns=[col for col in key_columns if col in df.columns])
@@ -0,0 +1,158 @@
+# sheet_cleaner/metrics.py
+# Per-stage timings, row and byte counts, rendered in the Prometheus text format
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+import time
+
+# Stages, in the order a report goes through them:
+#   detect_header, read, filter, sort, group, write, encode
+# Seconds; a 1k-row report is in the tens of ms, a 1M-row merge in the minutes
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LABEL_NAMES = ("stage", "vendor", "format")
+
+_labels = contextvars.ContextVar("sheet_cleaner_metric_labels", default={})
+
+
+class _Registry:
+    """
+    Stage samples keyed by (stage, vendor, format). Each worker process keeps
+    its own; BoundedExecutor ships them back with every job (drain()) and the
+    server adds them to its registry (merge()).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def observe(self, key, seconds, rows, nbytes):
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = {"buckets": [0] * len(STAGE_BUCKETS), "count": 0, "sum": 0.0, "rows": 0, "bytes": 0}
+            for i, bound in enumerate(STAGE_BUCKETS):
+                if seconds <= bound:
+                    sample["buckets"][i] += 1
+            sample["count"] += 1
+            sample["sum"] += seconds
+            sample["rows"] += rows
+            sample["bytes"] += nbytes
+
+    def drain(self):
+        with self._lock:
+            samples, self._samples = self._samples, {}
+        return samples
+
+    def merge(self, samples):
+        with self._lock:
+            for key, other in samples.items():
+                sample = self._samples.get(key)
+                if sample is None:
+                    self._samples[key] = other
+                    continue
+                sample["buckets"] = [a + b for a, b in zip(sample["buckets"], other["buckets"])]
+                for field in ("count", "sum", "rows", "bytes"):
+                    sample[field] += other[field]
+
+    def snapshot(self):
+        with self._lock:
+            return {key: dict(sample, buckets=list(sample["buckets"])) for key, sample in self._samples.items()}
+
+
+registry = _Registry()
+
+
+@contextlib.contextmanager
+def labels(**values):
+    """Default vendor / format for the stages recorded inside the block."""
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+class _Stage:
+    def __init__(self, rows, nbytes, label_values):
+        self.rows = rows
+        self.bytes = nbytes
+        self.labels = label_values
+
+
+@contextlib.contextmanager
+def stage(name, rows=0, nbytes=0, **label_values):
+    """
+    Times the block as one observation of `name`. Set .rows / .bytes (and
+    .labels) on the yielded object when they are only known at the end.
+      with metrics.stage("read", format="csv", nbytes=file_obj.size) as s:
+          df, sniffed = ...
+          s.rows = len(df)
+          s.labels["vendor"] = sniffed.vendor
+    """
+    record = _Stage(rows, nbytes, {**_labels.get(), **label_values})
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        seconds = time.perf_counter() - start
+        key = (name, record.labels.get("vendor", "unknown"), record.labels.get("format", "unknown"))
+        registry.observe(key, seconds, record.rows, record.bytes)
+
+
+def drain():
+    return registry.drain()
+
+
+def merge(samples):
+    registry.merge(samples)
+
+
+def _label_text(names, values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{n}="{v}"' for n, v in zip(names, escaped))
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(gauges=None):
+    """
+    Prometheus text exposition (version 0.0.4) of the stage metrics, plus any
+    gauges given as {name: (help, value)}.
+    """
+    samples = sorted(registry.snapshot().items())
+    lines = [
+        "# HELP sheet_cleaner_stage_seconds Time spent in each pipeline stage.",
+        "# TYPE sheet_cleaner_stage_seconds histogram",
+    ]
+    for key, sample in samples:
+        labels_text = _label_text(LABEL_NAMES, key)
+        for bound, count in zip(STAGE_BUCKETS, sample["buckets"]):
+            lines.append(f'sheet_cleaner_stage_seconds_bucket{{{labels_text},le="{_number(float(bound))}"}} {count}')
+        lines.append(f'sheet_cleaner_stage_seconds_bucket{{{labels_text},le="+Inf"}} {sample["count"]}')
+        lines.append(f"sheet_cleaner_stage_seconds_sum{{{labels_text}}} {_number(sample['sum'])}")
+        lines.append(f"sheet_cleaner_stage_seconds_count{{{labels_text}}} {sample['count']}")
+    for field, help_text in (("rows", "Rows that went into each pipeline stage."), ("bytes", "Bytes read or written by each pipeline stage.")):
+        lines.append(f"# HELP sheet_cleaner_stage_{field}_total {help_text}")
+        lines.append(f"# TYPE sheet_cleaner_stage_{field}_total counter")
+        for key, sample in samples:
+            lines.append(f"sheet_cleaner_stage_{field}_total{{{_label_text(LABEL_NAMES, key)}}} {sample[field]}")
+    for name, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def configure_logging():
+    """
+    Log level from SHEET_CLEANER_LOG_LEVEL (default WARNING). The pipeline logs
+    column lists and shapes at DEBUG and per-upload details at INFO.
+    """
+    level = os.environ.get("SHEET_CLEANER_LOG_LEVEL", "WARNING").upper()
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger("sheet_cleaner").setLevel(level)
@@ -0,0 +1,150 @@
+# sheet_cleaner/profiling.py
+# Opt-in sampling profiler for single requests: collapsed stacks + top-N table
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+DEFAULT_TOP = 30
+
+
+def _frame_name(code):
+    # "function (file.py:line)", the usual collapsed-stack frame label
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread (but its own) every `interval`
+    seconds from a background thread. Samples are weighted by the time since
+    the previous one, so a long C call that holds the GIL (a pandas sort, an
+    xlsxwriter flush) still counts for the time it took.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # (thread name, frame, ...) outermost first -> seconds
+        self.samples = 0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            weight, last = now - last, now
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[tuple(reversed(stack))] += weight
+            self.samples += 1
+
+    def collapsed(self):
+        """
+        Brendan Gregg's collapsed format, one "root;...;leaf <value>" line per
+        distinct stack, value in milliseconds (feed to flamegraph.pl / speedscope).
+        """
+        lines = [f"{';'.join(stack)} {round(seconds * 1000)}" for stack, seconds in self.stacks.most_common()]
+        return "\n".join(line for line in lines if not line.endswith(" 0")) + "\n"
+
+    def top(self, n=DEFAULT_TOP):
+        """
+        Functions by own time (leaf of the stack) with their cumulative time.
+        Returns: list of {"function", "self_seconds", "total_seconds", "self_percent"}
+        """
+        own, total = Counter(), Counter()
+        for stack, seconds in self.stacks.items():
+            own[stack[-1]] += seconds
+            for frame in set(stack[1:]):
+                total[frame] += seconds
+        wall = sum(self.stacks.values()) or 1.0
+        return [
+            {
+                "function": frame,
+                "self_seconds": round(seconds, 4),
+                "total_seconds": round(total[frame], 4),
+                "self_percent": round(100 * seconds / wall, 1),
+            }
+            for frame, seconds in own.most_common(n)
+        ]
+
+
+def format_top(rows):
+    """The top() rows as a fixed-width text table."""
+    lines = [f"{'self s':>9} {'self %':>7} {'total s':>9}  function"]
+    for row in rows:
+        lines.append(f"{row['self_seconds']:9.3f} {row['self_percent']:6.1f}% {row['total_seconds']:9.3f}  {row['function']}")
+    return "\n".join(lines) + "\n"
+
+
+def profile_call(fn, *args, interval=DEFAULT_INTERVAL, top=DEFAULT_TOP):
+    """
+    Runs fn(*args) under StackSampler (in the worker process, so the profile
+    covers the actual cleaning work).
+    Returns: (result, {"seconds", "samples", "interval", "top", "collapsed"})
+    """
+    sampler = StackSampler(interval)
+    with sampler:
+        result = fn(*args)
+    return result, {
+        "seconds": round(sampler.seconds, 4),
+        "samples": sampler.samples,
+        "interval": interval,
+        "top": sampler.top(top),
+        "collapsed": sampler.collapsed(),
+    }
+
+
+def save_profile(directory, profile_id, operation, report, keep=50):
+    """
+    Writes <directory>/<profile_id>/ profile.json (summary + top table),
+    collapsed.txt and top.txt, then drops all but the newest `keep` profiles.
+    """
+    path = os.path.join(directory, profile_id)
+    os.makedirs(path, exist_ok=True)
+    summary = {"id": profile_id, "operation": operation, "created_at": time.time(),
+               **{k: v for k, v in report.items() if k != "collapsed"}}
+    with open(os.path.join(path, "profile.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    with open(os.path.join(path, "collapsed.txt"), "w") as f:
+        f.write(report["collapsed"])
+    with open(os.path.join(path, "top.txt"), "w") as f:
+        f.write(format_top(report["top"]))
+
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.is_dir()),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in profiles[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return path
@@ -0,0 +1,114 @@
+# sheet_cleaner/readers.py
+# XLSX cell readers: calamine (Rust) when installed, else openpyxl read-only streaming
+import datetime
+import os
+
+import numpy as np
+
+# "auto" picks calamine when python-calamine is installed
+XLSX_ENGINE = os.environ.get("SHEET_CLEANER_XLSX_ENGINE", "auto")
+
+
+def calamine_available():
+    try:
+        # Imported only to see whether it is installed
+        import python_calamine  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_engine(engine=None):
+    engine = engine or XLSX_ENGINE
+    if engine == "auto":
+        return "calamine" if calamine_available() else "openpyxl"
+    if engine not in ("calamine", "openpyxl"):
+        raise ValueError(f"Unknown XLSX engine '{engine}'. Use auto, calamine or openpyxl.")
+    return engine
+
+
+def _number(value):
+    # Whole floats become ints, as pandas' Excel readers do
+    if isinstance(value, float):
+        as_int = int(value)
+        return as_int if as_int == value else value
+    return value
+
+
+def _trim(rows):
+    # pandas' layout: trailing empty cells and rows dropped, rows padded to the widest
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    if rows:
+        width = max(len(row) for row in rows)
+        for row in rows:
+            row.extend([""] * (width - len(row)))
+    return rows
+
+
+def _openpyxl_rows(file_obj):
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    error_codes = set(ERROR_CODES)
+    workbook = load_workbook(file_obj, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        rows = []
+        for values in sheet.iter_rows(values_only=True):
+            row = []
+            for value in values:
+                if value is None:
+                    value = ""
+                elif isinstance(value, str):
+                    if value in error_codes:
+                        value = np.nan
+                elif not isinstance(value, bool):
+                    value = _number(value)
+                row.append(value)
+            rows.append(row)
+    finally:
+        workbook.close()
+    return rows
+
+
+def _calamine_rows(file_obj):
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_filelike(file_obj)
+    try:
+        values = workbook.get_sheet_by_index(0).to_python(skip_empty_area=False)
+    finally:
+        workbook.close()
+
+    rows = []
+    for raw in values:
+        row = []
+        for value in raw:
+            if isinstance(value, float):
+                value = _number(value)
+            elif isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+                value = datetime.datetime(value.year, value.month, value.day)
+            row.append(value)
+        rows.append(row)
+    return rows
+
+
+def read_xlsx_rows(file_obj, engine=None):
+    """
+    Cell values of the first sheet, laid out the way pd.read_excel hands them to
+    its parser ("" for empty cells, whole floats as int), so either engine
+    produces the same DataFrame downstream.
+    Returns: list[list]
+    """
+    engine = resolve_engine(engine)
+    file_obj.seek(0)
+    try:
+        rows = _calamine_rows(file_obj) if engine == "calamine" else _openpyxl_rows(file_obj)
+    finally:
+        file_obj.seek(0)
+    return _trim(rows)
@@ -0,0 +1,125 @@
+# sheet_cleaner/schemas.py
+# Vendor headers and the column lists the cleaning pipeline works from
+
+# List of columns to hide (delete)
+columns_to_hide = [
+    "Ride ID", "Pickup Time (UTC)", "Pickup Timezone offset from UTC", "Pickup Date (UTC)",
+    "Drop-off Time (Local)", "Drop-off Time (UTC)", "Drop-off Timezone", "Drop-off Date (Local)", "Drop-off Date (UTC)", "Email",
+    "Pickup City", "Pickup State", "Pickup Zip Code", "Requester Name",
+    "Drop-off City", "Drop-off State", "Drop-off Zip Code",
+    "Request Address", "Request City", "Request State", "Request Zip Code",
+    "Destination Address", "Destination City", "Destination State", "Destination Zip Code",
+    "Duration (minutes)", "Ride Fare", "Ride Fees", "Ride Discounts", "Ride Tip", "Ride Cost",
+    "Business Services Fee", "Transaction Date (UTC)", "Transaction Time (UTC)", "Transaction Currency", "Transaction Outcome",
+    "Expense Code", "Expense Note", "Ride Type", "Employee ID", "Custom Tag 1", "Custom Tag 2",
+    "Fare Type", "Scheduled Ride Id", "Flex Ride Id", "Flex Ride", "Pickup Latitude", "Pickup Longitude",
+    "Drop-off Latitude", "Drop-off Longitude",
+    "Trip/Eats ID", "Transaction Timestamp (UTC)", "Request Date (UTC)", "Request Time (UTC)", "Request Date (Local)", "Request Time (Local)",
+    "Request Type", "Request Timezone Offset from UTC", "Service", "City", "Haversine Distance (mi)", "Duration (min)", "Drop Off Latitude",
+    "Drop Off Longitude", "Expense Code", "Invoices", "Program", "Group", "Payment Method", "Fare in Local Currency (excl. Taxes)", "Taxes in Local Currency",
+    "Tip in Local Currency", "Taxes in Local Currency", "Tip in Local Currency",
+    "Local Currency Code", "Fare in USD (excl. Taxes)", "Taxes in USD", "Tip in USD", "Transaction Amount in USD (incl. Taxes)", "Estimated Service and Technology Fee (incl. Taxes, if any) in USD",
+    "Health Dashboard URL", "Invoice Number", "Driver First Name", "Deductions in Local Currency", "Member ID", "Plan ID", "Network Transaction Id",
+    "IsGroupOrder", "Fulfilment Type", "Country", "Cancellation type", "Membership Savings(Local Currency)", "Granular Service Purpose Type"
+]
+
+# Define expected headers for uber file
+expected_headers_uber = [
+    "Trip/Eats ID", "Transaction Timestamp (UTC)", "Request Date (UTC)", "Request Time (UTC)", "Request Date (Local)", "Request Time (Local)", 
+    "Request Type", "Pickup Date (UTC)", "Pickup Time (UTC)", "Pickup Date (Local)", "Pickup Time (Local)", 
+    "Drop-off Date (UTC)", "Drop-off Time (UTC)", "Drop-off Date (Local)", "Drop-off Time (Local)", 
+    "Request Timezone Offset from UTC", "First Name", "Last Name", "Email", "Employee ID", "Service", "City", 
+    "Distance (mi)", "Haversine Distance (mi)", "Duration (min)", "Pickup Address", "Pickup Latitude", "Pickup Longitude", 
+    "Drop-off Address", "Drop Off Latitude", "Drop Off Longitude", "Ride Status", "Expense Code", "Internal Note", 
+    "Invoices", "Program", "Group", "Payment Method", "Transaction Type", 
+    "Fare in Local Currency (excl. Taxes)", "Taxes in Local Currency", "Tip in Local Currency", 
+    "Transaction Amount in Local Currency (incl. Taxes)", "Local Currency Code", 
+    "Fare in USD (excl. Taxes)", "Taxes in USD", "Tip in USD", "Transaction Amount in USD (incl. Taxes)", 
+    "Estimated Service and Technology Fee (incl. Taxes, if any) in USD", 
+    "Health Dashboard URL", "Invoice Number", "Driver First Name", "Guest First Name", 
+    "Guest Last Name", "Passenger Number", "Deductions in Local Currency", "Member ID", "Plan ID"
+]
+
+# Define expected headers for lyft file
+expected_headers_lyft = [
+    "Ride ID", "Pickup Date (UTC)", "Pickup Time (UTC)", "Pickup Date (Local)", "Pickup Time (Local)",
+    "Pickup Timezone offset from UTC", "Drop-off Date (UTC)", "Drop-off Time (UTC)",
+    "Drop-off Date (Local)", "Drop-off Time (Local)", "First Name", "Last Name", "Email",
+    "Pickup Address", "Pickup City", "Pickup State", "Pickup Zip Code", "Drop-off Address",
+    "Drop-off City", "Drop-off State", "Drop-off Zip Code", "Request Address", "Request City",
+    "Request State", "Request Zip Code", "Destination Address", "Destination City",
+    "Destination State", "Destination Zip Code", "Distance (miles)", "Duration (minutes)",
+    "Ride Fare", "Ride Fees", "Ride Discounts", "Ride Tip", "Ride Cost", "Business Services Fee",
+    "Transaction Date (UTC)", "Transaction Time (UTC)", "Transaction Amount", "Transaction Currency",
+    "Transaction Type", "Expense Code", "Expense Note", "Ride Type", "Employee ID", "Custom Tag 1",
+    "Custom Tag 2", "Passenger Number", "Requester Name", "Requester Email", "Internal Note",
+    "Fare Type", "Scheduled Ride Id", "Flex Ride Id", "Pickup Latitude", "Pickup Longitude",
+    "Drop-off Latitude", "Drop-off Longitude"
+]
+
+# Columns clean_file_without_headers() keeps, in output order
+desired_columns = [
+    "Pickup Date (Local)",
+    "Pickup Time (Local)",
+    "First Name",
+    "Last Name",
+    "Email Info",
+    "Distance (miles)",
+    "Pickup Address",
+    "Drop-off Address",
+    "Transaction Type",
+    "Internal Note",
+    "Transaction Amount",
+    "Passenger Number"
+]
+
+# Vendor names clean_file_without_headers() maps onto the standard ones
+standard_rename_map = {
+    "Distance (mi)": "Distance (miles)",
+    "Transaction Amount in Local Currency (incl. Taxes)": "Transaction Amount",
+    "Guest Phone Number": "Passenger Number",
+    "Expense Memo": "Internal Note",
+}
+
+# Vendor names clean_file() maps onto the report ones
+clean_rename_map = {
+    "Distance (mi)": "Distance (miles)",
+    "Transaction Amount in Local Currency (incl. Taxes)": "Transaction Amount",
+    "Ride Status": "Transaction Type",
+    "Guest Phone Number": "Passenger Number",
+    "Expense Memo": "Internal Note",
+    "Email": 'Email Info',
+    "Requester Email": 'Email Info',
+}
+
+# Every source column clean_file_without_headers() reads; anything else can be skipped at parse time
+standard_source_columns = set(desired_columns) | set(standard_rename_map) | {
+    "Guest First Name", "Guest Last Name", "Ride Status", "Email", "Requester Email",
+}
+
+internal_note_values = ["FCC", "FCM", "FCSH", "FCSC", "DTF"]
+
+# Rider grouping key, sort order and the transaction columns that get a per-rider total
+rider_key_columns = ["Passenger Number", "Last Name", "First Name"]
+rider_sort_columns = ["Last Name", "First Name", "Passenger Number"]
+transaction_columns = ["Transaction Amount", "Transaction Amount in Local Currency (incl. Taxes)"]
+
+# Forsyth billing columns split_by_internal_note() adds to the DTF report
+forsyth_columns = ["Rider Co-Pay", "Post Co-Pay Cost", "Forsyth Bill", "Rider Share over $13", "Rider Cost Rider Bill"]
+
+# Column types in the columnar (Parquet / Arrow / CSV) outputs; everything else is text
+numeric_columns = [
+    *transaction_columns, "Distance (miles)", "Distance (mi)", "Fare", "Fares Only", "Trips Count",
+    *forsyth_columns, "TOTAL Forsyth Bill", "TOTAL Rider Cost Rider Bill",
+]
+date_columns = ["Pickup Date (Local)"]
+
+# Row colours in the styled reports, keyed by Internal Note
+note_fill_colors = {
+    "FCC": "D9E1F2",
+    "FCM": "E2EFDA",
+    "FCSH": "FFF2CC",
+    "FCSC": "FCE4D6",
+    "DTF": "E4DFEC",
+    "Other": "D9D9D9",
+}
@@ -0,0 +1,201 @@
+# sheet_cleaner/split.py
+# Per-chapter exports grouped by Internal Note
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .ingest import read_export
+from .keys import normalize_keys, has_note, note_key_column
+from .grouping import append_total_row, rider_group_ids, build_rider_subtotals
+from .writer import write_styled_sheet
+from .columnar import check_output_format, report_tables
+from .schemas import transaction_columns
+
+def split_by_internal_note(df, progress=None, output_format="xlsx"):
+    """
+    Exports grouped files:
+      - "Forsyth": DTF + DTFCE (with Forsyth billing columns)
+      - "Fulton":  FCC + FCM + FCSH + FCSC (combined)
+      - "Other_report": any other non-empty Internal Note values
+    progress(stage), when given, is called with "split: <name>" before each file.
+    output_format "parquet" / "arrow" / "csv" gives each file as a ZIP of typed
+    tables (<name> + <name>_rider_totals) instead of a workbook.
+    Returns: dict[str, tuple[pd.DataFrame, BytesIO]]
+    """
+    check_output_format(output_format)
+    split_files = {}
+
+    if 'Internal Note' not in df.columns:
+        return {}
+
+    # Normalize key fields once (stripped rider keys, case-insensitive notes)
+    df = normalize_keys(df)
+    norm_notes = df[note_key_column]
+
+    # Note groups
+    forsyth_notes = {"DTF", "DTFCE"}
+    fulton_notes  = {"FCC", "FCM", "FCSH", "FCSC"}
+
+    # Split datasets
+    dtf_mask = norm_notes.isin(forsyth_notes)
+    df_forsyth = df[dtf_mask].copy()
+    df_fulton  = df[norm_notes.isin(fulton_notes)].copy()
+
+    # Remaining = anything not Forsyth or Fulton but still has a note
+    remaining = df[~norm_notes.isin(forsyth_notes.union(fulton_notes))].copy()
+    other_df = remaining[has_note(remaining)]
+
+    def group_and_export(df_note, name, is_dtf=False):
+        # prefer "Fare", fallback to "Fares Only"
+        fare_candidates = [c for c in ("Fare", "Fares Only") if c in df_note.columns]
+        fare_col = fare_candidates[0] if fare_candidates else None
+
+        if is_dtf:
+            df_note = df_note.reset_index(drop=True)
+            if fare_col is not None:
+                # float64 even for Arrow-backed frames, whose round(2) differs from numpy's
+                fare = pd.to_numeric(df_note[fare_col], errors="coerce").astype("float64")
+            else:
+                fare = pd.Series(np.nan, index=df_note.index)
+
+            # Rider Co-Pay = 5.00
+            df_note["Rider Co-Pay"] = 5.00
+            # Post Co-Pay Cost = Fare - Rider Co-Pay
+            post = (fare - 5.00).round(2)
+            df_note["Post Co-Pay Cost"] = post
+            # Forsyth Bill = MIN(8, MAX(0, Fare - 5))
+            df_note["Forsyth Bill"] = post.clip(lower=0.00, upper=8.00).round(2)
+            # Rider Share over $13 = IF(Fare > 13, Fare - 13, 0)
+            share_over_13 = (fare - 13.00).clip(lower=0.00).round(2)
+            df_note["Rider Share over $13"] = share_over_13
+            # Rider Cost Rider Bill = Rider Co-Pay + Rider Share over $13
+            df_note["Rider Cost Rider Bill"] = (5.00 + share_over_13).round(2)
+
+            # per-user totals on the last row of each rider group
+            if output_format == "xlsx":
+                group_ids = rider_group_ids(df_note)
+                is_last_row = np.append(group_ids[1:] != group_ids[:-1], True)
+                totals = df_note[["Forsyth Bill", "Rider Cost Rider Bill"]].groupby(group_ids).transform("sum").round(2)
+                df_note["TOTAL Forsyth Bill"] = totals["Forsyth Bill"].where(is_last_row)
+                df_note["TOTAL Rider Cost Rider Bill"] = totals["Rider Cost Rider Bill"].where(is_last_row)
+
+        # Drop unwanted columns in final output
+        drop_cols = [
+            "Transaction Type",
+            "Transaction Amount",
+            "Passenger Number",
+            "Email Info",
+            "Trips Count",
+        ]
+
+        if output_format != "xlsx":
+            # The <name>_rider_totals table stands in for the subtotal rows and TOTAL columns
+            total_cols = [c for c in [*transaction_columns, fare_col, "Forsyth Bill", "Rider Cost Rider Bill"] if c not in drop_cols]
+            return report_tables(name, df_note, total_cols, output_format, drop=drop_cols)
+
+        final_df = build_rider_subtotals(df_note, fill=None)
+
+        final_df = final_df.drop(columns=[c for c in drop_cols if c in final_df.columns], errors="ignore")
+
+        # Ensure numeric dtypes
+        for col in [
+            "Transaction Amount",
+            "Transaction Amount in Local Currency (incl. Taxes)",
+            "Fare",
+            "Fares Only",
+            "Trips Count",
+            "Rider Co-Pay",
+            "Post Co-Pay Cost",
+            "Forsyth Bill",
+            "Rider Share over $13",
+            "Rider Cost Rider Bill",
+            "TOTAL Forsyth Bill",
+            "TOTAL Rider Cost Rider Bill",
+        ]:
+            if col in final_df.columns:
+                final_df[col] = pd.to_numeric(final_df[col], errors="coerce")
+
+        # Put Forsyth fields at the end (only when is_dtf)
+        if is_dtf:
+            tail_cols = [
+                "Rider Co-Pay",
+                "Post Co-Pay Cost",
+                "Forsyth Bill",
+                "Rider Share over $13",
+                "Rider Cost Rider Bill",
+                "TOTAL Rider Cost Rider Bill",
+                "TOTAL Forsyth Bill",
+            ]
+            for tail_col in tail_cols:
+                if tail_col not in final_df.columns:
+                    final_df[tail_col] = None
+            cols = [c for c in final_df.columns if c not in tail_cols]
+            cols.extend(tail_cols)
+            final_df = final_df[cols]
+
+        # Reorder the last 3 columns exactly as requested
+        end_order = ["Internal Note", "TOTAL Forsyth Bill", "TOTAL Rider Cost Rider Bill"]
+        present = [c for c in end_order if c in final_df.columns]
+        other_cols = [c for c in final_df.columns if c not in present]
+        final_df = final_df[other_cols + present]
+
+        # Grand total for Fare (or Fares Only)
+        fare_total_col = "Fare" if "Fare" in final_df.columns else ("Fares Only" if "Fares Only" in final_df.columns else None)
+        if fare_total_col:
+            fares_total = pd.to_numeric(final_df[fare_total_col], errors="coerce").sum()
+            final_df = append_total_row(final_df, fare_total_col, round(fares_total, 2), fill=None)
+
+        # Currency formatting
+        currency_cols = [
+            fare_total_col,
+            "Rider Co-Pay",
+            "Post Co-Pay Cost",
+            "Forsyth Bill",
+            "Rider Share over $13",
+            "Rider Cost Rider Bill",
+            "TOTAL Rider Cost Rider Bill",
+            "TOTAL Forsyth Bill",
+        ]
+
+        output = BytesIO()
+        write_styled_sheet(
+            final_df, output, "Sheet1",
+            number_formats={c: '"$"#,##0.00' for c in currency_cols if c and c in final_df.columns},
+        )
+
+        output.seek(0)
+        return final_df, output
+
+    # --- Exports ---
+
+    def export(name, df_note, is_dtf=False):
+        if progress:
+            progress(f"split: {name}")
+        split_files[name] = group_and_export(df_note, name, is_dtf=is_dtf)
+
+    # DTF combined (DTF + DTFCE)
+    if not df_forsyth.empty:
+        export("Forsyth", df_forsyth, is_dtf=True)
+
+    if not df_fulton.empty:
+        export("Fulton", df_fulton)
+
+    if not other_df.empty:
+        export("Other_report", other_df)
+
+    return split_files
+
+def split_export(file_obj, output_format="xlsx"):
+    """
+    split_by_internal_note() straight from an uploaded CSV/XLSX (read once via
+    read_export()). Raises ValueError when the upload can't be read as an export.
+    Returns: dict[str, tuple[pd.DataFrame, BytesIO]]
+    """
+    check_output_format(output_format)
+    df, sniffed = read_export(file_obj)
+    if df is None:
+        raise ValueError("not a recognised export layout")
+    with metrics.labels(vendor=sniffed.vendor, format=sniffed.kind):
+        return split_by_internal_note(df, output_format=output_format)
@@ -0,0 +1,84 @@
+# sheet_cleaner/uploads.py
+# Uploads spooled to disk instead of held in memory
+import hashlib
+import io
+import os
+import tempfile
+
+CHUNK_BYTES = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """Raised when an upload goes past the configured size limit."""
+
+    def __init__(self, name, max_bytes):
+        super().__init__(f"{name} is larger than the {max_bytes // (1024 * 1024)} MB upload limit.")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload(io.BufferedReader):
+    """
+    Read-only handle on an upload saved to a temporary file. Looks like the
+    in-memory uploads the cleaners expect (.name / .type / .size, seek/read),
+    but pickles as its path, so a worker process reopens the file rather than
+    receiving a copy of its bytes. Call discard() when the request is done.
+    """
+
+    def __init__(self, path, name, type=None, size=None, sha256=None):
+        super().__init__(io.FileIO(path, "rb"))
+        self.path = path
+        self.filename = name
+        self.type = type
+        self.size = os.path.getsize(path) if size is None else size
+        self.sha256 = sha256
+
+    @property
+    def name(self):
+        return self.filename
+
+    def __reduce_ex__(self, protocol):
+        return (SpooledUpload, (self.path, self.filename, self.type, self.size, self.sha256))
+
+    def discard(self):
+        self.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadSpool:
+    """
+    Writes an upload to a temporary file chunk by chunk, enforcing max_bytes
+    and hashing the content on the way (SpooledUpload.sha256).
+    Usage: spool.write(chunk) ... then spool.finish() -> SpooledUpload.
+    On any error call spool.abort() so the partial file is removed.
+    """
+
+    def __init__(self, name, type=None, max_bytes=None, dir=None):
+        self.name = name
+        self.type = type
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        # keep the extension: the loaders pick CSV vs XLSX from it
+        suffix = os.path.splitext(name or "")[1]
+        self._tmp = tempfile.NamedTemporaryFile(prefix="upload-", suffix=suffix, dir=dir, delete=False)
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(self.name, self.max_bytes)
+        self._sha256.update(chunk)
+        self._tmp.write(chunk)
+
+    def finish(self):
+        self._tmp.close()
+        return SpooledUpload(self._tmp.name, self.name, self.type, self.size, self._sha256.hexdigest())
+
+    def abort(self):
+        self._tmp.close()
+        try:
+            os.unlink(self._tmp.name)
+        except FileNotFoundError:
+            pass
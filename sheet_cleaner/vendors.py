@@ -0,0 +1,117 @@
+# sheet_cleaner/vendors.py
+# Vendor schema registry: header signatures, rename maps and column rules per export layout
+import hashlib
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .schemas import (
+    clean_rename_map, columns_to_hide, expected_headers_lyft, expected_headers_uber,
+    standard_rename_map, standard_source_columns,
+)
+
+# Any of these in the first row means the export kept its header row
+header_markers = ["Last Name", "Passenger Number", "Ride ID", "Trip/Eats ID", "Internal Note", "Expense Memo"]
+
+# Headerless exports: Uber's 7th column (Request Type) is text, Lyft's (Pickup
+# Timezone offset from UTC) has digits
+HEADERLESS_PROBE_COLUMN = 6
+
+
+def normalize_name(name):
+    return str(name).replace("\ufeff", "").strip().lower()
+
+
+def header_signature(names):
+    """Stable hash of a header row: the names stripped and case-folded, in order."""
+    joined = "\x1f".join(normalize_name(name) for name in names)
+    return hashlib.blake2b(joined.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True)
+class VendorSchema:
+    """
+    Everything the loaders need to know about one export layout, compiled once:
+      headers: the vendor's full header row (headerless files are given these)
+      id_column: a column only this vendor's header row has
+      rename_map / standard_rename_map: vendor names -> report names for
+        clean_file() / clean_and_sort()
+      hidden: columns clean_file() drops
+      standard_columns: the only columns clean_and_sort() reads (None: all)
+    """
+    name: str
+    headers: tuple = ()
+    id_column: Optional[str] = None
+    rename_map: dict = field(default_factory=lambda: dict(clean_rename_map))
+    standard_rename_map: dict = field(default_factory=lambda: dict(standard_rename_map))
+    hidden: frozenset = frozenset(columns_to_hide)
+    standard_columns: Optional[frozenset] = frozenset(standard_source_columns)
+    signature: str = field(init=False, default="")
+
+    def __post_init__(self):
+        object.__setattr__(self, "headers", tuple(self.headers))
+        object.__setattr__(self, "signature", header_signature(self.headers) if self.headers else "")
+
+
+UBER = VendorSchema("uber", expected_headers_uber, id_column="Trip/Eats ID")
+LYFT = VendorSchema("lyft", expected_headers_lyft, id_column="Ride ID")
+# Uber Central export behind a banner; Guest names are the riders, Email is kept
+COMMON_COURTESY = VendorSchema(
+    "common_courtesy", expected_headers_uber,
+    hidden=frozenset(columns_to_hide) - {"Email"} | {"Transaction Type"},
+    standard_columns=None,
+)
+# A header row with the markers but no vendor id column
+UNKNOWN = VendorSchema("unknown")
+
+SCHEMAS = {}
+_by_signature = {}
+_by_id_column = {}
+_markers = frozenset(normalize_name(marker) for marker in header_markers)
+
+
+def register_vendor(schema, detect=True):
+    """
+    Adds a schema to the registry. With detect=True its exact header row and
+    its id column identify it (identify()); Common Courtesy shares Uber's
+    header and is recognised by its banner instead.
+    """
+    SCHEMAS[schema.name] = schema
+    if detect:
+        if schema.signature:
+            _by_signature[schema.signature] = schema
+        if schema.id_column:
+            _by_id_column[normalize_name(schema.id_column)] = schema
+    return schema
+
+
+for _schema in (UBER, LYFT):
+    register_vendor(_schema)
+register_vendor(COMMON_COURTESY, detect=False)
+register_vendor(UNKNOWN, detect=False)
+
+
+def get_schema(name):
+    return SCHEMAS.get(name, UNKNOWN)
+
+
+def identify(names):
+    """
+    The schema a header row belongs to: one signature lookup for an unaltered
+    vendor header, else its vendor id column, else UNKNOWN when it still has
+    the header markers.
+    Returns: VendorSchema | None (not a header row)
+    """
+    schema = _by_signature.get(header_signature(names))
+    if schema is not None:
+        return schema
+    normalized = {normalize_name(name) for name in names}
+    for id_column, schema in _by_id_column.items():
+        if id_column in normalized:
+            return schema
+    return UNKNOWN if normalized & _markers else None
+
+
+def identify_headerless(first_row):
+    """Uber or Lyft for an export without its header row, from its first data row."""
+    value = first_row[HEADERLESS_PROBE_COLUMN] if len(first_row) > HEADERLESS_PROBE_COLUMN else ""
+    return LYFT if any(ch.isdigit() for ch in str(value)) else UBER
@@ -0,0 +1,110 @@
+# sheet_cleaner/writer.py
+# Styled XLSX output (xlsxwriter is only imported when a workbook is written)
+import math
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .schemas import note_fill_colors
+
+def excel_cell_value(value):
+    """
+    Converts a DataFrame value the same way pandas' Excel writer does.
+    Returns: (value, number_format or None)
+    """
+    value_type = type(value)
+    if value_type is str or value_type is int:
+        return value, None
+    if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)):
+        return None, None
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value), None
+    if isinstance(value, np.integer):
+        return int(value), None
+    if isinstance(value, (float, np.floating)):
+        value = float(value)
+        if math.isinf(value):
+            return ("inf" if value > 0 else "-inf"), None
+        return value, None
+    if isinstance(value, datetime.datetime):
+        return value, "YYYY-MM-DD HH:MM:SS"
+    if isinstance(value, datetime.date):
+        return value, "YYYY-MM-DD"
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds() / 86400, "0"
+    return str(value), None
+
+def write_styled_rows(output, columns, rows, sheet_name="Sheet1", note_fills=False, borders=False, number_formats=None):
+    """
+    Streams rows into a one-sheet workbook with xlsxwriter in constant-memory mode
+    (each row is flushed as soon as it is written), styling every cell as it is
+    emitted instead of re-walking the finished sheet.
+    - note_fills: colour data rows by Internal Note (totals/spacer rows are left unfilled)
+    - borders: thin border on every data cell
+    - number_formats: {column name: Excel number format} for data cells
+    """
+    import xlsxwriter
+
+    columns = list(columns)
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True, "strings_to_urls": False})
+    worksheet = workbook.add_worksheet(sheet_name)
+    for col_idx, col in enumerate(columns):
+        worksheet.write(0, col_idx, excel_cell_value(col)[0])
+
+    note_idx = columns.index("Internal Note") if "Internal Note" in columns else None
+    trips_idx = columns.index("Trips Count") if "Trips Count" in columns else None
+    colour_rows = note_fills and note_idx is not None and trips_idx is not None
+    column_formats = [(number_formats or {}).get(col) for col in columns]
+
+    # One workbook format per (fill, number format) combination
+    cell_formats = {}
+
+    def cell_format(fill_name, number_format):
+        key = (fill_name, number_format)
+        if key not in cell_formats:
+            props = {}
+            if borders:
+                props["border"] = 1
+            if fill_name:
+                props.update(pattern=1, bg_color="#" + note_fill_colors[fill_name])
+            if number_format:
+                props["num_format"] = number_format
+            cell_formats[key] = workbook.add_format(props) if props else None
+        return cell_formats[key]
+
+    # Cells are styled as they are written, so "write" covers both; "encode" is
+    # xlsxwriter assembling and deflating the package on close()
+    row_idx = 0
+    with metrics.stage("write") as stage:
+        for row_idx, row in enumerate(rows, start=1):
+            values = [excel_cell_value(value) for value in row]
+
+            fill_name = None
+            if colour_rows:
+                trips_value = values[trips_idx][0]
+                is_summary_row = not trips_value or str(trips_value).strip() == ""
+                note_value = str(values[note_idx][0]).strip() if values[note_idx][0] else ""
+                if note_value and not is_summary_row:
+                    fill_name = note_value if note_value in note_fill_colors else "Other"
+
+            for col_idx, ((value, value_format), column_format) in enumerate(zip(values, column_formats)):
+                fmt = cell_format(fill_name, column_format or value_format)
+                if value is None or value == "":
+                    if fmt is not None:
+                        worksheet.write_blank(row_idx, col_idx, None, fmt)
+                else:
+                    worksheet.write(row_idx, col_idx, value, fmt)
+        stage.rows = row_idx
+
+    with metrics.stage("encode") as stage:
+        workbook.close()
+        stage.bytes = output.tell() if hasattr(output, "tell") else 0
+
+def write_styled_sheet(df, output, sheet_name="Sheet1", **style):
+    """Writes a DataFrame with write_styled_rows (see there for the style options)."""
+    # Each column is converted to Python values in one call (Arrow-backed
+    # columns would otherwise box every cell on iteration)
+    columns = [df.iloc[:, i].to_numpy(dtype=object) for i in range(df.shape[1])]
+    write_styled_rows(output, df.columns, zip(*columns), sheet_name=sheet_name, **style)
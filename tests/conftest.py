@@ -0,0 +1,61 @@
+# tests/conftest.py
+# Shared fixtures: synthetic exports (benchmarks.exports) and the FastAPI app
+import importlib
+import io
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from benchmarks.exports import synthetic_export
+
+
+@pytest.fixture
+def export():
+    """export(layout, fmt, rows=300, seed=0) -> a fresh synthetic upload."""
+    def make(layout, fmt, rows=300, seed=0):
+        return synthetic_export(layout, fmt, rows, riders=max(1, rows // 6), seed=seed)
+    return make
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """TestClient on main.app, with downloads/ (cache, jobs, results) in a temp dir."""
+    from fastapi.testclient import TestClient
+
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("api"))
+    try:
+        main = importlib.import_module("main")
+        with TestClient(main.app) as test_client:
+            yield test_client
+    finally:
+        os.chdir(cwd)
+
+
+def upload(field, file_obj):
+    return (field, (file_obj.name, file_obj.getvalue(), file_obj.type or "application/octet-stream"))
+
+
+def zip_members(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: zf.read(name) for name in zf.namelist()}
+
+
+def sheet_values(data):
+    """Every cell of a workbook's first sheet as read back by openpyxl, header row first."""
+    from openpyxl import load_workbook
+
+    ws = load_workbook(io.BytesIO(data)).worksheets[0]
+    return [list(row) for row in ws.iter_rows(values_only=True)]
+
+
+def read_table(data, name):
+    if name.endswith(".csv"):
+        return pd.read_csv(io.BytesIO(data))
+    if name.endswith(".parquet"):
+        return pd.read_parquet(io.BytesIO(data))
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.BufferReader(data)).read_pandas()
@@ -0,0 +1,78 @@
+# tests/test_arrow_backend.py
+import re
+
+import pandas as pd
+import pytest
+
+from sheet_cleaner import ingest
+from sheet_cleaner.cleaning import clean_file, sort_and_merge
+from sheet_cleaner.grouping import arrow_backed
+from sheet_cleaner.ingest import read_export, resolve_dtype_backend
+from sheet_cleaner.split import split_by_internal_note
+
+from .conftest import sheet_values
+
+pytest.importorskip("pyarrow")
+
+LAYOUTS = ["uber", "lyft", "common_courtesy", "uber_headerless"]
+
+
+def _cells(data):
+    # Arrow keeps phone numbers as integers: 4045551234, not 4045551234.0
+    return [
+        [re.sub(r"^(\d{10})\.0$", r"\1", value) if isinstance(value, str) else value for value in row]
+        for row in sheet_values(data)
+    ]
+
+
+@pytest.fixture
+def arrow_backend(monkeypatch):
+    def use(backend):
+        monkeypatch.setattr(ingest, "DTYPE_BACKEND", backend)
+    return use
+
+
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_read_export_arrow_dtypes(export, fmt):
+    df, _sniffed = read_export(export("uber", fmt), dtype_backend="pyarrow")
+    assert all(isinstance(dtype, pd.ArrowDtype) for dtype in df.dtypes)
+    numpy_df, _sniffed = read_export(export("uber", fmt), dtype_backend="numpy")
+    assert not arrow_backed(numpy_df)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_clean_workbook_matches_numpy(export, arrow_backend, layout):
+    arrow_backend("numpy")
+    numpy_df, numpy_output = clean_file(export(layout, "csv"))
+    arrow_backend("pyarrow")
+    arrow_df, arrow_output = clean_file(export(layout, "csv"))
+    assert arrow_backed(arrow_df)
+    assert _cells(arrow_output.getvalue()) == _cells(numpy_output.getvalue())
+
+
+def test_merge_workbook_matches_numpy(export, arrow_backend):
+    def files():
+        return [export(layout, "xlsx" if i % 2 else "csv", seed=i) for i, layout in enumerate(LAYOUTS)]
+
+    arrow_backend("numpy")
+    _df, numpy_output = sort_and_merge(*files())
+    arrow_backend("pyarrow")
+    _df, arrow_output = sort_and_merge(*files())
+    assert _cells(arrow_output.getvalue()) == _cells(numpy_output.getvalue())
+
+
+def test_split_workbooks_match_numpy(export, arrow_backend):
+    arrow_backend("numpy")
+    numpy_df, _output = clean_file(export("uber", "csv"))
+    arrow_backend("pyarrow")
+    arrow_df, _output = clean_file(export("uber", "csv"))
+    numpy_split = split_by_internal_note(numpy_df)
+    arrow_split = split_by_internal_note(arrow_df)
+    assert list(arrow_split) == list(numpy_split)
+    for name, (_df, output) in arrow_split.items():
+        assert _cells(output.getvalue()) == _cells(numpy_split[name][1].getvalue()), name
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown dtype backend"):
+        resolve_dtype_backend("polars")
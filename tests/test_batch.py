@@ -0,0 +1,109 @@
+# tests/test_batch.py
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheet_cleaner.batch import merge_and_split
+
+from .conftest import read_table, upload, zip_members
+
+BILLING_COLUMNS = ["Post Co-Pay Cost", "Forsyth Bill", "Rider Share over $13", "Rider Cost Rider Bill"]
+
+
+def _workbook_rows(data):
+    # Data rows only: subtotal, spacer and grand total rows have no Internal Note
+    df = pd.read_excel(io.BytesIO(data))
+    return df[df["Internal Note"].notna()].reset_index(drop=True)
+
+
+def _pair(export):
+    return export("uber", "csv", seed=1), export("lyft", "xlsx", seed=2)
+
+
+def test_merge_and_split_columnar_billing_matches_xlsx(client, export):
+    files = _pair(export)
+    xlsx = zip_members(client.post("/merge-and-split", files=[upload("files", f) for f in files]).content)
+    csv = zip_members(client.post("/merge-and-split?output_format=csv", files=[upload("files", f) for f in files]).content)
+
+    workbook = _workbook_rows(xlsx["split/Forsyth.xlsx"])
+    table = read_table(csv["split/Forsyth.csv"], "split/Forsyth.csv")
+    assert len(table) == len(workbook) > 0
+    for col in BILLING_COLUMNS:
+        assert table[col].notna().all(), col
+        np.testing.assert_allclose(table[col].to_numpy(), workbook[col].to_numpy(), err_msg=col)
+
+    totals = read_table(csv["split/Forsyth_rider_totals.csv"], "split/Forsyth_rider_totals.csv")
+    np.testing.assert_allclose(totals["Forsyth Bill"].to_numpy(), workbook["TOTAL Forsyth Bill"].dropna().to_numpy())
+    np.testing.assert_allclose(
+        totals["Rider Cost Rider Bill"].to_numpy(), workbook["TOTAL Rider Cost Rider Bill"].dropna().to_numpy(),
+    )
+    assert totals["Fares Only"].sum() > 0
+
+
+def test_merge_and_split_xlsx_matches_merge_then_split(client, export):
+    files = _pair(export)
+    combined = zip_members(client.post("/merge-and-split", files=[upload("files", f) for f in files]).content)
+    merged = client.post("/merge", files=[upload("files", f) for f in files]).content
+    assert pd.read_excel(io.BytesIO(combined["merged_report.xlsx"])).equals(pd.read_excel(io.BytesIO(merged)))
+
+    round_trip = zip_members(client.post(
+        "/split?mode=zip", files=[("file", ("merged_report.xlsx", merged, "application/octet-stream"))],
+    ).content)
+    for name, data in round_trip.items():
+        assert pd.read_excel(io.BytesIO(combined[f"split/{name}"])).equals(pd.read_excel(io.BytesIO(data))), name
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "arrow"])
+def test_merge_and_split_columnar_layout(export, output_format):
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    members = zip_members(merge_and_split(*_pair(export), output_format=output_format).getvalue())
+    ext = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}[output_format]
+    assert f"merged{ext}" in members and f"merged_rider_totals{ext}" in members
+    assert {f"split/Forsyth{ext}", f"split/Fulton{ext}", f"split/Other_report{ext}"} <= set(members)
+    merged = read_table(members[f"merged{ext}"], f"merged{ext}")
+    assert "Fares Only" not in merged.columns
+
+
+def test_merge_and_split_needs_files():
+    with pytest.raises(ValueError):
+        merge_and_split()
+
+
+def _named(file_obj, name):
+    return ("files", (name, file_obj.getvalue(), "application/octet-stream"))
+
+
+def test_batch_mixed_and_repeated_names(client, export):
+    files = [
+        _named(export("uber", "csv", seed=1), "export.csv"),
+        _named(export("lyft", "xlsx", seed=2), "export.xlsx"),
+        _named(export("lyft", "csv", seed=3), "export.csv"),
+        ("files", ("junk.csv", b"a,b\n1,2\n", "text/csv")),
+        ("files", ("junk.csv", b"", "text/csv")),
+        ("files", ("notes.txt", b"hello", "text/plain")),
+    ]
+    response = client.post("/batch", files=files)
+    assert response.headers["content-type"] == "application/zip"
+    members = zip_members(response.content)
+
+    errors = json.loads(members["errors.json"])
+    assert sorted(errors) == ["junk.csv", "junk.csv (2)", "notes.txt"]
+    assert errors["notes.txt"] == "Unsupported file format"
+
+    cleaned = sorted(name for name in members if name.startswith("cleaned/"))
+    assert cleaned == ["cleaned/export_cleaned.xlsx", "cleaned/export_cleaned_2.xlsx", "cleaned/export_cleaned_3.xlsx"]
+    assert "merged_report.xlsx" in members
+    assert {"split/Forsyth.xlsx", "split/Fulton.xlsx"} <= set(members)
+
+    # The merged report covers the three good inputs
+    merged = client.post("/merge", files=files[:3]).content
+    assert pd.read_excel(io.BytesIO(members["merged_report.xlsx"])).equals(pd.read_excel(io.BytesIO(merged)))
+
+
+def test_batch_unknown_outputs(client, export):
+    response = client.post("/batch?outputs=cleaned,pdf", files=[upload("files", export("uber", "csv"))])
+    assert "Unknown outputs" in response.json()["error"]
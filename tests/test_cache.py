@@ -0,0 +1,58 @@
+# tests/test_cache.py
+import os
+import time
+
+from sheet_cleaner import cache as cache_module
+from sheet_cleaner.cache import ResultCache, cache_key
+
+
+def test_cache_key_depends_on_order_and_params():
+    assert cache_key("merge", ["a", "b"]) != cache_key("merge", ["b", "a"])
+    assert cache_key("clean", ["a"], {"output_format": "csv"}) != cache_key("clean", ["a"])
+
+
+def test_disk_hit_keeps_its_age(tmp_path, monkeypatch):
+    ResultCache(ttl=100, disk_dir=str(tmp_path)).put("key", b"report")
+    path = tmp_path / "key.pickle"
+    written = time.time() - 90
+    os.utime(path, (written, written))
+
+    # Another worker sharing the directory: the disk hit is promoted to its memory tier
+    other = ResultCache(ttl=100, disk_dir=str(tmp_path))
+    assert other.get("key") == b"report"
+    assert other.counters["disk_hits"] == 1
+
+    # 15s on, the entry is 105s old: re-reading it didn't restart its TTL
+    start, wall = time.monotonic(), time.time()
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: start + 15)
+    monkeypatch.setattr(cache_module.time, "time", lambda: wall + 15)
+    assert other.get("key") is None
+    assert other.counters["memory_hits"] == 0
+
+
+def test_evict_disk_tolerates_files_deleted_by_another_worker(tmp_path, monkeypatch):
+    cache = ResultCache(ttl=100, disk_dir=str(tmp_path))
+    cache.put("old", b"x")
+    cache.put("gone", b"y")
+    old = time.time() - 1000
+    os.utime(tmp_path / "old.pickle", (old, old))
+
+    entries = list(os.scandir(tmp_path))
+    entries[0].stat()  # one entry already stat'ed, the other not
+    for entry in entries:
+        os.unlink(entry.path)
+    monkeypatch.setattr(cache_module.os, "scandir", lambda path: iter(entries))
+    cache._evict_disk()
+
+
+def test_memory_lru_and_ttl(monkeypatch):
+    cache = ResultCache(max_bytes=200, ttl=10)
+    cache.put("a", b"a" * 80)
+    cache.put("b", b"b" * 80)
+    assert cache.get("a") is not None
+    cache.put("c", b"c" * 80)  # evicts b, the least recently used
+    assert cache.get("b") is None and cache.get("a") is not None
+
+    start = time.monotonic()
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: start + 11)
+    assert cache.get("a") is None
@@ -0,0 +1,118 @@
+# tests/test_columnar.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheet_cleaner.cleaning import clean_file
+from sheet_cleaner.columnar import check_output_format, rider_totals, typed_rows, write_tables
+from sheet_cleaner.split import split_by_internal_note
+
+from .conftest import read_table, zip_members
+
+TRANSACTION = "Transaction Amount"
+
+
+def _format(output_format):
+    if output_format != "csv":
+        pytest.importorskip("pyarrow")
+    return output_format
+
+
+def _workbook(data):
+    df = pd.read_excel(io.BytesIO(data))
+    rows = df[df["Internal Note"].notna()].reset_index(drop=True)
+    subtotals = df[df["Internal Note"].isna() & df["Trips Count"].notna()].reset_index(drop=True)
+    return rows, subtotals
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "arrow"])
+def test_clean_tables_match_workbook(export, output_format):
+    output_format = _format(output_format)
+    _df, workbook = clean_file(export("uber", "csv"))
+    _rows, bundle = clean_file(export("uber", "csv"), output_format=output_format)
+    members = zip_members(bundle.getvalue())
+    ext = "." + output_format
+    assert sorted(members) == sorted(["cleaned" + ext, "cleaned_rider_totals" + ext])
+
+    rows, subtotals = _workbook(workbook.getvalue())
+    table = read_table(members["cleaned" + ext], "cleaned" + ext)
+    totals = read_table(members["cleaned_rider_totals" + ext], "cleaned_rider_totals" + ext)
+
+    assert len(table) == len(rows)
+    for col in ["Last Name", "First Name", "Internal Note"]:
+        assert table[col].astype(str).tolist() == rows[col].astype(str).tolist()
+    np.testing.assert_allclose(table[TRANSACTION].to_numpy(dtype=float), rows[TRANSACTION].to_numpy(dtype=float))
+
+    assert totals["Trips Count"].tolist() == subtotals["Trips Count"].astype(int).tolist()
+    np.testing.assert_allclose(totals[TRANSACTION].to_numpy(), subtotals[TRANSACTION].to_numpy(dtype=float))
+
+
+def test_typed_rows_types():
+    df = pd.DataFrame({
+        "Last Name": ["Lee", "Kim"],
+        "Passenger Number": [404, 17],
+        "Fare": ["12.50", "n/a"],
+        "Pickup Date (Local)": ["2024-01-02", "2024-01-03"],
+    })
+    typed = typed_rows(df)
+    assert typed["Last Name"].dtype == "string"
+    assert typed["Passenger Number"].dtype == "int64"
+    assert typed["Fare"].dtype == "float64" and typed["Fare"].isna().tolist() == [False, True]
+    assert pd.api.types.is_datetime64_any_dtype(typed["Pickup Date (Local)"])
+
+    # A date column that doesn't all parse keeps the export's strings
+    mixed = typed_rows(df.assign(**{"Pickup Date (Local)": ["2024-01-02", "soon"]}))
+    assert mixed["Pickup Date (Local)"].tolist() == ["2024-01-02", "soon"]
+
+
+def test_rider_totals():
+    df = pd.DataFrame({
+        "Passenger Number": ["1", "1", "2"],
+        "Last Name": ["Lee", "Lee", "Kim"],
+        "First Name": ["Ann", "Ann", "Bo"],
+        "Fare": [1.25, 2.5, "x"],
+    })
+    totals = rider_totals(df, ["Fare", "Missing", None])
+    assert list(totals.columns) == ["Passenger Number", "Last Name", "First Name", "Trips Count", "Fare"]
+    assert totals["Trips Count"].tolist() == [2, 1]
+    assert totals["Fare"].tolist() == [3.75, 0.0]
+
+    empty = rider_totals(df.iloc[:0], ["Fare"])
+    assert list(empty.columns) == list(totals.columns) and empty.empty
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "arrow"])
+def test_write_tables_round_trip(output_format):
+    output_format = _format(output_format)
+    tables = {
+        "a": pd.DataFrame({"x": pd.array(["p", None], dtype="string"), "y": [1.5, np.nan]}),
+        "b": pd.DataFrame({"n": [1, 2, 3]}),
+    }
+    members = zip_members(write_tables(tables, output_format).getvalue())
+    assert sorted(members) == [f"a.{output_format}", f"b.{output_format}"]
+    for name, df in tables.items():
+        back = read_table(members[f"{name}.{output_format}"], f"{name}.{output_format}")
+        assert back.astype(object).where(back.notna(), None).values.tolist() == \
+            df.astype(object).where(df.notna(), None).values.tolist()
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet", "arrow"])
+def test_split_tables_match_workbooks(export, output_format):
+    output_format = _format(output_format)
+    df, _output = clean_file(export("uber", "csv"))
+    workbooks = split_by_internal_note(df)
+    bundles = split_by_internal_note(df, output_format=output_format)
+    assert list(bundles) == list(workbooks)
+    for name, (rows, bundle) in bundles.items():
+        members = zip_members(bundle.getvalue())
+        assert sorted(members) == sorted([f"{name}.{output_format}", f"{name}_rider_totals.{output_format}"])
+        workbook = pd.read_excel(io.BytesIO(workbooks[name][1].getvalue()))
+        assert len(rows) == workbook["Internal Note"].notna().sum() > 0
+
+
+def test_check_output_format():
+    assert check_output_format("csv") == "csv"
+    with pytest.raises(ValueError, match="Unknown output format"):
+        check_output_format("xls")
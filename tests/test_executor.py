@@ -0,0 +1,77 @@
+# tests/test_executor.py
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from sheet_cleaner import executor as executor_module
+from sheet_cleaner.executor import BoundedExecutor, QueueFull
+
+
+class FakePool:
+    """Stands in for ProcessPoolExecutor: slow to start, futures completed by the test."""
+    created = []
+
+    def __init__(self, **kwargs):
+        time.sleep(0.01)  # widen the window two threads could both create a pool in
+        self.futures = []
+        self.shut_down = False
+        FakePool.created.append(self)
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def fake_pool(monkeypatch):
+    FakePool.created = []
+    monkeypatch.setattr(executor_module, "ProcessPoolExecutor", FakePool)
+    return FakePool
+
+
+def test_concurrent_submits_share_one_pool(fake_pool):
+    executor = BoundedExecutor(workers=8, max_queue=8)
+    threads = [threading.Thread(target=executor.submit, args=(print,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(fake_pool.created) == 1
+    assert len(fake_pool.created[0].futures) == 8
+
+
+def test_broken_pool_is_shut_down_and_replaced(fake_pool):
+    executor = BoundedExecutor(workers=2, max_queue=0)
+    future = executor.submit(print)
+    broken = fake_pool.created[0]
+    broken.futures[0].set_exception(BrokenProcessPool("worker died"))
+    assert isinstance(future.exception(), BrokenProcessPool)
+    assert broken.shut_down
+    assert executor.stats()["running"] == 0
+
+    executor.submit(print)
+    assert len(fake_pool.created) == 2 and not fake_pool.created[1].shut_down
+
+
+def test_queue_full(fake_pool):
+    executor = BoundedExecutor(workers=1, max_queue=1, retry_after=7)
+    executor.submit(print)
+    executor.submit(print)
+    with pytest.raises(QueueFull) as excinfo:
+        executor.submit(print)
+    assert excinfo.value.retry_after == 7 and executor.rejected == 1
+
+
+def test_result_round_trip():
+    executor = BoundedExecutor(workers=1, max_queue=0)
+    try:
+        assert executor.submit(sum, [1, 2, 3]).result(timeout=120) == 6
+    finally:
+        executor.shutdown()
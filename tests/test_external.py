@@ -0,0 +1,82 @@
+# tests/test_external.py
+import math
+import random
+import tempfile
+
+import pandas as pd
+import pytest
+
+from benchmarks.exports import SyntheticExport
+from sheet_cleaner.cleaning import clean_file, sort_and_merge
+from sheet_cleaner.external import _RunningSum, clean_file_out_of_core, sort_and_merge_out_of_core
+
+from .conftest import sheet_values, upload
+
+# Tiny budgets and chunks, so every file is read in many chunks and spilled as many runs
+OUT_OF_CORE = {"memory_budget_mb": 0.05, "chunk_rows": 37}
+
+
+@pytest.mark.parametrize("layout", ["uber", "lyft", "common_courtesy", "uber_headerless", "lyft_headerless"])
+def test_clean_out_of_core_matches_in_memory(export, layout):
+    _df, in_memory = clean_file(export(layout, "csv"))
+    out_of_core = clean_file_out_of_core(export(layout, "csv"), **OUT_OF_CORE)
+    assert sheet_values(out_of_core.getvalue()) == sheet_values(in_memory.getvalue())
+
+
+@pytest.mark.parametrize("layouts", [("uber", "lyft"), ("common_courtesy", "uber_headerless")])
+def test_merge_out_of_core_matches_in_memory(export, layouts):
+    _df, in_memory = sort_and_merge(*(export(layout, "csv", seed=i) for i, layout in enumerate(layouts)))
+    out_of_core = sort_and_merge_out_of_core(
+        *(export(layout, "csv", seed=i) for i, layout in enumerate(layouts)), **OUT_OF_CORE,
+    )
+    assert sheet_values(out_of_core.getvalue()) == sheet_values(in_memory.getvalue())
+
+
+def test_merge_out_of_core_xlsx_input(export):
+    _df, in_memory = sort_and_merge(export("uber", "xlsx"), export("lyft", "csv", seed=1))
+    out_of_core = sort_and_merge_out_of_core(export("uber", "xlsx"), export("lyft", "csv", seed=1), **OUT_OF_CORE)
+    assert sheet_values(out_of_core.getvalue()) == sheet_values(in_memory.getvalue())
+
+
+def test_running_sum_is_fsum():
+    rnd = random.Random(7)
+    values = [round(rnd.uniform(-60, 60), 2) for _ in range(5_000)] + [1e16, 1.0, -1e16, math.nan]
+    running = _RunningSum()
+    for value in values:
+        running.add(value)
+    assert math.fsum(running.partials) == math.fsum(v for v in values if not math.isnan(v))
+    assert len(running.partials) < 10
+
+
+def _broken(export, name="broken.csv"):
+    # An unclosed quote past the sniffed sample: the chunked reader hits it mid-stream
+    return SyntheticExport(export("uber", "csv").getvalue() + b'x,"unclosed\n', name, "text/csv")
+
+
+def test_out_of_core_parse_errors_are_value_errors(export):
+    with pytest.raises(ValueError, match="Unable to load or clean broken.csv") as info:
+        clean_file_out_of_core(_broken(export), **OUT_OF_CORE)
+    assert isinstance(info.value.__cause__, pd.errors.ParserError)
+
+    with pytest.raises(ValueError, match="Unable to load or clean broken.csv"):
+        sort_and_merge_out_of_core(export("lyft", "csv"), _broken(export), **OUT_OF_CORE)
+
+
+def test_out_of_core_spill_errors_are_value_errors(export, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "missing"))
+    with pytest.raises(ValueError, match="Unable to load or clean") as info:
+        clean_file_out_of_core(export("uber", "csv"), **OUT_OF_CORE)
+    assert isinstance(info.value.__cause__, OSError)
+
+
+def test_out_of_core_errors_reach_the_client(client, export, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "OUT_OF_CORE_BYTES", 1)
+    for path, files in [
+        ("/clean", [upload("file", _broken(export))]),
+        ("/merge", [upload("files", export("lyft", "csv")), upload("files", _broken(export))]),
+    ]:
+        response = client.post(path, files=files)
+        assert response.status_code == 200
+        assert response.json()["error"].startswith("Unable to load or clean broken.csv")
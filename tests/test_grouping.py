@@ -0,0 +1,107 @@
+# tests/test_grouping.py
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheet_cleaner.cleaning import clean_and_sort
+from sheet_cleaner.grouping import append_total_row, build_rider_subtotals
+from sheet_cleaner.keys import drop_key_columns
+from sheet_cleaner.schemas import rider_key_columns
+from sheet_cleaner.split import split_by_internal_note
+
+
+def _cells(df):
+    return [[None if pd.isna(value) else value for value in row] for row in df.to_numpy(dtype=object).tolist()]
+
+
+def _loop_subtotals(df, fill):
+    # The row-by-row layout build_rider_subtotals() replaced
+    rows, group, key = [], [], None
+
+    def flush():
+        rows.extend({**row, "Trips Count": 1} for row in group)
+        total = pd.to_numeric(pd.Series([row["Transaction Amount"] for row in group]), errors="coerce").sum()
+        rows.append({col: fill for col in df.columns} | {"Transaction Amount": round(total, 2), "Trips Count": len(group)})
+        rows.append({col: fill for col in df.columns} | {"Trips Count": fill})
+
+    for row in df.to_dict(orient="records"):
+        row_key = tuple(None if pd.isna(row[col]) else row[col] for col in rider_key_columns)
+        if group and row_key != key:
+            flush()
+            group = []
+        group.append(row)
+        key = row_key
+    if group:
+        flush()
+    return pd.DataFrame(rows).infer_objects()
+
+
+@pytest.mark.parametrize("fill", ["", None])
+@pytest.mark.parametrize("layout", ["uber", "lyft"])
+def test_rider_subtotals_match_row_loop(export, layout, fill):
+    df = clean_and_sort(export(layout, "csv"))
+    expected = _loop_subtotals(drop_key_columns(df).reset_index(drop=True), fill)
+    result = build_rider_subtotals(df, fill=fill)
+    assert list(result.columns) == list(expected.columns)
+    assert _cells(result) == _cells(expected)
+
+
+def test_rider_subtotals_missing_keys_compare_equal():
+    df = pd.DataFrame({
+        "Passenger Number": [None, None, "1", "1"],
+        "Last Name": ["Lee", "Lee", "Lee", "Lee"],
+        "First Name": ["Ann", "Ann", "Ann", "Ann"],
+        "Transaction Amount": [1.1, 2.2, 3.3, 4.4],
+    })
+    result = build_rider_subtotals(df)
+    assert result["Trips Count"].tolist() == [1, 1, 2, "", 1, 1, 2, ""]
+    assert result["Transaction Amount"].tolist()[2::4] == [3.3, 7.7]
+
+
+def _forsyth_reference(fare):
+    # The per-row formulas of the original loop; a missing fare leaves them empty
+    if fare is None or math.isnan(fare):
+        return [5.0, None, None, None, None]
+    post = round(fare - 5.00, 2)
+    share = round(max(0.00, fare - 13.00), 2)
+    return [5.0, post, round(min(8.00, max(0.00, post)), 2), share, round(5.00 + share, 2)]
+
+
+def test_forsyth_billing_matches_formulas():
+    fares = [3.0, 20.25, 13.0, np.nan, 9.99, 13.01, 0.0, 42.5]
+    df = pd.DataFrame({
+        "Last Name": ["Adams", "Adams", "Brown", "Brown", "Brown", "Cole", "Cole", "Diaz"],
+        "First Name": ["Ann", "Ann", "Bob", "Bob", "Bob", "Cy", "Cy", "Di"],
+        "Passenger Number": ["1", "1", "2", "2", "2", "3", "3", "4"],
+        "Internal Note": ["DTF", " dtf", "DTFCE", "DTF", "dtfce", "DTF", "DTF", "DTF"],
+        "Fare": fares,
+    })
+    billed, _output = split_by_internal_note(df)["Forsyth"]
+    data = billed[billed["Internal Note"].notna()].reset_index(drop=True)
+    formula_cols = ["Rider Co-Pay", "Post Co-Pay Cost", "Forsyth Bill", "Rider Share over $13", "Rider Cost Rider Bill"]
+
+    assert _cells(data[formula_cols]) == [_forsyth_reference(fare) for fare in fares]
+
+    # Per-rider totals sit on each rider's last row only
+    group_rows = [[0, 1], [2, 3, 4], [5, 6], [7]]
+    for total_col, col in [("TOTAL Forsyth Bill", "Forsyth Bill"), ("TOTAL Rider Cost Rider Bill", "Rider Cost Rider Bill")]:
+        expected = [None] * len(data)
+        for rows in group_rows:
+            expected[rows[-1]] = round(pd.to_numeric(data.loc[rows, col]).sum(), 2)
+        assert [None if pd.isna(v) else v for v in data[total_col]] == expected
+
+    assert billed["Fare"].iloc[-1] == round(np.nansum(fares), 2)
+
+
+def test_append_total_row():
+    df = pd.DataFrame({"Name": ["a", "b"], "Fare": [1.25, 2.5]})
+    result = append_total_row(df, "Fare", 3.75)
+    assert result.iloc[-1].tolist() == ["", 3.75]
+
+    pytest.importorskip("pyarrow")
+    typed = df.convert_dtypes(dtype_backend="pyarrow")
+    result = append_total_row(typed, "Fare", 3.75)
+    assert result.dtypes.tolist() == typed.dtypes.tolist()
+    assert pd.isna(result["Name"].iloc[-1]) and result["Fare"].iloc[-1] == 3.75
@@ -0,0 +1,170 @@
+# tests/test_ingest.py
+import csv
+import datetime
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.exports import SyntheticExport
+from sheet_cleaner import readers
+from sheet_cleaner.cleaning import clean_columns, clean_file, standardize_columns
+from sheet_cleaner.ingest import read_export, sniff
+from sheet_cleaner.schemas import expected_headers_lyft, expected_headers_uber
+
+
+def _csv(rows, delimiter=",", name="export.csv"):
+    text = io.StringIO()
+    csv.writer(text, delimiter=delimiter, lineterminator="\n").writerows(rows)
+    return SyntheticExport(text.getvalue().encode("utf-8"), name, "text/csv")
+
+
+def _uber_row(**cells):
+    row = dict.fromkeys(expected_headers_uber, "x")
+    row.update({"Request Type": "ASAP", "First Name": "Ann", "Last Name": "Lee", "Internal Note": "FCC",
+                "Passenger Number": "4045550030", "Transaction Amount in Local Currency (incl. Taxes)": "12.5"})
+    row.update(cells)
+    return [row[h] for h in expected_headers_uber]
+
+
+@pytest.mark.parametrize("layout, vendor, header_row", [
+    ("uber", "uber", 0),
+    ("lyft", "lyft", 0),
+    ("common_courtesy", "common_courtesy", 4),
+    ("common_courtesy_5", "common_courtesy", 5),
+    ("uber_headerless", "uber", None),
+    ("lyft_headerless", "lyft", None),
+])
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+def test_sniffed_layouts(export, layout, vendor, header_row, fmt):
+    df, sniffed = read_export(export(layout, fmt, rows=50))
+    assert (sniffed.vendor, sniffed.header_row, sniffed.kind) == (vendor, header_row, fmt)
+    assert len(df) == 50
+    assert "Internal Note" in df.columns
+
+
+def test_common_courtesy_without_header_falls_back_to_row_4():
+    banner = [["", "Common Courtesy Trips Report"], ["Organization", "x"], ["Period", "x"], ["Generated", "x"]]
+    sniffed = sniff(_csv(banner + [["a", "b"], ["1", "2"]]))
+    assert (sniffed.vendor, sniffed.header_row) == ("common_courtesy", 4)
+
+
+CC_BANNER = [["", "Common Courtesy Trips Report"], ["Organization", "x"], ["Period", "x"], ["Generated", "x"]]
+
+
+def test_common_courtesy_non_standard_header_row():
+    # Reordered, re-cased and with an extra column: no signature match, but
+    # the Trip/Eats ID column still identifies the Uber header on row 5
+    header = ["Extra"] + [name.upper() for name in reversed(expected_headers_uber)]
+    row = ["e"] + list(reversed(_uber_row()))
+    df, sniffed = read_export(_csv(CC_BANNER + [["Timezone", "x"], header, row]))
+    assert (sniffed.vendor, sniffed.header_row) == ("common_courtesy", 5)
+    assert len(df) == 1 and df.loc[0, "LAST NAME"] == "Lee"
+
+
+def test_common_courtesy_header_needs_exact_id_column():
+    # The old substring check took any name containing "trip/eats id"
+    header = [name if name != "Trip/Eats ID" else "Trip/Eats ID (UUID)" for name in expected_headers_uber] + ["Extra"]
+    sniffed = sniff(_csv(CC_BANNER + [["Timezone", "x"], header, _uber_row() + ["e"]]))
+    assert (sniffed.vendor, sniffed.header_row) == ("common_courtesy", 4)
+
+
+def test_common_courtesy_xlsx_is_read_with_its_header(export):
+    # Before the shared sniffer, XLSX banners weren't recognised and the
+    # export was read as headerless Uber (phones came out as "4045550030.0")
+    final_df, output = clean_file(export("common_courtesy", "xlsx", rows=60))
+    rows = final_df[final_df["Internal Note"].notna() & (final_df["Internal Note"] != "")]
+    assert output is not None and len(rows) > 0
+    assert "Staff" not in set(rows["First Name"])  # Guest names are the riders
+    phones = {str(p) for p in rows["Passenger Number"] if str(p)}
+    assert phones and all(p.isdigit() for p in phones)
+
+
+def test_multiline_quoted_field_in_sample():
+    address = "12 Peachtree St\nSuite 4, Floor 2,\nAtlanta, GA"
+    file_obj = _csv([expected_headers_uber, _uber_row(**{"Pickup Address": address}), _uber_row()])
+    df, sniffed = read_export(file_obj)
+    assert (sniffed.vendor, sniffed.header_row, sniffed.delimiter) == ("uber", 0, ",")
+    assert len(df) == 2 and df.loc[0, "Pickup Address"] == address
+
+
+def test_delimiter_ignores_separators_inside_quotes():
+    # The first 8 *lines* are the header and this note, with more commas than semicolons
+    memo = "\n".join([", ".join("abcdefghijklmnopqrstuvwxyz")] * 10)
+    rows = [expected_headers_lyft] + [[memo if h == "Expense Note" else "1" for h in expected_headers_lyft]] * 3
+    sniffed = sniff(_csv(rows, delimiter=";"))
+    assert (sniffed.vendor, sniffed.delimiter) == ("lyft", ";")
+
+
+def test_headerless_multiline_first_row():
+    file_obj = _csv([_uber_row(**{"Pickup Address": "line 1\nline 2"}), _uber_row()])
+    df, sniffed = read_export(file_obj)
+    assert (sniffed.vendor, sniffed.header_row) == ("uber", None)
+    assert len(df) == 2
+
+
+def test_tab_separated_with_bom():
+    text = "\ufeff" + "\n".join("\t".join(row) for row in [expected_headers_lyft, ["1"] * len(expected_headers_lyft)])
+    sniffed = sniff(SyntheticExport(text.encode("utf-8"), "export.csv", "text/csv"))
+    assert (sniffed.vendor, sniffed.delimiter, sniffed.header_row) == ("lyft", "\t", 0)
+
+
+@pytest.mark.parametrize("layout", ["uber", "lyft", "common_courtesy", "uber_headerless", "lyft_headerless"])
+@pytest.mark.parametrize("fmt", ["csv", "xlsx"])
+@pytest.mark.parametrize("project", [clean_columns, standardize_columns])
+def test_projection_matches_full_read(export, layout, fmt, project):
+    full, sniffed = read_export(export(layout, fmt, rows=80))
+    projected, _sniffed = read_export(export(layout, fmt, rows=80), project=project)
+    keep = project(sniffed)
+    expected = full if keep is None else full[[col for col in full.columns if keep(col)]]
+    pd.testing.assert_frame_equal(projected, expected)
+
+
+def test_projection_drops_columns_before_parsing():
+    seen = []
+
+    def project(sniffed):
+        return lambda name: seen.append(name) or name in {"Last Name", "Internal Note"}
+
+    df, _sniffed = read_export(_csv([expected_headers_uber, _uber_row()]), project=project)
+    assert list(df.columns) == ["Last Name", "Internal Note"]
+    assert set(seen) == set(expected_headers_uber)
+
+
+def _xlsx(rows, name="export.xlsx"):
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    output = io.BytesIO()
+    workbook.save(output)
+    return SyntheticExport(output.getvalue(), name)
+
+
+@pytest.mark.skipif(not readers.calamine_available(), reason="python-calamine is not installed")
+def test_xlsx_engines_read_the_same_frame(monkeypatch):
+    # SHEET_CLEANER_XLSX_ENGINE is read into readers.XLSX_ENGINE at import
+    amount = "Transaction Amount in Local Currency (incl. Taxes)"
+    rows = [expected_headers_uber]
+    for i, (requested, fare, phone) in enumerate([
+        (datetime.datetime(2024, 3, 1, 8, 30), 12.0, 4045550030),
+        (datetime.date(2024, 3, 2), 12.5, "404-555-0031"),
+        (datetime.datetime(2024, 3, 3), 7.0, 4045550032),
+    ]):
+        rows.append(_uber_row(**{"Request Date (Local)": requested, "Distance (mi)": float(i + 1), amount: fare,
+                                 "Passenger Number": phone, "Last Name": f"Lee {i}"}))
+
+    frames = {}
+    for engine in ("calamine", "openpyxl"):
+        monkeypatch.setattr(readers, "XLSX_ENGINE", engine)
+        frames[engine], sniffed = read_export(_xlsx(rows))
+        assert (sniffed.vendor, sniffed.header_row) == ("uber", 0)
+    pd.testing.assert_frame_equal(frames["calamine"], frames["openpyxl"])
+
+    df = frames["openpyxl"]
+    assert df["Request Date (Local)"].tolist() == [
+        pd.Timestamp(2024, 3, 1, 8, 30), pd.Timestamp(2024, 3, 2), pd.Timestamp(2024, 3, 3)]
+    assert df["Distance (mi)"].tolist() == [1, 2, 3] and pd.api.types.is_integer_dtype(df["Distance (mi)"])
+    assert df[amount].tolist() == [12.0, 12.5, 7.0]
+    assert df["Passenger Number"].astype(str).tolist() == ["4045550030", "404-555-0031", "4045550032"]
@@ -0,0 +1,61 @@
+# tests/test_jobs.py
+import sqlite3
+import time
+
+from sheet_cleaner.jobs import MAX_ATTEMPTS, JobStore
+
+
+def _queued(store):
+    job_id = store.new_id()
+    return store.create(job_id, "clean", [])
+
+
+def test_requeue_orphaned_leaves_live_runners_jobs(tmp_path):
+    store = JobStore(str(tmp_path))
+    live, dead = _queued(store), _queued(store)
+    store.claim("runner-live")
+    store.claim("runner-dead")
+    later = time.time() + 60
+    # Only the live runner keeps heartbeating
+    with sqlite3.connect(store.path) as db:
+        db.execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = 'runner-live'", (later,))
+
+    requeued, failed = store.requeue_orphaned(stale_after=30, now=later)
+    assert (requeued, failed) == ([dead], [])
+    assert store.get(live)["status"] == "running"
+    assert store.get(dead)["status"] == "queued" and store.get(dead)["owner"] is None
+
+
+def test_requeue_orphaned_fails_after_max_attempts(tmp_path):
+    store = JobStore(str(tmp_path))
+    job_id = _queued(store)
+    for _ in range(MAX_ATTEMPTS - 1):
+        store.claim("crashing-runner")
+        assert store.requeue_orphaned(stale_after=30, now=time.time() + 60) == ([job_id], [])
+    store.claim("crashing-runner")
+    assert store.requeue_orphaned(stale_after=30, now=time.time() + 60) == ([], [job_id])
+    job = store.get(job_id)
+    assert job["status"] == "failed" and job["attempts"] == MAX_ATTEMPTS and job["expires_at"]
+
+
+def test_heartbeat_keeps_job_claimed(tmp_path):
+    store = JobStore(str(tmp_path))
+    job_id = _queued(store)
+    store.claim("runner")
+    store.heartbeat("runner")
+    assert store.requeue_orphaned(stale_after=30) == ([], [])
+    assert store.get(job_id)["owner"] == "runner"
+
+
+def test_existing_store_gets_owner_columns(tmp_path):
+    with sqlite3.connect(tmp_path / "jobs.sqlite3") as db:
+        db.execute(
+            "CREATE TABLE jobs (id TEXT PRIMARY KEY, operation TEXT NOT NULL, params TEXT NOT NULL, "
+            "inputs TEXT NOT NULL, status TEXT NOT NULL, stage TEXT, stages TEXT NOT NULL DEFAULT '[]', "
+            "attempts INTEGER NOT NULL DEFAULT 0, artifact TEXT, artifact_name TEXT, media_type TEXT, "
+            "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL)"
+        )
+    store = JobStore(str(tmp_path))
+    job_id = _queued(store)
+    assert store.claim("runner")["owner"] == "runner"
+    assert store.get(job_id)["heartbeat_at"] is not None
@@ -0,0 +1,98 @@
+# tests/test_keys.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from sheet_cleaner import keys
+from sheet_cleaner.grouping import merge_sorted_frames
+from sheet_cleaner.ingest import read_export
+from sheet_cleaner.keys import (
+    drop_key_columns, has_note, normalize_keys, note_key_column, rider_order, rider_sort_key,
+    sort_by_rider, sort_key_columns,
+)
+from sheet_cleaner.schemas import rider_key_columns, rider_sort_columns
+
+
+def _values(series):
+    return [None if pd.isna(value) else value for value in series]
+
+
+def _riders():
+    return pd.DataFrame({
+        "Passenger Number": [" 404", "404 ", None, 17],
+        "Last Name": ["lee ", "Lee", "  Kim", None],
+        "First Name": ["Ann", " ann", "Bo", "Cy"],
+        "Internal Note": [" fcc", "FCC ", "", None],
+    })
+
+
+def test_normalize_keys_strips_once():
+    df = _riders()
+    keyed = normalize_keys(df)
+    for col in rider_key_columns:
+        stripped = df[col].astype(str).str.strip()
+        assert isinstance(keyed[col].dtype, pd.CategoricalDtype)
+        assert _values(keyed[col]) == _values(stripped)
+        if col in sort_key_columns:
+            assert _values(keyed[sort_key_columns[col]]) == _values(rider_sort_key(stripped))
+    assert _values(keyed[note_key_column]) == ["FCC", "FCC", "", None]
+    # The source frame keeps its own columns
+    assert _values(df["Last Name"]) == ["lee ", "Lee", "  Kim", None]
+
+
+def test_normalize_keys_is_idempotent():
+    keyed = normalize_keys(_riders())
+    assert normalize_keys(keyed) is keyed
+
+
+def test_has_note():
+    assert has_note(normalize_keys(_riders())).tolist() == [True, True, False, False]
+
+
+def test_normalize_keys_without_note_column():
+    keyed = normalize_keys(_riders().drop(columns="Internal Note"))
+    assert keyed[note_key_column].isna().all()
+
+
+def _sort_values_order(df):
+    # The sort rider_order() replaced
+    return df.reset_index(drop=True).sort_values(
+        by=rider_sort_columns, key=rider_sort_key, kind="stable",
+    ).index.to_numpy()
+
+
+@pytest.mark.parametrize("layout", ["uber", "lyft", "common_courtesy"])
+def test_rider_order_matches_sort_values(export, layout):
+    df, _sniffed = read_export(export(layout, "csv", rows=400))
+    df = df[list(rider_sort_columns)]
+    keyed = normalize_keys(df)
+    assert rider_order(keyed).tolist() == _sort_values_order(keyed[rider_sort_columns]).tolist()
+    # Without the precomputed keys the columns are ranked directly
+    assert rider_order(df).tolist() == _sort_values_order(df).tolist()
+
+
+def test_rider_order_missing_values_sort_last():
+    df = normalize_keys(_riders())
+    assert rider_order(df).tolist() == _sort_values_order(df[rider_sort_columns]).tolist()
+
+
+def test_rider_order_lexsort_fallback(monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        col: rng.integers(0, 50_000, 2_000).astype(str) for col in rider_sort_columns
+    })
+    # 50k**3 distinct keys still pack; force the lexsort path with huge rank counts
+    monkeypatch.setattr(keys, "_rank_codes", lambda key: (pd.factorize(key, sort=True)[0], 2 ** 31))
+    assert rider_order(df).tolist() == _sort_values_order(df).tolist()
+
+
+def test_merge_sorted_frames_matches_concat_sort(export):
+    frames = [sort_by_rider(normalize_keys(read_export(export(layout, "csv", seed=i))[0]))
+              for i, layout in enumerate(["uber", "lyft", "uber_headerless"])]
+    merged = merge_sorted_frames(frames)
+    combined = pd.concat([drop_key_columns(f) for f in frames], ignore_index=True)
+    expected = combined.iloc[_sort_values_order(combined[rider_sort_columns].astype(str))].reset_index(drop=True)
+    assert isinstance(merged["Last Name"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(
+        drop_key_columns(merged).astype(str), expected.astype(str), check_dtype=False,
+    )
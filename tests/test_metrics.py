@@ -0,0 +1,54 @@
+# tests/test_metrics.py
+import os
+import re
+
+from sheet_cleaner import metrics
+from sheet_cleaner.executor import BoundedExecutor
+
+from .conftest import upload
+
+
+def _record_stage(pid_label):
+    # Runs in a worker process
+    with metrics.stage("probe", rows=3, nbytes=5, vendor=pid_label, format="test"):
+        pass
+    return os.getpid()
+
+
+def test_metrics_endpoint_after_clean(client, export):
+    assert client.post("/clean", files=[upload("file", export("uber", "csv", seed=7))]).status_code == 200
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+
+    assert "# TYPE sheet_cleaner_stage_seconds histogram" in text
+    for stage in ("detect_header", "read", "group", "write", "encode"):
+        labels = f'stage="{stage}",vendor="uber",format="csv"'
+        assert re.search(rf'^sheet_cleaner_stage_seconds_bucket\{{{labels},le="\+Inf"\}} [1-9]', text, re.M), stage
+        assert re.search(rf"^sheet_cleaner_stage_seconds_count\{{{labels}\}} [1-9]", text, re.M), stage
+    assert re.search(r'^sheet_cleaner_stage_rows_total\{stage="read",vendor="uber",format="csv"\} [1-9]', text, re.M)
+    assert re.search(r"^sheet_cleaner_queue_workers \d+", text, re.M)
+
+
+def test_worker_samples_reach_the_server():
+    executor = BoundedExecutor(workers=1, max_queue=1)
+    label = f"worker-test-{os.getpid()}"
+    try:
+        worker_pid = executor.submit(_record_stage, label).result(timeout=60)
+    finally:
+        executor.shutdown()
+    assert worker_pid != os.getpid()
+
+    sample = metrics.registry.snapshot()[("probe", label, "test")]
+    assert (sample["count"], sample["rows"], sample["bytes"]) == (1, 3, 5)
+    assert f'sheet_cleaner_stage_seconds_count{{stage="probe",vendor="{label}",format="test"}} 1' in metrics.render()
+
+
+def test_drain_empties_the_registry():
+    with metrics.stage("probe", vendor="drain", format="test"):
+        pass
+    drained = metrics.drain()
+    assert ("probe", "drain", "test") in drained
+    assert ("probe", "drain", "test") not in metrics.registry.snapshot()
+    metrics.merge(drained)
+    assert metrics.registry.snapshot()[("probe", "drain", "test")]["count"] == 1
@@ -0,0 +1,83 @@
+# tests/test_profiling.py
+import json
+import os
+import time
+
+import pytest
+
+from sheet_cleaner.profiling import profile_call, save_profile
+
+from .conftest import sheet_values, upload
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        n += 1
+    return n
+
+
+def test_profile_call_samples_the_function():
+    result, report = profile_call(busy_loop, 0.2, interval=0.002)
+    assert result > 0
+    assert report["samples"] > 10 and report["seconds"] >= 0.2
+    assert any("busy_loop" in row["function"] for row in report["top"])
+    line = next(line for line in report["collapsed"].splitlines() if "busy_loop" in line)
+    stack, millis = line.rsplit(" ", 1)
+    assert stack.split(";")[0] == "MainThread" and int(millis) > 0
+
+
+def test_save_profile_keeps_the_newest(tmp_path):
+    _result, report = profile_call(busy_loop, 0.01)
+    for i in range(4):
+        save_profile(str(tmp_path), f"p{i}", "clean", report, keep=2)
+        time.sleep(0.01)
+    assert sorted(os.listdir(tmp_path)) == ["p2", "p3"]
+    with open(tmp_path / "p3" / "profile.json") as f:
+        summary = json.load(f)
+    assert summary["id"] == "p3" and summary["operation"] == "clean" and "collapsed" not in summary
+    assert (tmp_path / "p3" / "collapsed.txt").read_text() == report["collapsed"]
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "PROFILING", True)
+    return main
+
+
+def test_profiled_clean(client, export, profiling, monkeypatch):
+    cache_lookups = []
+    cache_get = profiling.result_cache.get
+    monkeypatch.setattr(profiling.result_cache, "get", lambda key: cache_lookups.append(key) or cache_get(key))
+
+    plain = client.post("/clean", files=[upload("file", export("lyft", "csv", seed=11))])
+    assert len(cache_lookups) == 1 and "X-Profile-Id" not in plain.headers
+
+    # Same upload, so a cache hit was there to take; profiling never looks
+    profiled = client.post("/clean?profile=1", files=[upload("file", export("lyft", "csv", seed=11))])
+    assert len(cache_lookups) == 1
+    assert sheet_values(profiled.content) == sheet_values(plain.content)
+
+    profile_id = profiled.headers["X-Profile-Id"]
+    assert profiled.headers["X-Profile-Url"] == f"/profiles/{profile_id}"
+    summary = client.get(f"/profiles/{profile_id}").json()
+    assert summary["id"] == profile_id and summary["operation"] == "clean" and summary["top"]
+    assert client.get(f"/profiles/{profile_id}/collapsed").status_code == 200
+    assert "function" in client.get(f"/profiles/{profile_id}/top").text
+
+    # The header works as well as the query parameter
+    by_header = client.post("/clean", headers={"X-Profile": "1"}, files=[upload("file", export("lyft", "csv", seed=11))])
+    assert by_header.headers["X-Profile-Id"] != profile_id
+
+
+def test_profiling_disabled(client, export):
+    response = client.post("/clean?profile=1", files=[upload("file", export("uber", "csv"))])
+    assert response.status_code == 403
+
+
+def test_unknown_profile(client):
+    assert client.get("/profiles/" + "0" * 32).status_code == 404
+    assert client.get("/profiles/not-a-profile-id/top").status_code == 404
@@ -0,0 +1,48 @@
+# tests/test_split.py
+import time
+
+from sheet_cleaner.jobs import XLSX_MEDIA_TYPE
+from sheet_cleaner.split import split_export
+
+from .conftest import sheet_values, upload, zip_members
+
+
+def _expected(export):
+    return {note: output.getvalue() for note, (_df, output) in split_export(export("uber", "csv")).items()}
+
+
+def test_split_zip_mode(client, export):
+    expected = _expected(export)
+    response = client.post("/split?mode=zip", files=[upload("file", export("uber", "csv"))])
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    members = zip_members(response.content)
+    assert sorted(members) == sorted(f"{note}.xlsx" for note in expected)
+    for note, workbook in expected.items():
+        assert sheet_values(members[f"{note}.xlsx"]) == sheet_values(workbook)
+
+
+def test_split_ids_mode(client, export):
+    expected = _expected(export)
+    response = client.post("/split?mode=ids", files=[upload("file", export("uber", "csv"))])
+    downloads = response.json()["downloads"]
+    assert sorted(downloads) == sorted(expected)
+    for note, link in downloads.items():
+        assert link["url"] == f"/download/{link['id']}"
+        download = client.get(link["url"])
+        assert download.status_code == 200
+        assert download.headers["content-type"] == XLSX_MEDIA_TYPE
+        assert sheet_values(download.content) == sheet_values(expected[note])
+
+
+def test_split_ids_expire(client, export):
+    import main
+
+    response = client.post("/split?mode=ids&output_format=csv", files=[upload("file", export("uber", "csv"))])
+    link = next(iter(response.json()["downloads"].values()))
+    download = client.get(link["url"])
+    assert download.headers["content-type"] == "application/zip"
+    assert all(name.endswith(".csv") for name in zip_members(download.content))
+
+    main.job_store.expire(now=time.time() + main.job_runner.ttl + 1)
+    assert client.get(link["url"]).status_code == 410
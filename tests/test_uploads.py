@@ -0,0 +1,74 @@
+# tests/test_uploads.py
+import pickle
+import tempfile
+
+import pytest
+
+from sheet_cleaner.uploads import UploadSpool, UploadTooLarge
+
+from .conftest import upload
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    # Uploads are spooled to the default temp dir; point it somewhere we can watch
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def _spooled(spool_dir):
+    return sorted(path.name for path in spool_dir.glob("upload-*"))
+
+
+def test_spool_round_trip(spool_dir):
+    spool = UploadSpool("export.csv", "text/csv", max_bytes=10)
+    spool.write(b"a,b\n")
+    spool.write(b"1,2\n")
+    file_obj = spool.finish()
+    assert (file_obj.name, file_obj.size, file_obj.read()) == ("export.csv", 8, b"a,b\n1,2\n")
+    assert file_obj.path.endswith(".csv")
+
+    # Pickles as its path: the worker reopens the same file
+    copy = pickle.loads(pickle.dumps(file_obj))
+    assert (copy.path, copy.sha256, copy.read()) == (file_obj.path, file_obj.sha256, b"a,b\n1,2\n")
+    copy.close()
+
+    file_obj.discard()
+    file_obj.discard()
+    assert _spooled(spool_dir) == []
+
+
+def test_spool_limit(spool_dir):
+    spool = UploadSpool("big.csv", max_bytes=4)
+    spool.write(b"1234")
+    with pytest.raises(UploadTooLarge, match="upload limit"):
+        spool.write(b"5")
+    spool.abort()
+    assert _spooled(spool_dir) == []
+
+
+def test_oversized_upload_is_rejected(client, export, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1024)
+    response = client.post("/clean", files=[upload("file", export("uber", "csv"))])
+    assert response.status_code == 413
+    assert "upload limit" in response.json()["error"]
+
+
+def test_spooled_files_removed_after_requests(client, export, spool_dir, monkeypatch):
+    import main
+
+    assert client.post("/clean", files=[upload("file", export("uber", "csv", seed=21))]).status_code == 200
+    assert _spooled(spool_dir) == []
+
+    failed = client.post("/clean", files=[("file", ("junk.csv", b"a,b\n1,2\n", "text/csv"))])
+    assert "error" in failed.json()
+    assert _spooled(spool_dir) == []
+
+    # The first file is spooled before the second one goes past the limit
+    small = ("files", ("small.csv", b"a,b\n1,2\n", "text/csv"))
+    monkeypatch.setattr(main, "MAX_UPLOAD_BYTES", 1024)
+    response = client.post("/merge", files=[small, upload("files", export("uber", "csv"))])
+    assert response.status_code == 413
+    assert _spooled(spool_dir) == []
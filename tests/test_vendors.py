@@ -0,0 +1,75 @@
+# tests/test_vendors.py
+import pytest
+
+from sheet_cleaner import vendors
+from sheet_cleaner.ingest import read_export
+from sheet_cleaner.schemas import expected_headers_lyft, expected_headers_uber
+from sheet_cleaner.vendors import (
+    COMMON_COURTESY, LYFT, UBER, UNKNOWN, VendorSchema, get_schema, header_signature, identify,
+    identify_headerless, register_vendor,
+)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # register_vendor() fills module-level tables; give each test its own copies
+    for name in ("SCHEMAS", "_by_signature", "_by_id_column"):
+        monkeypatch.setattr(vendors, name, dict(getattr(vendors, name)))
+
+
+def test_header_signature_is_case_and_space_insensitive():
+    assert header_signature(["\ufeffLast Name ", "FIRST name"]) == header_signature(["last name", "First Name"])
+    assert header_signature(["a", "b"]) != header_signature(["b", "a"])
+
+
+def test_identify_by_signature():
+    assert identify(expected_headers_uber) is UBER
+    assert identify(expected_headers_lyft) is LYFT
+    assert identify([f" {name.upper()} " for name in expected_headers_lyft]) is LYFT
+
+
+def test_identify_by_id_column():
+    # Reordered or trimmed headers miss the signature but keep the vendor id column
+    assert identify(["Internal Note", "Trip/Eats ID", "Last Name"]) is UBER
+    assert identify(list(reversed(expected_headers_lyft))) is LYFT
+
+
+def test_identify_markers_and_data_rows():
+    assert identify(["Last Name", "Internal Note", "Amount"]) is UNKNOWN
+    assert identify(["Lee", "Ann", "4045550030", "FCC"]) is None
+
+
+def test_identify_headerless():
+    uber_row = ["x"] * 6 + ["ASAP"]
+    lyft_row = ["x"] * 6 + ["-0500"]
+    assert identify_headerless(uber_row) is UBER
+    assert identify_headerless(lyft_row) is LYFT
+    assert identify_headerless(["x", "y"]) is UBER
+
+
+def test_register_vendor(registry):
+    headers = ["Ride Ref", "Last Name", "First Name", "Internal Note", "Fare"]
+    acme = register_vendor(VendorSchema("acme", headers, id_column="Ride Ref"))
+    assert get_schema("acme") is acme
+    assert identify(headers) is acme
+    assert identify(["ride ref", "Internal Note"]) is acme
+
+    hidden = register_vendor(VendorSchema("hidden", ["Hidden Ref", "Last Name"], id_column="Hidden Ref"), detect=False)
+    assert get_schema("hidden") is hidden
+    assert identify(["Hidden Ref", "Last Name"]) is UNKNOWN
+
+
+def test_get_schema_falls_back_to_unknown():
+    assert get_schema("nope") is UNKNOWN
+    assert get_schema("common_courtesy") is COMMON_COURTESY
+
+
+@pytest.mark.parametrize("layout, schema", [
+    ("uber", UBER), ("lyft", LYFT), ("common_courtesy", COMMON_COURTESY),
+    ("uber_headerless", UBER), ("lyft_headerless", LYFT),
+])
+def test_sniffed_schema(export, layout, schema):
+    df, sniffed = read_export(export(layout, "csv", rows=30))
+    assert sniffed.schema is schema
+    if sniffed.headerless:
+        assert list(df.columns) == list(schema.headers[:len(df.columns)])
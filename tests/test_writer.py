@@ -0,0 +1,109 @@
+# tests/test_writer.py
+import datetime
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from openpyxl.styles import Border, PatternFill, Side
+
+from sheet_cleaner.cleaning import clean_file
+from sheet_cleaner.grouping import build_rider_subtotals
+from sheet_cleaner.writer import write_styled_sheet
+
+# The colours and border the openpyxl post-pass used before xlsxwriter
+FILLS = {
+    "FCC": "D9E1F2", "FCM": "E2EFDA", "FCSH": "FFF2CC",
+    "FCSC": "FCE4D6", "DTF": "E4DFEC", "Other": "D9D9D9",
+}
+CURRENCY = '"$"#,##0.00'
+
+
+def _openpyxl_reference(df, note_fills=False, borders=False, number_formats=None):
+    # pandas' openpyxl writer, then the styling loops over the finished sheet
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Sheet1")
+        ws = writer.sheets["Sheet1"]
+        thin = Side(style="thin")
+        thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        headers = [cell.value for cell in ws[1]]
+        for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
+            fill = None
+            if note_fills and "Internal Note" in headers and "Trips Count" in headers:
+                note = row[headers.index("Internal Note")].value
+                trips = row[headers.index("Trips Count")].value
+                note = str(note).strip() if note else ""
+                if note and trips and str(trips).strip():
+                    fill = FILLS.get(note, FILLS["Other"])
+            for cell in row:
+                if fill:
+                    cell.fill = PatternFill(start_color=fill, end_color=fill, fill_type="solid")
+                if borders:
+                    cell.border = thin_border
+        for col, number_format in (number_formats or {}).items():
+            col_idx = headers.index(col) + 1
+            for r in range(2, ws.max_row + 1):
+                ws.cell(row=r, column=col_idx).number_format = number_format
+    return output.getvalue()
+
+
+def _styled_cells(data):
+    ws = load_workbook(io.BytesIO(data)).worksheets[0]
+    cells = []
+    for row in ws.iter_rows():
+        for cell in row:
+            fill = cell.fill.fgColor.rgb[-6:] if cell.fill.fill_type == "solid" else None
+            cells.append((cell.coordinate, cell.value, fill, cell.border.left.style, cell.number_format))
+    return cells
+
+
+def _xlsxwriter(df, **style):
+    output = io.BytesIO()
+    write_styled_sheet(df, output, "Sheet1", **style)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("layout", ["uber", "lyft", "common_courtesy"])
+def test_cleaned_workbook_matches_openpyxl(export, layout):
+    final_df, output = clean_file(export(layout, "csv"))
+    cells = _styled_cells(output.getvalue())
+    assert cells == _styled_cells(_openpyxl_reference(final_df, note_fills=True, borders=True))
+    assert {fill for _coord, _value, fill, _border, _fmt in cells} > {None}
+
+
+def test_number_formats_match_openpyxl():
+    df = build_rider_subtotals(pd.DataFrame({
+        "Last Name": ["Lee", "Lee", "Kim"],
+        "First Name": ["Ann", "Ann", "Bo"],
+        "Passenger Number": ["1", "1", "2"],
+        "Internal Note": ["FCC", "XYZ", "DTF"],
+        "Fare": [12.5, np.nan, 7.25],
+        "Transaction Amount": [12.5, np.nan, 7.25],
+    }), fill=None)
+    style = {"number_formats": {"Fare": CURRENCY, "Transaction Amount": CURRENCY}}
+    assert _styled_cells(_xlsxwriter(df, **style)) == _styled_cells(_openpyxl_reference(df, **style))
+
+
+def test_cell_values_match_pandas_conversion():
+    df = pd.DataFrame({
+        "text": ["a", "", None],
+        "int": [1, 2, 3],
+        "float": [1.5, np.nan, -np.inf],
+        "flag": [True, False, True],
+        "when": [datetime.datetime(2024, 1, 2, 3, 4, 5), None, datetime.datetime(2024, 2, 1)],
+    })
+    ws_cells = [(coord, value, fmt) for coord, value, _fill, _border, fmt in _styled_cells(_xlsxwriter(df))]
+    ref_cells = [(coord, value, fmt) for coord, value, _fill, _border, fmt in _styled_cells(_openpyxl_reference(df))]
+    assert ws_cells == ref_cells
+
+
+def test_summary_rows_are_not_filled(export):
+    _df, output = clean_file(export("uber", "csv", rows=60))
+    ws = load_workbook(io.BytesIO(output.getvalue())).worksheets[0]
+    headers = [cell.value for cell in ws[1]]
+    trips = headers.index("Trips Count")
+    for row in ws.iter_rows(min_row=2):
+        if not row[trips].value:
+            assert all(cell.fill.fill_type is None for cell in row)